@@ -20,6 +20,9 @@ a = Analysis(
         'threading',
         'argparse',
         'pathlib',
+        'sqlite3',
+        'orjson',   # Codecs JSON optionnels (ignorés s'ils ne sont pas installés)
+        'msgspec',
     ],
     hookspath=[],
     hooksconfig={},
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la fusion en lot de plusieurs sources (syncmark.batch)
+Fusionne quatre profils synthétiques qui se recouvrent à moitié dans une
+base neuve : d'abord par des appels successifs à SqliteBookmarkStore.apply
+(un par profil, la référence), puis avec merge_batch sur 1, 2, 4 et 8
+processus. Vérifie que les favoris obtenus sont identiques et affiche la
+durée et l'accélération par rapport aux appels à `apply`. L'accélération
+due aux processus dépend du nombre de cœurs disponibles (affiché).
+
+Usage : python benchmarks/bench_batch_merge.py [nombres de favoris...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from syncmark.store import SqliteBookmarkStore
+
+PROFILES = 4
+WORKERS = (1, 2, 4, 8)
+
+def build_sources(count):
+    """`count` favoris répartis en PROFILES profils, chacun recouvrant à moitié le précédent"""
+    per_profile = count // PROFILES
+    return [(f'chrome:Profile {profile}', [{
+        'url': f'https://WWW.site{index % 5000}.example.com/page/{index}/?utm_source=bench',
+        'title': f'Favori {index} du profil {profile} - é',
+        'dateAdded': 1700000000000 + index,
+        'folder': f'Barre de favoris/Dossier {index % 50}',
+    } for index in range(profile * per_profile // 2, profile * per_profile // 2 + per_profile)])
+        for profile in range(PROFILES)]
+
+def measure(sources, merge):
+    """Retourne (durée, contenu de la base) de `merge(store, sources)` dans une base neuve"""
+    with tempfile.TemporaryDirectory() as directory:
+        store = SqliteBookmarkStore(os.path.join(directory, 'bench.db'))
+        try:
+            start = time.perf_counter()
+            merge(store, sources)
+            elapsed = time.perf_counter() - start
+            contents = store.conn.execute("SELECT url_key, data, source FROM bookmarks ORDER BY id").fetchall()
+        finally:
+            store.close()
+    return elapsed, contents
+
+def serial_apply(store, sources):
+    for source, bookmarks in sources:
+        store.apply(bookmarks, [], source)
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [100_000, 400_000]
+    print(f"Cœurs disponibles : {os.cpu_count()}")
+    print(f"{'Favoris':>9} | {'Fusion':>14} | {'Durée':>8} | {'Accélération':>12} | {'Uniques':>8}")
+    for count in counts:
+        sources = build_sources(count)
+        serial_elapsed, reference = measure(sources, serial_apply)
+        print(f"{count:>9} | {'apply':>14} | {serial_elapsed:>7.2f}s | {1:>11.2f}x | {len(reference):>8}")
+        for workers in WORKERS:
+            elapsed, contents = measure(sources, lambda store, sources: store.merge_batch(sources, workers))
+            assert contents == reference, f"Résultat différent avec {workers} processus"
+            print(f"{count:>9} | {f'merge_batch x{workers}':>14} | {elapsed:>7.2f}s | "
+                  f"{serial_elapsed / elapsed:>11.2f}x | {len(contents):>8}")
+
+if __name__ == '__main__':
+    main()
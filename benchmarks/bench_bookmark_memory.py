@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark mémoire de la collection de favoris gardée en cache
+Compare les octets par favori de l'ancien cache (dictionnaires issus de
+json.loads) avec les enregistrements compacts (BookmarkRecord) pour 100k
+et 1M favoris, lus comme CachedBookmarkStore les lit depuis la base.
+
+Usage : python benchmarks/bench_bookmark_memory.py [nombres de favoris...]
+"""
+
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from syncmark.records import BookmarkRecord
+from syncmark.urls import normalize_url
+
+MEGABYTE = 1024 * 1024
+FOLDERS = [f'Barre de favoris/Dossier {i:03d}' for i in range(200)]
+
+def build_rows(count):
+    """Lignes JSON de la base (colonne `data`) pour `count` favoris"""
+    return [json.dumps({
+        'url': f'https://site{i % 5000:04d}.example.com/page/{i:08d}',
+        'title': f'Favori de test numéro {i} - é',
+        'dateAdded': 1700000000000 + i,
+        'folder': FOLDERS[i % len(FOLDERS)],
+    }, ensure_ascii=False).encode('utf-8') for i in range(count)]
+
+def legacy_cache(rows):
+    """Cache historique : liste complète puis dictionnaire de dictionnaires"""
+    bookmarks = [json.loads(data) for data in rows]
+    return {normalize_url(bm['url']): bm for bm in bookmarks}
+
+def compact_cache(rows):
+    """Cache actuel : une passe, enregistrements compacts (voir CachedBookmarkStore._put)"""
+    cache = {}
+    for data in rows:
+        bm = json.loads(data)
+        url_key = normalize_url(bm['url'])
+        cache[url_key] = BookmarkRecord.from_dict(bm, url_key if url_key == bm['url'] else None)
+    return cache
+
+def measure(builder, rows):
+    """Retourne (mémoire retenue, pic mémoire, durée) de la construction du cache"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    cache = builder(rows)
+    elapsed = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del cache
+    return retained, peak, elapsed
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000]
+    print(f"{'Favoris':>9} | {'Cache':>10} | {'Octets/favori':>13} | {'Pic/favori':>10} | "
+          f"{'Retenu':>9} | {'Durée':>7}")
+    for count in counts:
+        rows = build_rows(count)
+        for name, builder in (('historique', legacy_cache), ('compact', compact_cache)):
+            retained, peak, elapsed = measure(builder, rows)
+            print(f"{count:>9} | {name:>10} | {retained / count:>13.0f} | {peak / count:>10.0f} | "
+                  f"{retained / MEGABYTE:>7.1f}Mo | {elapsed:>6.2f}s")
+        del rows
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark des codecs JSON disponibles
+Mesure l'analyse et l'encodage (compact et lisible) de messages synthétiques
+de 10 000 et 100 000 favoris pour chaque codec installé (json, orjson, msgspec).
+
+Usage : python benchmarks/bench_codecs.py [nombres de favoris...]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from syncmark.codec import JSON_CODECS, get_codec
+
+REPEAT = 5
+
+def build_bookmarks(count):
+    """Génère `count` favoris réalistes (URL, titre accentué, dates, dossier)"""
+    return [{
+        'id': str(i),
+        'url': f'https://site{i % 997}.example.com/articles/{i}?ref=syncmark',
+        'title': f'Favori numéro {i} - édition spéciale',
+        'dateAdded': 1700000000000 + i,
+        'parentId': str(i % 50),
+        'index': i % 100,
+    } for i in range(count)]
+
+def best_of(function, *args):
+    """Meilleur temps sur REPEAT exécutions, en millisecondes"""
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]
+    codecs = []
+    for name in JSON_CODECS:
+        try:
+            codecs.append(get_codec(name))
+        except ImportError:
+            print(f"{name} non installé - ignoré")
+
+    print(f"{'Favoris':>8} | {'Codec':>8} | {'Taille':>8} | {'loads':>9} | {'dumps':>9} | {'lisible':>9}")
+    for count in counts:
+        bookmarks = build_bookmarks(count)
+        payload = {'bookmarks': bookmarks}
+        for codec in codecs:
+            encoded = codec.dumps(payload)
+            print(f"{count:>8} | {codec.name:>8} | {len(encoded) / 1024 / 1024:>6.1f}Mo | "
+                  f"{best_of(codec.loads, encoded):>7.1f}ms | "
+                  f"{best_of(codec.dumps, payload):>7.1f}ms | "
+                  f"{best_of(codec.dumps_pretty, bookmarks):>7.1f}ms")
+
+if __name__ == '__main__':
+    main()
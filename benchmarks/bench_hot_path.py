@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Benchmarks du chemin critique du Native Host
+Mesure la latence par message des étapes exécutées pour chaque
+synchronisation, sur des collections générées de 100 à 500 000 favoris :
+- config      : SyncMarkConfig.is_sync_enabled
+- full_sync   : process_bookmarks complet (fusion, sauvegarde, réponse)
+- delta_sync  : process_bookmarks en mode delta (10 changements)
+- read_frame  : get_message depuis un flux en mémoire
+- write_frame : send_message vers un flux en mémoire
+
+Les résultats peuvent être sauvegardés puis comparés à une référence :
+    python benchmarks/bench_hot_path.py --save reference.json
+    python benchmarks/bench_hot_path.py --compare reference.json --tolerance 0.25
+Le code de sortie est 1 si une mesure dépasse la référence de plus de la
+tolérance, ce qui permet de bloquer une régression avant une publication.
+"""
+
+import argparse
+import io
+import json
+import os
+import statistics
+import struct
+import sys
+import tempfile
+import time
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from syncmark import config
+from syncmark.codec import get_codec
+from syncmark.config import SyncMarkConfig
+from syncmark.host import NativeHostManager
+
+DEFAULT_SIZES = [100, 1_000, 10_000, 100_000, 500_000]
+
+def build_bookmarks(count, generation=0):
+    """Génère `count` favoris ; `generation` modifie les titres pour simuler des changements"""
+    return [{
+        'id': str(i),
+        'url': f'https://site{i % 997}.example.com/articles/{i}',
+        'title': f'Favori {i} - version {generation}',
+        'dateAdded': 1700000000000 + i,
+        'parentId': str(i % 50),
+    } for i in range(count)]
+
+def frame(message):
+    payload = get_codec().dumps(message)
+    return struct.pack('@I', len(payload)) + payload
+
+def use_sync_dir(sync_dir):
+    """Redirige les fichiers du module vers un répertoire temporaire"""
+    config.SYNC_DIR = sync_dir
+    config.CONFIG_FILE = os.path.join(sync_dir, 'config.json')
+    config.BOOKMARKS_FILE_PATH = os.path.join(sync_dir, 'syncmark_bookmarks.json')
+    config.STORE_FILE_PATH = os.path.join(sync_dir, 'syncmark_bookmarks.db')
+    config.SYNC_STATE_FILE_PATH = os.path.join(sync_dir, 'syncmark_sync_state.json')
+
+def measure(function, iterations):
+    """Médiane des durées en millisecondes"""
+    timings = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        function(i)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def iterations_for(size):
+    return max(3, min(50, 200_000 // size))
+
+def bench_config(_size):
+    SyncMarkConfig.is_sync_enabled()
+    return measure(lambda i: SyncMarkConfig.is_sync_enabled(), 1000)
+
+def bench_full_sync(size):
+    host = NativeHostManager()
+    host.send_message = lambda message: None
+    host.process_bookmarks({'bookmarks': build_bookmarks(size)})
+    # 1 % des favoris change à chaque synchronisation
+    messages = []
+    for generation in range(1, iterations_for(size) + 1):
+        bookmarks = build_bookmarks(size)
+        for bm in bookmarks[:max(1, size // 100)]:
+            bm['title'] += f' ({generation})'
+        messages.append({'bookmarks': bookmarks})
+    try:
+        return measure(lambda i: host.process_bookmarks(messages[i]), len(messages))
+    finally:
+        host.get_store().close()
+
+def bench_delta_sync(size):
+    host = NativeHostManager()
+    replies = []
+    host.send_message = replies.append
+    host.process_bookmarks({'bookmarks': build_bookmarks(size)})
+    revision = replies[-1]['revision']
+
+    def sync(i):
+        changed = [{'url': f'https://delta.example.com/{i}/{j}', 'title': 'Nouveau'} for j in range(10)]
+        host.process_bookmarks({'type': 'delta', 'revision': revision, 'added': changed})
+    try:
+        return measure(sync, 20)
+    finally:
+        host.get_store().close()
+
+def bench_read_frame(size):
+    data = frame({'bookmarks': build_bookmarks(size)})
+    host = NativeHostManager()
+    fake_stdin = MagicMock()
+
+    def read(_):
+        fake_stdin.buffer = io.BytesIO(data)
+        with patch('sys.stdin', fake_stdin):
+            host.get_message()
+    return measure(read, iterations_for(size))
+
+def bench_write_frame(size):
+    reply = {'status': 'success', 'revision': 1, 'bookmarks': build_bookmarks(size)}
+    host = NativeHostManager()
+    fake_stdout = MagicMock()
+
+    def write(_):
+        fake_stdout.buffer = io.BytesIO()
+        with patch('sys.stdout', fake_stdout):
+            host.send_message(reply)
+    return measure(write, iterations_for(size))
+
+BENCHMARKS = {
+    'config': bench_config,
+    'full_sync': bench_full_sync,
+    'delta_sync': bench_delta_sync,
+    'read_frame': bench_read_frame,
+    'write_frame': bench_write_frame,
+}
+
+def run(sizes, names):
+    results = {}
+    for name in names:
+        for size in ([0] if name == 'config' else sizes):
+            with tempfile.TemporaryDirectory() as sync_dir:
+                use_sync_dir(sync_dir)
+                key = name if name == 'config' else f'{name}[{size}]'
+                results[key] = BENCHMARKS[name](size)
+                print(f"{key:>24} : {results[key]:>10.3f} ms", flush=True)
+    return results
+
+def compare(results, reference, tolerance):
+    """Retourne la liste des mesures qui régressent par rapport à la référence"""
+    regressions = []
+    for key, value in results.items():
+        if key in reference and value > reference[key] * (1 + tolerance):
+            regressions.append(f"{key} : {reference[key]:.3f} ms -> {value:.3f} ms")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks du chemin critique SyncMark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument('--save', help='Fichier JSON où enregistrer les résultats')
+    parser.add_argument('--compare', help='Fichier JSON de référence')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Dégradation relative tolérée (0.25 = 25 %%)')
+    args = parser.parse_args()
+
+    print(f"Codec JSON : {get_codec().name}")
+    results = run(args.sizes, args.only)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"❌ Régression {regression}")
+        sys.exit(1 if regressions else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark de l'import de fichiers de favoris (HTML Netscape et Bookmarks de Chrome)
+Écrit une collection synthétique dans les deux formats, puis mesure pour
+chacun le pic mémoire de la lecture en flux (tracemalloc) et la durée de
+l'import complet dans une base neuve (fusion, historique, index de recherche).
+
+Usage : python benchmarks/bench_import.py [nombres de favoris...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from syncmark.config import atomic_write
+from syncmark.formats import export_chunks, read_bookmark_file
+from syncmark.store import SqliteBookmarkStore
+
+MEGABYTE = 1024 * 1024
+FOLDERS = ['Barre de favoris/Dev', 'Barre de favoris/Dev/Python', 'Autres favoris/Cuisine',
+           'Autres favoris/Voyages/Japon', 'Autres favoris/Musique', 'Favoris sur mobile']
+
+def build_bookmarks(count):
+    """Génère `count` favoris triés par dossier (voir bookmarks_by_folder)"""
+    per_folder = count // len(FOLDERS) + 1
+    for index in range(count):
+        yield {
+            'url': f'https://site{index % 5000}.example.com/page/{index}',
+            'title': f'Favori de test {index} - é',
+            'dateAdded': 1700000000000 + index,
+            'folder': FOLDERS[index // per_folder],
+        }
+
+def read_peak(path):
+    """Pic mémoire (octets) et nombre de favoris de la lecture seule d'un fichier"""
+    tracemalloc.start()
+    count = sum(1 for _ in read_bookmark_file(path))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, count
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000]
+    print(f"{'Favoris':>9} | {'Format':>6} | {'Fichier':>9} | {'Pic lecture':>11} | {'Import':>8} | {'Favoris/s':>10}")
+    for count in counts:
+        with tempfile.TemporaryDirectory() as directory:
+            for file_format, name in (('html', 'favoris.html'), ('chrome', 'Bookmarks')):
+                path = os.path.join(directory, name)
+                atomic_write(path, export_chunks(lambda: build_bookmarks(count), file_format))
+                peak, read_count = read_peak(path)
+                assert read_count == count
+                
+                store = SqliteBookmarkStore(os.path.join(directory, f'{file_format}.db'))
+                try:
+                    start = time.perf_counter()
+                    store.import_bookmarks(read_bookmark_file(path))
+                    elapsed = time.perf_counter() - start
+                finally:
+                    store.close()
+                print(f"{count:>9} | {file_format:>6} | {os.path.getsize(path) / MEGABYTE:>7.1f}Mo | "
+                      f"{peak / MEGABYTE:>9.1f}Mo | {elapsed:>7.1f}s | {count / elapsed:>10.0f}")
+
+if __name__ == '__main__':
+    main()
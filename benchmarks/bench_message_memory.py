@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark mémoire de la lecture des messages natifs
+Compare le pic mémoire de l'ancienne lecture (read + decode + json.loads)
+avec la lecture en flux de NativeHostManager.get_message pour des messages
+de 1 Mo, 10 Mo et 64 Mo.
+
+Usage : python benchmarks/bench_message_memory.py [tailles en Mo...]
+"""
+
+import io
+import json
+import os
+import struct
+import sys
+import time
+import tracemalloc
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from syncmark.host import NativeHostManager
+
+MEGABYTE = 1024 * 1024
+
+def build_frame(size_mb):
+    """Construit un message de synchronisation d'environ `size_mb` Mo"""
+    bookmark = {'url': 'https://example.com/page/00000000', 'title': 'Favori de test - é', 'dateAdded': 1700000000000}
+    bookmark_size = len(json.dumps(bookmark).encode('utf-8')) + 2
+    count = size_mb * MEGABYTE // bookmark_size
+    payload = json.dumps({'bookmarks': [
+        dict(bookmark, url=f'https://example.com/page/{i:08d}') for i in range(count)
+    ]}).encode('utf-8')
+    return struct.pack('@I', len(payload)) + payload
+
+def legacy_get_message(stream):
+    """Lecture historique : read() complet, décodage en str puis json.loads"""
+    raw_length = stream.read(4)
+    message_length = struct.unpack('@I', raw_length)[0]
+    message_json = stream.read(message_length).decode('utf-8')
+    return json.loads(message_json)
+
+def streaming_get_message(stream):
+    fake_stdin = MagicMock()
+    fake_stdin.buffer = stream
+    with patch('sys.stdin', fake_stdin):
+        return NativeHostManager().get_message()
+
+def measure(reader, frame):
+    """Retourne (pic mémoire en octets, durée en secondes) d'une lecture"""
+    stream = io.BytesIO(frame)
+    tracemalloc.start()
+    start = time.perf_counter()
+    message = reader(stream)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del message
+    return peak, elapsed
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1, 10, 64]
+    print(f"{'Taille':>8} | {'Lecture':>10} | {'Pic mémoire':>12} | {'Pic / message':>13} | {'Durée':>8}")
+    for size_mb in sizes:
+        frame = build_frame(size_mb)
+        payload_size = len(frame) - 4
+        for name, reader in (('historique', legacy_get_message), ('flux', streaming_get_message)):
+            peak, elapsed = measure(reader, frame)
+            print(f"{size_mb:>6}Mo | {name:>10} | {peak / MEGABYTE:>10.1f}Mo | "
+                  f"{peak / payload_size:>12.2f}x | {elapsed:>7.2f}s")
+
+if __name__ == '__main__':
+    main()
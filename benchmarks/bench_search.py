@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la recherche plein texte (index FTS5 du stockage)
+Construit une collection synthétique dans une base temporaire, puis mesure
+des recherches de sélectivité variable : mot rare, mot courant, première
+lettre d'une saisie, plusieurs mots, aucun résultat.
+
+Usage : python benchmarks/bench_search.py [nombres de favoris...]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from syncmark.store import SqliteBookmarkStore
+
+REPEAT = 5
+WORDS = ['python', 'documentation', 'recette', 'cuisine', 'voyage', 'musique', 'github', 'linux',
+         'noyau', 'sqlite', 'recherche', 'actualité', 'sport', 'météo', 'banque', 'facture',
+         'projet', 'réunion', 'photo', 'vidéo', 'jardin', 'cinéma', 'livre', 'santé']
+QUERIES = ['pyth', 'r', 'météo fact', 'site123', 'favori 4242', 'introuvable']
+
+def build_bookmarks(count):
+    """Génère `count` favoris : titre de trois mots, URL et dossier"""
+    rng = random.Random(1)
+    return [{
+        'url': f'https://site{i % 5000}.example.com/{rng.choice(WORDS)}/{i}',
+        'title': ' '.join(rng.sample(WORDS, 3)) + f' favori {i}',
+        'folder': f'Barre de favoris/{rng.choice(WORDS)}',
+    } for i in range(count)]
+
+def best_of(function, *args):
+    """Meilleur temps sur REPEAT exécutions, en millisecondes"""
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [100_000, 500_000]
+    print(f"{'Favoris':>8} | {'Recherche':>12} | {'Résultats':>9} | {'Durée':>9}")
+    for count in counts:
+        with tempfile.TemporaryDirectory() as directory:
+            store = SqliteBookmarkStore(os.path.join(directory, 'bench.db'))
+            try:
+                start = time.perf_counter()
+                store.apply(build_bookmarks(count), [])
+                print(f"{count:>8} | {'(import)':>12} | {'':>9} | {(time.perf_counter() - start):>8.1f}s")
+                for query in QUERIES:
+                    results = store.search(query, 20)
+                    print(f"{count:>8} | {query:>12} | {len(results):>9} | "
+                          f"{best_of(store.search, query, 20):>7.1f}ms")
+            finally:
+                store.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark du démarrage à froid du Native Host
+Le navigateur lance un nouveau processus pour chaque connectNative ou
+sendNativeMessage : le temps de démarrage s'ajoute à chaque synchronisation.
+Quatre scénarios sont mesurés dans un processus neuf et un HOME temporaire :
+- python     : interpréteur seul (python -c pass), pour référence
+- host_idle  : --mode host, canal fermé sans message
+- host_sync  : --mode host, une synchronisation complète de 10 favoris
+- relay_sync : la même synchronisation relayée à un démon déjà lancé
+
+Pour chaque scénario, la durée totale médiane est suivie du temps d'import
+mesuré par `python -X importtime` et des imports les plus coûteux.
+    python benchmarks/bench_startup.py --runs 20 --budget 60
+Le code de sortie est 1 si le temps d'import de host_sync dépasse le budget
+(en millisecondes).
+"""
+
+import argparse
+import os
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+ENTRY_SCRIPT = os.path.join(ROOT_DIR, 'syncmark_unified.py')
+
+def frame(message):
+    payload = message.encode('utf-8')
+    return struct.pack('@I', len(payload)) + payload
+
+SYNC_MESSAGE = frame('{"bookmarks":[%s]}' % ','.join(
+    '{"url":"https://site%d.example.com/","title":"Favori %d"}' % (i, i) for i in range(10)))
+
+SCENARIOS = {
+    'python': (['-c', 'pass'], b''),
+    'host_idle': ([ENTRY_SCRIPT, '--mode', 'host'], b''),
+    'host_sync': ([ENTRY_SCRIPT, '--mode', 'host'], SYNC_MESSAGE),
+    'relay_sync': ([ENTRY_SCRIPT, '--mode', 'host'], SYNC_MESSAGE),
+}
+# Scénarios exécutés avec un démon (--mode daemon) lancé dans le même HOME
+DAEMON_SCENARIOS = {'relay_sync'}
+
+def run_process(args, stdin_data, home, python_options=()):
+    """Lance l'interpréteur avec un HOME isolé et retourne (durée ms, stderr)"""
+    env = dict(os.environ, HOME=home, USERPROFILE=home)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, *python_options, *args], input=stdin_data,
+                            capture_output=True, env=env, cwd=ROOT_DIR, check=True)
+    return (time.perf_counter() - start) * 1000, result.stderr.decode('utf-8', 'replace')
+
+def parse_importtime(output):
+    """Analyse la sortie de -X importtime en liste (module, profondeur, propre µs, cumulé µs)"""
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        imports.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return imports
+
+def start_daemon(home):
+    """Lance --mode daemon et attend que son socket existe"""
+    env = dict(os.environ, HOME=home, USERPROFILE=home)
+    daemon = subprocess.Popen([sys.executable, ENTRY_SCRIPT, '--mode', 'daemon'], env=env, cwd=ROOT_DIR)
+    socket_path = os.path.join(home, 'Documents', 'SyncMark', 'syncmark.sock')
+    deadline = time.monotonic() + 10
+    while not os.path.exists(socket_path):
+        if time.monotonic() > deadline or daemon.poll() is not None:
+            daemon.kill()
+            raise RuntimeError("Le démon n'a pas démarré")
+        time.sleep(0.01)
+    return daemon
+
+def bench_scenario(name, runs):
+    args, stdin_data = SCENARIOS[name]
+    with tempfile.TemporaryDirectory() as home:
+        daemon = start_daemon(home) if name in DAEMON_SCENARIOS else None
+        try:
+            # Premier lancement : création du dossier SyncMark et de la base
+            run_process(args, stdin_data, home)
+            timings = [run_process(args, stdin_data, home)[0] for _ in range(runs)]
+            _, output = run_process(args, stdin_data, home, ('-X', 'importtime'))
+        finally:
+            if daemon is not None:
+                daemon.terminate()
+                daemon.wait()
+    imports = parse_importtime(output)
+    import_ms = sum(cumulative for _, depth, _, cumulative in imports if depth == 0) / 1000
+    return statistics.median(timings), import_ms, imports
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark du démarrage à froid du Native Host')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--top', type=int, default=10, help='Nombre d\'imports les plus coûteux affichés')
+    parser.add_argument('--budget', type=float,
+                        help='Temps d\'import maximal (ms) du scénario host_sync')
+    args = parser.parse_args()
+
+    results = {}
+    for name in SCENARIOS:
+        total_ms, import_ms, imports = bench_scenario(name, args.runs)
+        results[name] = import_ms
+        print(f"{name:>10} : {total_ms:>8.1f} ms au total, {import_ms:>7.1f} ms d'imports")
+        if name != 'python':
+            slowest = sorted(imports, key=lambda entry: entry[3], reverse=True)[:args.top]
+            for module, depth, _, cumulative in slowest:
+                print(f"{'':>13}{cumulative / 1000:>7.1f} ms  {'  ' * depth}{module}")
+
+    if args.budget is not None and results['host_sync'] > args.budget:
+        print(f"❌ Imports de host_sync : {results['host_sync']:.1f} ms > {args.budget:.1f} ms")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Benchmark du coût de la validation des messages (syncmark.validation)
+Compare, pour des collections de 1 000 à 500 000 favoris, la durée de
+validate_bookmarks à celle d'une synchronisation complète dont 1 % des
+favoris change (process_bookmarks : validation, fusion, sauvegarde et
+réponse). La validation doit rester sous quelques pour cent de la fusion.
+
+Usage : python benchmarks/bench_validation.py [nombres de favoris...]
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bench_hot_path import build_bookmarks, iterations_for, measure, use_sync_dir
+from syncmark.host import NativeHostManager
+from syncmark.validation import validate_bookmarks
+
+def bench(size):
+    """Retourne (durée médiane de la validation, durée médiane de la synchronisation) en ms"""
+    host = NativeHostManager()
+    host.send_message = lambda message: None
+    host.process_bookmarks({'bookmarks': build_bookmarks(size)})
+    messages = []
+    for generation in range(1, iterations_for(size) + 1):
+        bookmarks = build_bookmarks(size)
+        for bm in bookmarks[:max(1, size // 100)]:
+            bm['title'] += f' ({generation})'
+        messages.append({'bookmarks': bookmarks})
+    try:
+        validation = measure(lambda i: validate_bookmarks(messages[i]['bookmarks']), len(messages))
+        sync = measure(lambda i: host.process_bookmarks(messages[i]), len(messages))
+    finally:
+        host.get_store().close()
+    return validation, sync
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 100_000, 500_000]
+    print(f"{'Favoris':>9} | {'Validation':>12} | {'Synchronisation':>15} | {'Part':>7}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as sync_dir:
+            use_sync_dir(sync_dir)
+            validation, sync = bench(size)
+        print(f"{size:>9} | {validation:>9.3f} ms | {sync:>12.3f} ms | {validation / sync:>6.1%}")
+
+if __name__ == '__main__':
+    main()
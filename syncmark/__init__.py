@@ -0,0 +1,24 @@
+"""
+Cœur de SyncMark, indépendant de la plateforme :
+- config     : chemins et paramètres utilisateur
+- codec      : codecs JSON (orjson, msgspec ou json)
+- urls       : normalisation des URLs (clé des favoris et des doublons)
+- records    : représentation compacte des favoris en mémoire
+- store      : stockage SQLite des favoris, historique, cache mémoire, écritures différées
+- search     : recherche plein texte (SQLite FTS5)
+- tree       : arborescence des favoris et fusion à trois voies
+- merge      : fusion et réponses de synchronisation (complète ou delta)
+- batch      : fusion en lot de plusieurs sources sur plusieurs processus
+- validation : validation des messages et quarantaine des entrées rejetées
+- formats    : import et export des fichiers HTML et Bookmarks de Chrome
+- framing    : trames des messages natifs
+- metrics    : mesures par message du Native Host
+- logs       : journal JSON écrit par un thread dédié
+- host       : boucle du Native Host
+- async_host : boucle asyncio du Native Host (requêtes en pipeline)
+- ipc        : relais du Native Host vers le démon
+- daemon     : démon de synchronisation partagé par les Native Hosts
+
+Les interfaces propres à une plateforme (installer : registre Windows ou
+dossiers NativeMessagingHosts, ui : Tk) ne sont importées qu'à la demande.
+"""
@@ -0,0 +1,114 @@
+"""
+Native Host asyncio : lecture, traitement et écriture des messages en parallèle
+"""
+
+import asyncio
+import logging
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from .framing import MessageDecodeError, MessageTooLargeError, read_message, write_message
+from .host import NativeHostManager, with_request_id
+
+# Nombre maximal de réponses en attente d'écriture avant de suspendre la lecture
+MAX_PENDING_REPLIES = 16
+
+class AsyncNativeHost:
+    """Native Host en pipeline
+
+    Trois étapes reliées par une file de réponses :
+    - lecture de stdin dans un thread dédié (stdin ne peut pas être
+      surveillé par la boucle asyncio sous Windows) ;
+    - traitement des messages dans un seul thread de stockage, dans
+      l'ordre d'arrivée, pour que les écritures sur disque ne bloquent
+      ni la lecture ni l'écriture ;
+    - écriture des réponses par une seule tâche, seule à écrire sur stdout,
+      si bien que les trames de deux réponses ne se mélangent jamais.
+
+    Les réponses reprennent l'identifiant (`id`) des requêtes : l'extension
+    peut envoyer plusieurs messages sans attendre leurs réponses.
+    """
+    
+    def __init__(self, host=None, stdin=None, stdout=None):
+        self.host = host or NativeHostManager()
+        self.stdin = sys.stdin.buffer if stdin is None else stdin
+        self.stdout = sys.stdout.buffer if stdout is None else stdout
+    
+    def reply_to(self, message, metrics=None):
+        """Calcule la réponse à un message (exécuté dans le thread de stockage)"""
+        try:
+            return self.host.build_reply(message, metrics)
+        except Exception as e:
+            logging.error(f"Erreur de traitement d'un message : {e}", exc_info=True)
+            return with_request_id({'status': 'error', 'message': str(e)}, message)
+    
+    def write_reply(self, reply, metrics):
+        """Écrit une réponse puis enregistre les mesures du message (thread d'écriture)"""
+        frame_count = write_message(self.stdout, reply, self.host.max_reply_size, metrics)
+        logging.info(f"Message envoyé à l'extension ({frame_count} trame(s))")
+        self.host.record_metrics(metrics)
+    
+    async def write_replies(self, replies, executor):
+        """Écrit les réponses sur stdout dans l'ordre des requêtes
+
+        La file contient des couples (réponse ou future, mesures du message).
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await replies.get()
+            if item is None:
+                return
+            reply, metrics = item
+            if isinstance(reply, asyncio.Future):
+                reply = await reply
+            await loop.run_in_executor(executor, self.write_reply, reply, metrics)
+    
+    async def run(self):
+        """Boucle principale : lit les messages jusqu'à la fermeture de stdin"""
+        logging.info("Native Host SyncMark (asyncio) démarré")
+        loop = asyncio.get_running_loop()
+        self.host.load_settings()
+        replies = asyncio.Queue(maxsize=MAX_PENDING_REPLIES)
+        
+        with ThreadPoolExecutor(1, thread_name_prefix='syncmark-stdin') as reader, \
+                ThreadPoolExecutor(1, thread_name_prefix='syncmark-store') as store_executor, \
+                ThreadPoolExecutor(1, thread_name_prefix='syncmark-stdout') as writer:
+            writer_task = asyncio.create_task(self.write_replies(replies, writer))
+            try:
+                while not writer_task.done():
+                    metrics = self.host.new_metrics()
+                    try:
+                        message = await loop.run_in_executor(
+                            reader, read_message, self.stdin, self.host.max_message_size, metrics
+                        )
+                    except MessageTooLargeError as e:
+                        logging.warning(str(e))
+                        await replies.put(({'status': 'error', 'message': 'Message too large'}, None))
+                        continue
+                    except MessageDecodeError as e:
+                        reply = loop.run_in_executor(store_executor, self.host.decode_error_reply, e)
+                        await replies.put((reply, None))
+                        continue
+                    except (EOFError, ValueError) as e:
+                        logging.error(f"Message illisible, arrêt du Native Host : {e}")
+                        await replies.put(({'status': 'error', 'message': str(e)}, None))
+                        break
+                    
+                    if message is None:
+                        logging.info("Canal fermé par le navigateur")
+                        break
+                    logging.info("Message reçu de l'extension")
+                    reply = loop.run_in_executor(store_executor, self.reply_to, message, metrics)
+                    await replies.put((reply, metrics))
+            finally:
+                try:
+                    # Les réponses en cours sont écrites avant la fermeture
+                    if not writer_task.done():
+                        await replies.put(None)
+                    await writer_task
+                finally:
+                    await loop.run_in_executor(store_executor, self.host.close)
+    
+    def run_host(self):
+        """Lance la boucle asyncio du Native Host"""
+        asyncio.run(self.run())
@@ -0,0 +1,106 @@
+"""
+Fusion en lot de plusieurs sources (profils, fichiers importés, restaurations)
+répartie sur plusieurs processus
+"""
+
+import itertools
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from .codec import get_codec
+from .urls import normalize_url
+from .validation import validate_bookmarks
+
+# Nombre de favoris lus par tranche dans chaque source
+BATCH_CHUNK_SIZE = 20000
+
+# Tranches en cours de traitement par processus : au-delà, la lecture des
+# sources attend les résultats
+MAX_PENDING_CHUNKS = 2
+
+def prepare_chunk(codec_name, bookmarks):
+    """Valide, normalise, encode et fusionne une tranche de favoris
+
+    Retourne (nombre de favoris valides, lignes (URL normalisée, URL,
+    JSON)) dans l'ordre des premières apparitions : dans la tranche, le
+    dernier favori d'une URL normalisée l'emporte, à la place du premier.
+    Les lignes ne contiennent que des chaînes, rapides à renvoyer au
+    processus principal.
+    """
+    dumps = get_codec(codec_name).dumps
+    valid, _ = validate_bookmarks(bookmarks)
+    merged = {}
+    for bm in valid:
+        merged[normalize_url(bm['url'])] = (bm['url'], dumps(bm, sort_keys=True).decode('utf-8'))
+    return len(valid), [(url_key, url, data) for url_key, (url, data) in merged.items()]
+
+def read_chunks(sources, chunk_size=BATCH_CHUNK_SIZE):
+    """Tranches (source, favoris) des sources, lues une à une"""
+    for source, bookmarks in sources:
+        bookmarks = iter(bookmarks)
+        while True:
+            chunk = list(itertools.islice(bookmarks, chunk_size))
+            if not chunk:
+                break
+            yield source, chunk
+
+def prepared_chunks(sources, workers, codec_name, chunk_size=BATCH_CHUNK_SIZE):
+    """(source, résultat de prepare_chunk) de chaque tranche, dans l'ordre des sources
+
+    Avec plusieurs processus, au plus MAX_PENDING_CHUNKS tranches par
+    processus sont en cours : les sources lues en flux ne sont pas
+    chargées entièrement.
+    """
+    if workers == 1:
+        for source, chunk in read_chunks(sources, chunk_size):
+            yield source, prepare_chunk(codec_name, chunk)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for source, chunk in read_chunks(sources, chunk_size):
+            pending.append((source, pool.submit(prepare_chunk, codec_name, chunk)))
+            if len(pending) > workers * MAX_PENDING_CHUNKS:
+                source, future = pending.popleft()
+                yield source, future.result()
+        while pending:
+            source, future = pending.popleft()
+            yield source, future.result()
+
+def merge_sources(sources, workers=None, codec_name=None, chunk_size=BATCH_CHUNK_SIZE):
+    """Fusionne des sources comme des appels successifs à `apply`, sur `workers` processus
+
+    `sources` est une suite de (source, favoris), dans l'ordre où elles
+    seraient appliquées ; les favoris peuvent être lus en flux (fichiers
+    importés). Les sources sont découpées en tranches que les processus
+    valident (syncmark.validation), normalisent, encodent et fusionnent
+    de bout en bout (prepare_chunk). Le processus principal réunit les
+    tranches dans leur ordre, en une passe sur un dictionnaire dont l'ordre
+    d'insertion est celui des premières apparitions : aucun tri n'est
+    nécessaire. Le résultat est celui de la fusion en série : pour chaque
+    URL normalisée, le dernier favori reçu, à la place de la première
+    apparition, avec la source de la première apparition.
+
+    Retourne (nombre de favoris valides, lignes (URL normalisée, URL, JSON,
+    source) dans l'ordre d'insertion). Avec `workers` à 1, tout est fait
+    dans le processus courant, et par défaut un processus par cœur. Lève
+    ValueError si `workers` n'est pas strictement positif.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    elif workers <= 0:
+        raise ValueError(f"Nombre de processus invalide : {workers}")
+    codec_name = codec_name or get_codec().name
+
+    valid_count = 0
+    merged = {}
+    for source, (count, rows) in prepared_chunks(sources, workers, codec_name, chunk_size):
+        valid_count += count
+        for url_key, url, data in rows:
+            entry = merged.get(url_key)
+            if entry is None:
+                merged[url_key] = [url, data, source]
+            else:
+                entry[0] = url
+                entry[1] = data
+    return valid_count, [(url_key, url, data, source) for url_key, (url, data, source) in merged.items()]
@@ -0,0 +1,112 @@
+"""
+Codecs JSON interchangeables : orjson ou msgspec s'ils sont installés,
+module standard json sinon
+"""
+
+import json
+import logging
+
+from .config import SyncMarkConfig
+from .records import BookmarkRecord
+
+def encode_default(value):
+    """Valeurs encodées en plus des types JSON : favoris compacts (voir syncmark.records)"""
+    if isinstance(value, BookmarkRecord):
+        return value.to_dict()
+    raise TypeError(f"Type non encodable en JSON : {type(value).__name__}")
+
+class JsonCodec:
+    """Codec JSON de la bibliothèque standard, toujours disponible
+
+    `dumps` produit des octets UTF-8 compacts ; `loads` accepte des octets
+    ou une chaîne et lève ValueError si le JSON est invalide.
+    """
+    
+    name = 'json'
+    # Vrai si loads analyse des octets sans les décoder d'abord en chaîne
+    parses_bytes = False
+    
+    def __init__(self):
+        self.encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=encode_default)
+        self.sorted_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), sort_keys=True,
+                                               default=encode_default)
+        self.pretty_encoder = json.JSONEncoder(ensure_ascii=False, indent=4, default=encode_default)
+    
+    def loads(self, data):
+        return json.loads(data)
+    
+    def dumps(self, value, sort_keys=False):
+        return (self.sorted_encoder if sort_keys else self.encoder).encode(value).encode('utf-8')
+    
+    def dumps_pretty(self, value):
+        return self.pretty_encoder.encode(value).encode('utf-8')
+
+class OrjsonCodec(JsonCodec):
+    """Codec basé sur orjson (optionnel)"""
+    
+    name = 'orjson'
+    parses_bytes = True
+    
+    def __init__(self):
+        import orjson
+        self.orjson = orjson
+    
+    def loads(self, data):
+        return self.orjson.loads(data)
+    
+    def dumps(self, value, sort_keys=False):
+        return self.orjson.dumps(value, default=encode_default,
+                                 option=self.orjson.OPT_SORT_KEYS if sort_keys else 0)
+    
+    def dumps_pretty(self, value):
+        return self.orjson.dumps(value, default=encode_default, option=self.orjson.OPT_INDENT_2)
+
+class MsgspecCodec(JsonCodec):
+    """Codec basé sur msgspec (optionnel)"""
+    
+    name = 'msgspec'
+    parses_bytes = True
+    
+    def __init__(self):
+        import msgspec
+        self.msgspec = msgspec
+        self.encoder = msgspec.json.Encoder(enc_hook=encode_default)
+        self.sorted_encoder = msgspec.json.Encoder(enc_hook=encode_default, order='sorted')
+        self.decoder = msgspec.json.Decoder()
+    
+    def loads(self, data):
+        try:
+            return self.decoder.decode(data)
+        except self.msgspec.DecodeError as e:
+            raise ValueError(str(e)) from e
+    
+    def dumps(self, value, sort_keys=False):
+        return (self.sorted_encoder if sort_keys else self.encoder).encode(value)
+    
+    def dumps_pretty(self, value):
+        return self.msgspec.json.format(self.encoder.encode(value), indent=4)
+
+# Codecs par ordre de préférence
+JSON_CODECS = {'orjson': OrjsonCodec, 'msgspec': MsgspecCodec, 'json': JsonCodec}
+_json_codec = None
+
+def get_codec(name=None):
+    """Retourne le codec JSON demandé, ou le plus rapide installé
+
+    Sans nom, le choix est fait une fois par processus, en respectant le
+    paramètre `json_codec` de la configuration s'il est défini.
+    """
+    global _json_codec
+    if name is not None:
+        return JSON_CODECS[name]()
+    
+    if _json_codec is None:
+        preferred = SyncMarkConfig.get_setting('json_codec')
+        for codec_name in ([preferred] if preferred in JSON_CODECS else []) + list(JSON_CODECS):
+            try:
+                _json_codec = JSON_CODECS[codec_name]()
+                break
+            except ImportError:
+                continue
+        logging.info(f"Codec JSON : {_json_codec.name}")
+    return _json_codec
@@ -0,0 +1,250 @@
+"""
+Configuration de SyncMark : chemins des fichiers et paramètres utilisateur
+"""
+
+import contextlib
+import json
+import logging
+import os
+import sys
+
+# --- Configuration Globale ---
+HOME_DIR = os.path.expanduser("~")
+SYNC_DIR = os.path.join(HOME_DIR, 'Documents', 'SyncMark')
+os.makedirs(SYNC_DIR, exist_ok=True)
+CONFIG_FILE = os.path.join(SYNC_DIR, 'config.json')
+LOG_FILE = os.path.join(SYNC_DIR, 'syncmark_unified.log')
+BOOKMARKS_FILE_PATH = os.path.join(SYNC_DIR, 'syncmark_bookmarks.json')
+STORE_FILE_PATH = os.path.join(SYNC_DIR, 'syncmark_bookmarks.db')
+# Mesures par message du Native Host (JSON lines, voir syncmark.metrics)
+METRICS_FILE_PATH = os.path.join(SYNC_DIR, 'syncmark_metrics.jsonl')
+# Entrées rejetées des messages de l'extension (JSON lines, voir syncmark.validation)
+QUARANTINE_FILE_PATH = os.path.join(SYNC_DIR, 'syncmark_quarantine.jsonl')
+# Journal des révisions de l'ancien stockage JSON, lu uniquement lors de la migration
+SYNC_STATE_FILE_PATH = os.path.join(SYNC_DIR, 'syncmark_sync_state.json')
+# Point d'accès du démon : tube nommé sous Windows, socket Unix ailleurs
+if sys.platform == 'win32':
+    DAEMON_ADDRESS = r'\\.\pipe\syncmark-' + os.path.basename(HOME_DIR)
+else:
+    DAEMON_ADDRESS = os.path.join(SYNC_DIR, 'syncmark.sock')
+# Clé d'authentification des connexions au démon, recréée à chaque démarrage (fichier 0600)
+DAEMON_KEY_FILE_PATH = os.path.join(SYNC_DIR, 'syncmark_daemon.key')
+
+# Attente maximale (secondes) d'un verrou de fichier sous Windows, et délai entre deux essais
+FILE_LOCK_TIMEOUT = 60
+FILE_LOCK_RETRY_DELAY = 0.05
+
+# Types attendus des paramètres de config.json ; les autres clés sont conservées telles quelles
+SETTINGS_SCHEMA = {
+    'enabled': bool,
+    'export_json': bool,
+    'export_pretty': bool,
+    'json_codec': str,
+    'write_delay': (int, float),
+    'max_message_size': int,
+    'host_engine': str,
+    'metrics': bool,
+    'log_level': str,
+    'log_max_bytes': int,
+    'log_backup_count': int,
+    'log_rotate_when': str,
+}
+
+def file_signature(path):
+    """Signature (inode, taille, date de modification) d'un fichier, None s'il n'existe pas"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+def atomic_write(path, content):
+    """Écrit des octets via un fichier temporaire, fsync puis os.replace
+
+    Un lecteur voit toujours l'ancienne ou la nouvelle version complète du
+    fichier, jamais une version à moitié écrite. `content` peut aussi être
+    un itérable de blocs d'octets, écrits au fil de l'eau.
+    """
+    # Importé ici : le mode host n'écrit de fichier qu'à l'export ou à la migration
+    import tempfile
+    
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            if isinstance(content, (bytes, bytearray)):
+                f.write(content)
+            else:
+                for chunk in content:
+                    f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+@contextlib.contextmanager
+def file_lock(path, timeout=FILE_LOCK_TIMEOUT):
+    """Verrou exclusif entre processus sur le fichier `path` (créé si besoin)
+
+    fcntl.flock sous Linux et macOS, msvcrt.locking sous Windows ; le
+    verrou est libéré à la sortie du bloc ou à la fin du processus. Sous
+    Windows, le verrou est redemandé tant qu'un autre processus le détient,
+    au plus `timeout` secondes (TimeoutError ensuite) ; les autres erreurs
+    sont levées immédiatement.
+    """
+    with open(path, 'a+b') as f:
+        if sys.platform == 'win32':
+            import errno
+            import msvcrt
+            import time
+            f.seek(0)
+            deadline = time.monotonic() + timeout
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError as e:
+                    if e.errno not in (errno.EACCES, errno.EDEADLOCK):
+                        raise
+                    if time.monotonic() >= deadline:
+                        raise TimeoutError(f"Verrou {path} toujours pris après {timeout} secondes") from e
+                    time.sleep(FILE_LOCK_RETRY_DELAY)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+def detect_source(argv):
+    """Identifie le navigateur qui a lancé le Native Host
+
+    Le navigateur passe l'origine de l'extension en argument mais pas le
+    profil : l'extension peut préciser sa source dans ses messages. Sous
+    Linux, le nom du processus parent (chrome, msedge, brave...) est ajouté.
+    """
+    origin = next((arg for arg in argv if arg.startswith('chrome-extension://')), None)
+    if origin is None:
+        return None
+    browser = None
+    try:
+        with open(f'/proc/{os.getppid()}/comm', 'r', encoding='utf-8') as f:
+            browser = f.read().strip() or None
+    except OSError:
+        pass
+    return f"{browser} {origin}" if browser else origin
+
+def has_setting_type(name, value):
+    """Vérifie qu'une valeur respecte le type déclaré dans SETTINGS_SCHEMA"""
+    expected = SETTINGS_SCHEMA.get(name)
+    if expected is None:
+        return True
+    # bool est une sous-classe d'int : true n'est pas une taille valide
+    if isinstance(value, bool) and expected is not bool:
+        return False
+    return isinstance(value, expected)
+
+class SyncMarkConfig:
+    """Gestionnaire de configuration centralisé
+
+    Le fichier est lu une fois par processus, puis relu seulement quand sa
+    signature change : le Native Host consulte la configuration à chaque
+    message pour le prix d'un os.stat.
+    """
+    
+    # Dernier fichier chargé : chemin, signature et contenu (None si illisible)
+    _path = None
+    _signature = None
+    _settings = {}
+    
+    @staticmethod
+    def load():
+        """Retourne les paramètres, relus si config.json a changé (None s'il est illisible)"""
+        signature = file_signature(CONFIG_FILE)
+        if CONFIG_FILE == SyncMarkConfig._path and signature == SyncMarkConfig._signature:
+            return SyncMarkConfig._settings
+        
+        settings = {}
+        if signature is not None:
+            try:
+                with open(CONFIG_FILE, 'rb') as f:
+                    # Signature du fichier effectivement lu, s'il a été remplacé entre-temps
+                    st = os.fstat(f.fileno())
+                    signature = (st.st_ino, st.st_size, st.st_mtime_ns)
+                    settings = json.loads(f.read())
+                if not isinstance(settings, dict):
+                    raise ValueError("un objet JSON est attendu")
+            except (OSError, ValueError) as e:
+                logging.error(f"Erreur lors de la lecture de la configuration : {e}")
+                settings = None
+        SyncMarkConfig._path = CONFIG_FILE
+        SyncMarkConfig._signature = signature
+        SyncMarkConfig._settings = settings
+        return settings
+    
+    @staticmethod
+    def is_sync_enabled():
+        """Vérifie si la synchronisation est activée"""
+        settings = SyncMarkConfig.load()
+        if settings is None:
+            return False
+        if SyncMarkConfig._signature is None:
+            SyncMarkConfig.update_settings(enabled=True)
+            return True
+        return SyncMarkConfig.get_setting('enabled', False)
+    
+    @staticmethod
+    def get_setting(name, default=None):
+        """Lit un paramètre optionnel de la configuration
+
+        Une valeur qui ne respecte pas SETTINGS_SCHEMA est ignorée.
+        """
+        settings = SyncMarkConfig.load()
+        if not settings or name not in settings:
+            return default
+        value = settings[name]
+        if not has_setting_type(name, value):
+            logging.warning(f"Paramètre {name} ignoré : valeur invalide {value!r}")
+            return default
+        return value
+    
+    @staticmethod
+    def update_settings(**changes):
+        """Modifie des paramètres en conservant les autres
+
+        Le fichier est remplacé atomiquement : un host qui le relit au même
+        moment voit l'ancienne ou la nouvelle version, jamais un fichier
+        tronqué.
+        """
+        try:
+            for name, value in changes.items():
+                if not has_setting_type(name, value):
+                    raise ValueError(f"valeur invalide pour {name} : {value!r}")
+            settings = SyncMarkConfig.load()
+            if settings is None:
+                raise ValueError("configuration illisible")
+            settings = dict(settings, **changes)
+            atomic_write(CONFIG_FILE, json.dumps(settings, indent=4).encode('utf-8'))
+            SyncMarkConfig._path = CONFIG_FILE
+            SyncMarkConfig._signature = file_signature(CONFIG_FILE)
+            SyncMarkConfig._settings = settings
+            return True
+        except Exception as e:
+            logging.error(f"Erreur lors de la sauvegarde de la configuration : {e}")
+            return False
+    
+    @staticmethod
+    def set_sync_enabled(enabled):
+        """Active ou désactive la synchronisation"""
+        return SyncMarkConfig.update_settings(enabled=enabled)
@@ -0,0 +1,188 @@
+"""
+Démon de synchronisation : un seul stockage chargé en mémoire, partagé par
+tous les Native Hosts (profils, navigateurs) via config.DAEMON_ADDRESS
+"""
+
+import logging
+import os
+import sys
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+from . import config
+from .config import atomic_write
+from .framing import MessageDecodeError, decode_payload, send_frames
+from .host import NativeHostManager
+from .ipc import read_daemon_key
+
+# Taille (octets) de la clé d'authentification des connexions
+DAEMON_KEY_SIZE = 32
+
+class DaemonClient(NativeHostManager):
+    """Traitement des messages d'un relais connecté au démon
+
+    Les réponses sont envoyées sur la connexion, trame par trame, suivies
+    d'une trame vide qui marque la fin de la réponse.
+    """
+    
+    def __init__(self, connection, store, max_reply_size, tree_store=None, metrics_recorder=None):
+        super().__init__(store=store, max_reply_size=max_reply_size, tree_store=tree_store,
+                         metrics_recorder=metrics_recorder)
+        self.connection = connection
+    
+    def send_message(self, message_content, metrics=None):
+        frame_count = send_frames(self.connection.send_bytes, message_content, self.max_reply_size, metrics)
+        self.connection.send_bytes(b'')
+        logging.info(f"Réponse envoyée au relais ({frame_count} trame(s))")
+
+class SyncDaemon:
+    """Démon de synchronisation
+
+    Les messages sont traités un par un, sous un même verrou : chaque
+    réponse est calculée sur un état cohérent du stockage.
+    """
+    
+    def __init__(self, address=None, store=None):
+        self.address = address or config.DAEMON_ADDRESS
+        self.authkey = None
+        self.host = NativeHostManager(store=store)
+        self.lock = threading.Lock()
+        self.listener = None
+        self.running = False
+    
+    def open(self):
+        """Ouvre le point d'accès (False si un autre processus y répond déjà)
+
+        Une nouvelle clé d'authentification est publiée dans un fichier
+        0600 ; les connexions qui ne la présentent pas sont refusées. Sous
+        Unix, le socket est créé directement en 0600 (umask) : il n'est
+        jamais accessible aux autres utilisateurs.
+        """
+        if sys.platform != 'win32' and os.path.exists(self.address):
+            try:
+                Client(self.address, authkey=read_daemon_key() or b'').close()
+            except (AuthenticationError, EOFError):
+                logging.error(f"Un autre processus écoute déjà sur {self.address}")
+                return False
+            except OSError:
+                # Socket laissé par un démon arrêté brutalement
+                os.unlink(self.address)
+            else:
+                logging.error(f"Un démon SyncMark écoute déjà sur {self.address}")
+                return False
+        
+        self.authkey = os.urandom(DAEMON_KEY_SIZE)
+        try:
+            if sys.platform == 'win32':
+                self.listener = Listener(self.address, authkey=self.authkey)
+            else:
+                previous_umask = os.umask(0o177)
+                try:
+                    self.listener = Listener(self.address, authkey=self.authkey)
+                finally:
+                    os.umask(previous_umask)
+        except OSError as e:
+            # Sous Windows, le premier tube nommé est créé en exclusivité
+            # (FILE_FLAG_FIRST_PIPE_INSTANCE) : un démon y écoute déjà
+            logging.error(f"Un autre processus écoute déjà sur {self.address} : {e}")
+            return False
+        # Clé publiée seulement une fois le point d'accès obtenu : celle du
+        # démon en cours n'est jamais remplacée. atomic_write crée le fichier
+        # en 0600 (tempfile.mkstemp).
+        atomic_write(config.DAEMON_KEY_FILE_PATH, self.authkey)
+        
+        self.host.load_settings()
+        store = self.host.get_store()
+        # Chargement du cache avant la première connexion
+        store.all_bookmarks()
+        self.running = True
+        logging.info(f"Démon SyncMark démarré sur {self.address}")
+        return True
+    
+    def serve_forever(self):
+        """Accepte les relais jusqu'à l'appel de stop (False si le démarrage échoue)"""
+        if not self.open():
+            return False
+        try:
+            while self.running:
+                try:
+                    connection = self.listener.accept()
+                except AuthenticationError as e:
+                    logging.warning(f"Connexion au démon refusée : {e}")
+                    continue
+                except (OSError, EOFError) as e:
+                    logging.error(f"Erreur de connexion au démon : {e}")
+                    continue
+                if not self.running:
+                    connection.close()
+                    break
+                threading.Thread(target=self.serve_connection, args=(connection,), daemon=True).start()
+        finally:
+            self.close()
+        return True
+    
+    def serve_connection(self, connection):
+        """Traite les messages d'un relais jusqu'à sa déconnexion"""
+        # Les stockages sont ouverts à la demande : l'ouverture est protégée par le verrou
+        with self.lock:
+            client = DaemonClient(connection, self.host.get_store(), self.host.max_reply_size,
+                                  self.host.get_tree_store(), self.host.metrics_recorder)
+        try:
+            try:
+                hello = decode_payload(connection.recv_bytes())
+            except EOFError:
+                return
+            except ValueError as e:
+                logging.error(f"Annonce du relais illisible : {e}")
+                return
+            if isinstance(hello, dict) and isinstance(hello.get('source'), str):
+                client.source = hello['source']
+            logging.info(f"Relais connecté au démon (source : {client.source})")
+            
+            while True:
+                try:
+                    payload = connection.recv_bytes()
+                except EOFError:
+                    logging.info("Relais déconnecté")
+                    break
+                
+                try:
+                    # L'attente du message n'est pas mesurée : pas d'étape `read`
+                    metrics = client.new_metrics()
+                    message = decode_payload(payload, metrics)
+                    del payload
+                    with self.lock:
+                        client.handle_message(message, metrics)
+                except MessageDecodeError as e:
+                    client.send_message(client.decode_error_reply(e))
+                except Exception as e:
+                    logging.error(f"Erreur de traitement d'un message relayé : {e}", exc_info=True)
+                    # Comme le host autonome : le relais reste connecté pour les messages suivants
+                    client.send_message({'status': 'error', 'message': str(e)})
+        except OSError as e:
+            logging.error(f"Connexion au relais perdue : {e}")
+        finally:
+            connection.close()
+    
+    def stop(self):
+        """Demande l'arrêt du démon et débloque l'attente de connexion"""
+        self.running = False
+        try:
+            Client(self.address, authkey=self.authkey).close()
+        except (OSError, EOFError, AuthenticationError):
+            pass
+    
+    def close(self):
+        """Ferme le point d'accès et écrit les changements en attente"""
+        self.running = False
+        if self.listener is not None:
+            self.listener.close()
+            self.listener = None
+        try:
+            os.unlink(config.DAEMON_KEY_FILE_PATH)
+        except OSError:
+            pass
+        with self.lock:
+            self.host.close()
+        logging.info("Démon SyncMark arrêté")
@@ -0,0 +1,418 @@
+"""
+Fichiers de favoris des navigateurs : HTML au format Netscape (export de
+Chrome, Firefox, Edge, Safari) et fichier `Bookmarks` de Chrome (JSON)
+
+Les lecteurs sont des générateurs qui lisent le fichier par blocs et
+produisent des favoris `{url, title, dateAdded, folder}` (`dateAdded` en
+millisecondes depuis l'epoch, `folder` : chemin des dossiers séparés par
+`/`) : la mémoire utilisée ne dépend pas de la taille du fichier. Les
+écritures produisent le fichier par blocs à partir des favoris triés par
+dossier (voir SqliteBookmarkStore.bookmarks_by_folder).
+"""
+
+import html
+import itertools
+import json
+import os
+import re
+
+from .codec import get_codec
+from .framing import STREAM_CHUNK_SIZE, StreamingMessageDecoder
+
+FORMATS = ('html', 'chrome')
+
+# Nombre de favoris mis en forme avant chaque écriture de bloc
+WRITE_BATCH_SIZE = 1000
+
+# Dossiers racines du fichier Bookmarks de Chrome : clé, noms reconnus à
+# l'export (le premier est écrit ; Chrome affiche ses propres libellés)
+CHROME_ROOTS = (
+    ('bookmark_bar', ('Barre de favoris', 'Bookmarks bar', 'Bookmarks Bar')),
+    ('other', ('Autres favoris', 'Other bookmarks', 'Other Bookmarks')),
+    ('synced', ('Favoris sur mobile', 'Mobile bookmarks', 'Mobile Bookmarks')),
+)
+CHROME_ROOT_KEYS = {name: key for key, names in CHROME_ROOTS for name in names}
+# Dates de Chrome : microsecondes depuis le 1er janvier 1601
+CHROME_EPOCH_OFFSET_MS = 11644473600000
+
+NETSCAPE_HEADER = """<!DOCTYPE NETSCAPE-Bookmark-file-1>
+<!-- This is an automatically generated file.
+     It will be read and overwritten.
+     DO NOT EDIT! -->
+<META HTTP-EQUIV="Content-Type" CONTENT="text/html; charset=UTF-8">
+<TITLE>Bookmarks</TITLE>
+<H1>Bookmarks</H1>
+<DL><p>
+"""
+
+# Balises utiles du format Netscape et texte qui les suit (titre d'un lien ou d'un dossier)
+_NETSCAPE_TAG = re.compile(r'<(/?)(a|h3|dl)\b([^>]*)>([^<]*)', re.IGNORECASE)
+_ATTRIBUTE = re.compile(r'''([\w-]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))''')
+
+def make_bookmark(url, title, date_added, folders):
+    """Favori au format de l'extension ; `date_added` en millisecondes ou None"""
+    bookmark = {'url': url, 'title': title}
+    if date_added is not None:
+        bookmark['dateAdded'] = date_added
+    if folders:
+        bookmark['folder'] = '/'.join(folders)
+    return bookmark
+
+def folder_components(bookmark):
+    """Noms des dossiers du chemin `folder` d'un favori"""
+    folder = bookmark.get('folder')
+    if not isinstance(folder, str):
+        return []
+    return [name for name in folder.split('/') if name]
+
+def _text(content):
+    content = html.unescape(content) if '&' in content else content
+    return content.strip()
+
+def read_netscape_html(path, chunk_size=STREAM_CHUNK_SIZE):
+    """Favoris d'un fichier HTML au format Netscape, lus en flux
+
+    Chaque `<H3>` nomme la liste `<DL>` qui le suit ; les liens `<A HREF>`
+    sont rangés dans les dossiers ouverts. Le fichier est lu par blocs ;
+    seule la fin d'un bloc après le dernier `<` est reportée au suivant.
+    """
+    folders = []
+    next_folder = None
+    with open(path, encoding='utf-8', errors='replace') as f:
+        pending = ''
+        while True:
+            chunk = f.read(chunk_size)
+            text = pending + chunk
+            # Une balise ou un titre peut être coupé en fin de bloc
+            end = max(text.rfind('<'), 0) if chunk else len(text)
+            for match in _NETSCAPE_TAG.finditer(text, 0, end):
+                closing, tag, attributes, content = match.groups()
+                tag = tag.lower()
+                if tag == 'dl':
+                    if not closing:
+                        folders.append(next_folder)
+                        next_folder = None
+                    elif folders:
+                        folders.pop()
+                elif closing:
+                    continue
+                elif tag == 'h3':
+                    next_folder = _text(content)
+                else:
+                    values = {name.lower(): double or single or bare
+                              for name, double, single, bare in _ATTRIBUTE.findall(attributes)}
+                    url = html.unescape(values.get('href', '')).strip()
+                    if not url:
+                        continue
+                    date_added = values.get('add_date', '')
+                    yield make_bookmark(url, _text(content),
+                                        int(date_added) * 1000 if date_added.isdigit() else None,
+                                        [name for name in folders if name])
+            if not chunk:
+                return
+            pending = text[end:]
+
+def netscape_html_chunks(bookmarks):
+    """Fichier HTML au format Netscape, en blocs d'octets
+
+    `bookmarks` doit être trié par dossier (voir bookmarks_by_folder) :
+    chaque dossier est ouvert une seule fois.
+    """
+    escape = html.escape
+    yield NETSCAPE_HEADER.encode('utf-8')
+    opened = []
+    lines = []
+    for bookmark in bookmarks:
+        url = bookmark.get('url')
+        if not isinstance(url, str):
+            continue
+        components = folder_components(bookmark)
+        common = 0
+        while common < min(len(opened), len(components)) and opened[common] == components[common]:
+            common += 1
+        while len(opened) > common:
+            opened.pop()
+            lines.append('    ' * (len(opened) + 1) + '</DL><p>\n')
+        for name in components[common:]:
+            indent = '    ' * (len(opened) + 1)
+            toolbar = ''
+            if not opened and CHROME_ROOT_KEYS.get(name) == 'bookmark_bar':
+                toolbar = ' PERSONAL_TOOLBAR_FOLDER="true"'
+            lines.append(f'{indent}<DT><H3{toolbar}>{escape(name)}</H3>\n{indent}<DL><p>\n')
+            opened.append(name)
+        
+        title = bookmark.get('title')
+        date_added = bookmark.get('dateAdded')
+        add_date = (f' ADD_DATE="{int(date_added) // 1000}"'
+                    if isinstance(date_added, (int, float)) and not isinstance(date_added, bool) else '')
+        lines.append(f'{"    " * (len(opened) + 1)}<DT><A HREF="{escape(url)}"{add_date}>'
+                     f'{escape(title) if isinstance(title, str) else ""}</A>\n')
+        if len(lines) >= WRITE_BATCH_SIZE:
+            yield ''.join(lines).encode('utf-8')
+            lines = []
+    while opened:
+        opened.pop()
+        lines.append('    ' * (len(opened) + 1) + '</DL><p>\n')
+    lines.append('</DL><p>\n')
+    yield ''.join(lines).encode('utf-8')
+
+def chrome_date(value):
+    """Date de Chrome (chaîne de microsecondes depuis 1601) en millisecondes depuis l'epoch, ou None"""
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value // 1000 - CHROME_EPOCH_OFFSET_MS if value > 0 else None
+
+class ChromeBookmarksReader(StreamingMessageDecoder):
+    """Analyse en flux d'un fichier `Bookmarks` de Chrome
+
+    Les nœuds complets de la fenêtre de texte sont analysés d'un bloc ; un
+    dossier à cheval sur la fin de la fenêtre est parcouru membre par
+    membre, si bien que seule une fenêtre de la taille d'un bloc est gardée
+    en mémoire. Chrome écrit les clés dans l'ordre alphabétique : le nom
+    d'un dossier (`name`) suit ses enfants (`children`). Les dossiers sont
+    donc numérotés dans l'ordre où leurs enfants commencent ; une première
+    passe relève leurs noms (`found_names`), passés à la seconde
+    (`folder_names`) qui produit les favoris.
+    """
+    
+    def __init__(self, stream, length, folder_names=None, chunk_size=STREAM_CHUNK_SIZE):
+        super().__init__(stream, length, chunk_size)
+        self.folder_names = folder_names
+        self.found_names = []
+        self.folder_count = 0
+    
+    def _object_keys(self):
+        """Parcourt un objet : produit chaque clé, sa valeur étant lue par l'appelant"""
+        self._expect('{')
+        if self._peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self._value()
+            if not isinstance(key, str):
+                raise json.JSONDecodeError("Clé attendue", self.text, self.pos)
+            self._expect(':')
+            yield key
+            separator = self._peek()
+            self.pos += 1
+            if separator == '}':
+                return
+            if separator != ',':
+                raise json.JSONDecodeError("',' ou '}' attendu", self.text, self.pos - 1)
+    
+    def _open_folder(self, folders):
+        """Numérote un dossier et retourne (numéro, chemin de ses enfants)"""
+        index = self.folder_count
+        self.folder_count += 1
+        if self.folder_names is None:
+            self.found_names.append('')
+            return index, folders
+        name = self.folder_names[index] if index < len(self.folder_names) else ''
+        return index, (folders + (name,) if name else folders)
+    
+    def _close_folder(self, index, name):
+        if self.folder_names is None and isinstance(name, str):
+            self.found_names[index] = name.strip()
+    
+    def _bookmark(self, node, folders):
+        url = node.get('url')
+        if self.folder_names is None or not isinstance(url, str) or not url.strip():
+            return None
+        title = node.get('name')
+        return make_bookmark(url.strip(), title.strip() if isinstance(title, str) else '',
+                             chrome_date(node.get('date_added')), folders)
+    
+    def _node(self, node, folders):
+        """Favoris d'un nœud déjà analysé"""
+        children = node.get('children')
+        if isinstance(children, list):
+            index, folders = self._open_folder(folders)
+            for child in children:
+                if isinstance(child, dict):
+                    yield from self._node(child, folders)
+            self._close_folder(index, node.get('name'))
+            return
+        bookmark = self._bookmark(node, folders)
+        if bookmark is not None:
+            yield bookmark
+    
+    def _streamed_node(self, folders):
+        """Favoris d'un nœud parcouru membre par membre"""
+        fields = {}
+        index = None
+        for key in self._object_keys():
+            if key == 'children' and self._peek() == '[':
+                index, children_folders = self._open_folder(folders)
+                yield from self._children(children_folders)
+            else:
+                fields[key] = self._value()
+        if index is not None:
+            self._close_folder(index, fields.get('name'))
+            return
+        bookmark = self._bookmark(fields, folders)
+        if bookmark is not None:
+            yield bookmark
+    
+    def _children(self, folders):
+        self._expect('[')
+        if self._peek() == ']':
+            self.pos += 1
+            return
+        raw_decode = self.json_decoder.raw_decode
+        while True:
+            first = self._peek()
+            node = None
+            if first == '{':
+                try:
+                    node, self.pos = raw_decode(self.text, self.pos)
+                except json.JSONDecodeError:
+                    # Nœud coupé par la fin de la fenêtre
+                    if not self.remaining:
+                        raise
+            if node is not None:
+                yield from self._node(node, folders)
+            elif first == '{':
+                yield from self._streamed_node(folders)
+            else:
+                self._value()
+            separator = self._peek()
+            self.pos += 1
+            if separator == ']':
+                return
+            if separator != ',':
+                raise json.JSONDecodeError("',' ou ']' attendu", self.text, self.pos - 1)
+    
+    def bookmarks(self):
+        """Favoris des dossiers racines (`roots`), dans l'ordre du fichier"""
+        for key in self._object_keys():
+            if key != 'roots' or self._peek() != '{':
+                self._value()
+                continue
+            for _ in self._object_keys():
+                if self._peek() == '{':
+                    yield from self._streamed_node(())
+                else:
+                    self._value()
+        if self._peek():
+            raise json.JSONDecodeError("Données en trop", self.text, self.pos)
+
+def read_chrome_bookmarks(path, chunk_size=STREAM_CHUNK_SIZE):
+    """Favoris d'un fichier `Bookmarks` de Chrome, lus en flux (deux passes, voir ChromeBookmarksReader)"""
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        reader = ChromeBookmarksReader(f, size, chunk_size=chunk_size)
+        for _ in reader.bookmarks():
+            pass
+    with open(path, 'rb') as f:
+        yield from ChromeBookmarksReader(f, size, reader.found_names, chunk_size).bookmarks()
+
+def _chrome_folder_chunks(key, name, root_id, bookmarks, ids):
+    """Dossier racine `key` du fichier Bookmarks et ses sous-dossiers, en blocs d'octets
+
+    `bookmarks` : paires (chemin relatif à la racine, favori), triées par
+    dossier. `ids` fournit les identifiants des autres nœuds.
+    """
+    encode = get_codec().dumps
+    
+    def folder_end(folder_name, folder_id):
+        return (b'],"date_added":"0","date_modified":"0","id":"%d","name":' % folder_id
+                + encode(folder_name) + b',"type":"folder"}')
+    
+    parts = [encode(key) + b':{"children":[']
+    # Dossiers ouverts : (nom, identifiant, aucun enfant écrit)
+    opened = [(name, root_id, True)]
+    count = 0
+    for components, bookmark in bookmarks:
+        common = 0
+        while common < min(len(opened) - 1, len(components)) and opened[common + 1][0] == components[common]:
+            common += 1
+        while len(opened) - 1 > common:
+            folder_name, folder_id, _ = opened.pop()
+            parts.append(folder_end(folder_name, folder_id))
+        for folder_name in components[common:]:
+            parent_name, parent_id, empty = opened[-1]
+            parts.append(b'{"children":[' if empty else b',{"children":[')
+            opened[-1] = (parent_name, parent_id, False)
+            opened.append((folder_name, next(ids), True))
+        
+        title = bookmark.get('title')
+        date_added = bookmark.get('dateAdded')
+        node = {
+            'date_added': (str((int(date_added) + CHROME_EPOCH_OFFSET_MS) * 1000)
+                           if isinstance(date_added, (int, float)) and not isinstance(date_added, bool) else '0'),
+            'id': str(next(ids)),
+            'name': title if isinstance(title, str) else '',
+            'type': 'url',
+            'url': bookmark['url'],
+        }
+        parent_name, parent_id, empty = opened[-1]
+        parts.append(encode(node) if empty else b',' + encode(node))
+        opened[-1] = (parent_name, parent_id, False)
+        count += 1
+        if count % WRITE_BATCH_SIZE == 0:
+            yield b''.join(parts)
+            parts = []
+    while opened:
+        folder_name, folder_id, _ = opened.pop()
+        parts.append(folder_end(folder_name, folder_id))
+    yield b''.join(parts)
+
+def chrome_json_chunks(bookmarks_by_folder):
+    """Fichier `Bookmarks` de Chrome, en blocs d'octets
+
+    `bookmarks_by_folder` retourne à chaque appel un nouvel itérateur des
+    favoris triés par dossier ; il est parcouru une fois par dossier
+    racine. Un favori dont le premier dossier porte le nom d'une racine
+    (« Barre de favoris », « Other bookmarks »...) y est rangé, les autres
+    vont dans « Autres favoris ». Chrome complète les champs absents
+    (guid, somme de contrôle) au chargement.
+    """
+    def root_bookmarks(root_key):
+        for bookmark in bookmarks_by_folder():
+            if not isinstance(bookmark.get('url'), str):
+                continue
+            components = folder_components(bookmark)
+            key = CHROME_ROOT_KEYS.get(components[0]) if components else None
+            if key is None:
+                key = 'other'
+            elif key == root_key:
+                components = components[1:]
+            if key == root_key:
+                yield components, bookmark
+    
+    # Identifiants 1 à 3 : dossiers racines, dans l'ordre de Chrome
+    ids = itertools.count(len(CHROME_ROOTS) + 1)
+    yield b'{"roots":{'
+    for index, (key, names) in enumerate(CHROME_ROOTS):
+        if index:
+            yield b','
+        yield from _chrome_folder_chunks(key, names[0], index + 1, root_bookmarks(key), ids)
+    yield b'},"version":1}\n'
+
+def detect_format(path):
+    """Format d'un fichier de favoris existant d'après son contenu ('html' ou 'chrome')"""
+    with open(path, 'rb') as f:
+        start = f.read(512).lstrip(b'\xef\xbb\xbf \t\r\n')
+    if start.startswith(b'{'):
+        return 'chrome'
+    if start.startswith(b'<'):
+        return 'html'
+    raise ValueError(f"Format de fichier de favoris inconnu : {path}")
+
+def export_format(path):
+    """Format d'export d'après l'extension du fichier : HTML pour .html/.htm, Chrome sinon"""
+    return 'html' if os.path.splitext(path)[1].lower() in ('.html', '.htm') else 'chrome'
+
+def read_bookmark_file(path, file_format=None):
+    """Favoris d'un fichier HTML ou Bookmarks de Chrome (format détecté si `file_format` est None)"""
+    if (file_format or detect_format(path)) == 'html':
+        return read_netscape_html(path)
+    return read_chrome_bookmarks(path)
+
+def export_chunks(bookmarks_by_folder, file_format):
+    """Blocs d'octets du fichier d'export ; `bookmarks_by_folder` comme pour chrome_json_chunks"""
+    if file_format == 'html':
+        return netscape_html_chunks(bookmarks_by_folder())
+    return chrome_json_chunks(bookmarks_by_folder)
@@ -0,0 +1,399 @@
+"""
+Découpage en trames des messages natifs (longueur sur 4 octets + JSON UTF-8)
+"""
+
+import codecs
+import io
+import itertools
+import json
+import re
+import struct
+
+from .codec import get_codec
+from .metrics import NULL_METRICS
+
+# Taille maximale d'un message reçu de l'extension (limite de Chrome : 64 Mo)
+MAX_MESSAGE_SIZE = 64 * 1024 * 1024
+# Au-delà de cette taille, un message est analysé en flux par blocs de cette taille
+STREAM_CHUNK_SIZE = 1024 * 1024
+# Taille maximale d'un message envoyé à l'extension (limite de Chrome : 1 Mo)
+MAX_REPLY_SIZE = 1024 * 1024
+
+# Nombre de virgules essayées pour découper un lot d'éléments en flux
+BATCH_CUT_ATTEMPTS = 8
+# Taille des blocs lus pour ignorer un message trop volumineux
+SKIP_CHUNK_SIZE = 64 * 1024
+# Nombre d'octets d'un message illisible conservés pour la quarantaine
+DECODE_ERROR_PREVIEW = 4096
+
+class MessageTooLargeError(ValueError):
+    """Message de l'extension dépassant la taille maximale autorisée"""
+
+class MessageDecodeError(ValueError):
+    """Message de l'extension reçu en entier mais illisible (JSON ou UTF-8 invalide)
+
+    Le flux reste aligné sur le message suivant : le host peut répondre par
+    une erreur et continuer. `payload` contient le début du message.
+    """
+    
+    def __init__(self, error, payload=''):
+        super().__init__(f"Message illisible : {error}")
+        self.payload = payload
+
+def decode_error(error, payload):
+    """MessageDecodeError avec le début de `payload` (octets) décodé sans erreur"""
+    return MessageDecodeError(error, bytes(payload[:DECODE_ERROR_PREVIEW]).decode('utf-8', errors='replace'))
+
+def read_exact(stream, size):
+    """Lit exactement `size` octets dans un tampon préalloué
+
+    Les lectures partielles (pipes) sont complétées en boucle, sans
+    concaténation de morceaux intermédiaires. Retourne None si le flux est
+    fermé avant le premier octet.
+    """
+    buffer = bytearray(size)
+    with memoryview(buffer) as view:
+        received = 0
+        while received < size:
+            count = stream.readinto(view[received:])
+            if not count:
+                if received == 0:
+                    return None
+                raise EOFError(f"Message tronqué : {received} octets reçus sur {size}")
+            received += count
+    return buffer
+
+def skip_bytes(stream, size):
+    """Consomme et ignore `size` octets pour rester aligné sur le message suivant"""
+    while size > 0:
+        chunk = stream.read(min(size, SKIP_CHUNK_SIZE))
+        if not chunk:
+            raise EOFError("Flux fermé pendant l'abandon d'un message")
+        size -= len(chunk)
+
+def encode_frames(message, max_size=MAX_REPLY_SIZE):
+    """Encode un message en une ou plusieurs trames d'au plus `max_size` octets
+
+    Les éléments des listes du message sont encodés un par un. Si le message
+    tient dans une trame, il est envoyé tel quel. Sinon les listes sont
+    découpées en trames partielles
+    `{"status": "partial", "chunk": n, "field": nom, "items": [...]}`
+    suivies d'une trame finale contenant les autres champs du message et le
+    nombre de trames partielles (`chunks`). Si le message porte un `id`,
+    chaque trame partielle le reprend. L'extension reconstitue chaque
+    liste en concaténant les `items` dans l'ordre des `chunk`. Seule une
+    trame à la fois est gardée encodée en mémoire.
+    """
+    _encode_json = get_codec().dumps
+    scalars = {key: value for key, value in message.items() if not isinstance(value, list)}
+    fields = [(key, value) for key, value in message.items() if isinstance(value, list)]
+    header = [_encode_json(key) + b':' + _encode_json(value) for key, value in scalars.items()]
+    
+    # Tentative en une seule trame
+    budget = max_size - 2 - sum(len(part) + 1 for part in header)
+    encoded_fields = []
+    overflow = False
+    for key, items in fields:
+        budget -= len(_encode_json(key)) + 4
+        iterator = iter(items)
+        parts = []
+        for item in iterator:
+            parts.append(_encode_json(item))
+            budget -= len(parts[-1]) + 1
+            if budget < 0:
+                overflow = True
+                break
+        encoded_fields.append((key, parts, iterator))
+        if overflow:
+            break
+    
+    if not overflow:
+        members = header + [_encode_json(key) + b':[' + b','.join(parts) + b']'
+                            for key, parts, _ in encoded_fields]
+        yield b'{' + b','.join(members) + b'}'
+        return
+    
+    # Mode découpé : les éléments déjà encodés sont réutilisés
+    partial_status = b'{"status":"partial",'
+    if 'id' in scalars:
+        partial_status += b'"id":' + _encode_json(scalars['id']) + b','
+    chunk = 0
+    for index, (key, items) in enumerate(fields):
+        if index < len(encoded_fields):
+            _, parts, iterator = encoded_fields[index]
+            encoded_items = itertools.chain(parts, map(_encode_json, iterator))
+        else:
+            encoded_items = map(_encode_json, items)
+        
+        prefix = partial_status + b'"chunk":%d,"field":' % chunk + _encode_json(key) + b',"items":['
+        batch, size = [], 0
+        for part in encoded_items:
+            if len(prefix) + len(part) + 2 > max_size:
+                raise MessageTooLargeError(f"Élément de {len(part)} octets trop grand pour une trame")
+            if batch and len(prefix) + size + len(part) + 2 > max_size:
+                yield prefix + b','.join(batch) + b']}'
+                chunk += 1
+                prefix = partial_status + b'"chunk":%d,"field":' % chunk + _encode_json(key) + b',"items":['
+                batch, size = [], 0
+            batch.append(part)
+            size += len(part) + 1
+        if batch:
+            yield prefix + b','.join(batch) + b']}'
+            chunk += 1
+        # Chaque trame ne contient qu'un seul champ : on libère ce qui a été consommé
+        if index < len(encoded_fields):
+            encoded_fields[index] = (key, [], iter(()))
+    
+    yield _encode_json(dict(scalars, chunks=chunk))
+
+class StreamingMessageDecoder:
+    """Analyse JSON en flux d'un message natif volumineux
+
+    Le contenu est lu par blocs dans un tampon préalloué et décodé au fil de
+    l'eau : seule une fenêtre de texte de la taille d'un bloc est conservée,
+    jamais le message complet en octets ou en chaîne. Les tableaux de premier
+    niveau (par exemple `bookmarks`) sont construits élément par élément ;
+    les autres valeurs sont analysées d'un bloc par `json`.
+    """
+    
+    WHITESPACE = re.compile(r'[ \t\n\r]*')
+    SEPARATOR = re.compile(r'[ \t\n\r]*,')
+    
+    def __init__(self, stream, length, chunk_size=STREAM_CHUNK_SIZE):
+        self.stream = stream
+        self.remaining = length
+        self.buffer = bytearray(min(chunk_size, length))
+        self.text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self.json_decoder = json.JSONDecoder()
+        self.text = ''
+        self.pos = 0
+    
+    def _fill(self):
+        """Ajoute un bloc à la fenêtre de texte (False si le message est entièrement lu)"""
+        if not self.remaining:
+            return False
+        with memoryview(self.buffer) as view:
+            count = self.stream.readinto(view[:min(self.remaining, len(self.buffer))])
+            if not count:
+                raise EOFError(f"Message tronqué : {self.remaining} octets manquants")
+            self.remaining -= count
+            decoded = self.text_decoder.decode(view[:count], final=not self.remaining)
+        self.text = self.text[self.pos:] + decoded
+        self.pos = 0
+        return True
+    
+    def _peek(self):
+        """Retourne le prochain caractère significatif sans le consommer"""
+        while True:
+            self.pos = self.WHITESPACE.match(self.text, self.pos).end()
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self._fill():
+                return ''
+    
+    def _expect(self, char):
+        if self._peek() != char:
+            raise json.JSONDecodeError(f"'{char}' attendu", self.text, self.pos)
+        self.pos += 1
+    
+    def _value(self):
+        """Analyse une valeur complète, en agrandissant la fenêtre si nécessaire"""
+        self._peek()
+        while True:
+            try:
+                value, end = self.json_decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if not self.remaining:
+                    raise
+                end = None
+            # Un nombre en fin de fenêtre peut être coupé : on relit avec la suite
+            if end is not None and (end < len(self.text) or not self.remaining):
+                self.pos = end
+                return value
+            # Agrandissement géométrique : une grande valeur n'est pas
+            # réanalysée à chaque bloc
+            target = 2 * (len(self.text) - self.pos)
+            while len(self.text) - self.pos < target and self._fill():
+                pass
+    
+    def _array(self):
+        self._expect('[')
+        items = []
+        if self._peek() == ']':
+            self.pos += 1
+            return items
+        
+        decode = get_codec().loads
+        while True:
+            # Les éléments complets de la fenêtre sont analysés en un seul
+            # appel : "[" + texte jusqu'à une virgule + "]" n'est du JSON valide
+            # que si la virgule sépare deux éléments de ce tableau.
+            self._peek()
+            text, pos = self.text, self.pos
+            cuts = self._batch_cuts(text, pos)
+            for _, cut in zip(range(BATCH_CUT_ATTEMPTS), cuts):
+                try:
+                    items.extend(decode('[' + text[pos:cut] + ']'))
+                except ValueError:
+                    continue
+                self.pos = cut + 1
+                break
+            
+            # L'élément à cheval sur la fin de la fenêtre est analysé seul
+            items.append(self._value())
+            separator = self._peek()
+            self.pos += 1
+            if separator == ']':
+                return items
+            if separator != ',':
+                raise json.JSONDecodeError("',' ou ']' attendu", self.text, self.pos - 1)
+    
+    def _batch_cuts(self, text, start):
+        """Virgules candidates pour découper un lot, de la fin vers le début
+
+        Les éléments d'un tableau étant en pratique homogènes, seule une
+        virgule qui suit la fin d'une valeur du type du premier élément
+        (objet, tableau ou chaîne) est proposée.
+        """
+        closer = {'{': '}', '[': ']', '"': '"'}.get(text[start:start + 1])
+        end = len(text)
+        while True:
+            end = text.rfind(closer, start, end) if closer else text.rfind(',', start, end) - 1
+            if end < start:
+                return
+            match = self.SEPARATOR.match(text, end + 1)
+            if match:
+                yield match.end() - 1
+    
+    def _member_value(self):
+        return self._array() if self._peek() == '[' else self._value()
+    
+    def decode(self):
+        """Analyse le message complet et retourne l'objet Python"""
+        first = self._peek()
+        if first == '[':
+            result = self._array()
+        elif first == '{':
+            self.pos += 1
+            result = {}
+            if self._peek() == '}':
+                self.pos += 1
+            else:
+                while True:
+                    key = self._value()
+                    if not isinstance(key, str):
+                        raise json.JSONDecodeError("Clé attendue", self.text, self.pos)
+                    self._expect(':')
+                    result[key] = self._member_value()
+                    separator = self._peek()
+                    self.pos += 1
+                    if separator == '}':
+                        break
+                    if separator != ',':
+                        raise json.JSONDecodeError("',' ou '}' attendu", self.text, self.pos - 1)
+        else:
+            result = self._value()
+        
+        if self._peek():
+            raise json.JSONDecodeError("Données en trop", self.text, self.pos)
+        return result
+
+def read_message(stream, max_size=MAX_MESSAGE_SIZE, metrics=None):
+    """Lit un message depuis un flux binaire (None si le flux est fermé)
+
+    Les messages plus grands qu'un bloc sont analysés en flux (voir
+    StreamingMessageDecoder) ; les autres sont lus dans un tampon préalloué.
+    Si `metrics` est fourni, la lecture est chronométrée à partir de l'en-tête
+    (l'attente du message n'est pas comptée) ; la lecture d'un message
+    analysé en flux est comptée dans le décodage.
+    """
+    raw_length = read_exact(stream, 4)
+    if raw_length is None:
+        return None
+    
+    metrics = metrics or NULL_METRICS
+    message_length = struct.unpack('@I', raw_length)[0]
+    metrics.set(bytes_in=message_length)
+    if message_length > max_size:
+        skip_bytes(stream, message_length)
+        raise MessageTooLargeError(
+            f"Message de {message_length} octets refusé (maximum {max_size})"
+        )
+    
+    if message_length > STREAM_CHUNK_SIZE:
+        with metrics.stage('decode'):
+            decoder = StreamingMessageDecoder(stream, message_length)
+            try:
+                return decoder.decode()
+            except EOFError:
+                raise
+            except ValueError as e:
+                # La fin du message est ignorée pour lire le suivant
+                skip_bytes(stream, decoder.remaining)
+                raise MessageDecodeError(e, decoder.text[:DECODE_ERROR_PREVIEW]) from e
+    
+    with metrics.stage('read'):
+        payload = read_exact(stream, message_length) if message_length else bytearray()
+    if payload is None:
+        raise EOFError("Flux fermé avant le contenu du message")
+    with metrics.stage('decode'):
+        codec = get_codec()
+        try:
+            if codec.parses_bytes:
+                return codec.loads(payload)
+            message_json = payload.decode('utf-8')
+        except ValueError as e:
+            raise decode_error(e, payload) from e
+        # Le tampon est libéré avant l'analyse
+        preview = payload[:DECODE_ERROR_PREVIEW]
+        del payload
+        try:
+            return codec.loads(message_json)
+        except ValueError as e:
+            raise decode_error(e, preview) from e
+
+def decode_payload(payload, metrics=None):
+    """Analyse le contenu d'un message déjà reçu en entier (relais du démon)"""
+    metrics = metrics or NULL_METRICS
+    metrics.set(bytes_in=len(payload))
+    with metrics.stage('decode'):
+        try:
+            if len(payload) > STREAM_CHUNK_SIZE:
+                return StreamingMessageDecoder(io.BytesIO(payload), len(payload)).decode()
+            codec = get_codec()
+            return codec.loads(payload if codec.parses_bytes else payload.decode('utf-8'))
+        except (EOFError, ValueError) as e:
+            raise decode_error(e, payload) from e
+
+def send_frames(send, message, max_size=MAX_REPLY_SIZE, metrics=None):
+    """Encode un message en trames et passe chacune à `send`
+
+    Retourne le nombre de trames. L'encodage et l'envoi alternent trame par
+    trame ; si `metrics` est fourni, leurs durées sont cumulées séparément.
+    """
+    metrics = metrics or NULL_METRICS
+    frames = encode_frames(message, max_size)
+    frame_count = size = 0
+    while True:
+        with metrics.stage('encode'):
+            encoded_content = next(frames, None)
+        if encoded_content is None:
+            break
+        with metrics.stage('write'):
+            send(encoded_content)
+        frame_count += 1
+        size += len(encoded_content)
+    metrics.set(frames=frame_count, bytes_out=size)
+    return frame_count
+
+def write_message(stream, message, max_size=MAX_REPLY_SIZE, metrics=None):
+    """Écrit un message sur un flux binaire et retourne le nombre de trames"""
+    def send(encoded_content):
+        stream.write(struct.pack('@I', len(encoded_content)))
+        stream.write(encoded_content)
+    
+    metrics = metrics or NULL_METRICS
+    frame_count = send_frames(send, message, max_size, metrics)
+    with metrics.stage('write'):
+        stream.flush()
+    return frame_count
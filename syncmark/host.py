@@ -0,0 +1,349 @@
+"""
+Native Host : boucle de communication avec l'extension sur stdin/stdout
+"""
+
+import logging
+import sqlite3
+import sys
+
+from . import config
+from .config import SyncMarkConfig
+from .framing import (MAX_MESSAGE_SIZE, MAX_REPLY_SIZE, MessageDecodeError, MessageTooLargeError, read_message,
+                      write_message)
+from .merge import delta_reply, full_reply, parse_delta
+from .metrics import NULL_METRICS, MessageMetrics, MetricsRecorder, set_counts
+from .search import DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT
+from .store import DEFAULT_WRITE_DELAY, CachedBookmarkStore, SqliteBookmarkStore, WriteBehindStore
+from .validation import QuarantineRecorder, validate_bookmarks
+
+def with_request_id(reply, message):
+    """Ajoute à la réponse l'identifiant de la requête, s'il est fourni"""
+    if isinstance(message, dict) and 'id' in message:
+        reply['id'] = message['id']
+    return reply
+
+class NativeHostManager:
+    """Gestionnaire du Native Host pour communication avec Chrome"""
+    
+    def __init__(self, store=None, write_delay=0, max_message_size=MAX_MESSAGE_SIZE,
+                 max_reply_size=MAX_REPLY_SIZE, source=None, tree_store=None, metrics_recorder=None):
+        self.running = False
+        self.store = store
+        self.tree_store = tree_store
+        self.write_delay = write_delay
+        self.max_message_size = max_message_size
+        self.max_reply_size = max_reply_size
+        # Navigateur/profil par défaut des changements reçus (voir config.detect_source)
+        self.source = source
+        # Mesures par message (voir syncmark.metrics), activées par load_settings
+        self.metrics_recorder = metrics_recorder
+        # Entrées rejetées des messages, ouvert au premier rejet (voir quarantine)
+        self.quarantine_recorder = None
+    
+    def get_store(self):
+        """Ouvre le stockage des favoris à la première utilisation"""
+        if self.store is None:
+            export_path = config.BOOKMARKS_FILE_PATH if SyncMarkConfig.get_setting('export_json', False) else None
+            self.store = WriteBehindStore(
+                CachedBookmarkStore(SqliteBookmarkStore(config.STORE_FILE_PATH, auto_checkpoint=False)),
+                delay=self.write_delay,
+                export_path=export_path,
+                export_pretty=SyncMarkConfig.get_setting('export_pretty', False)
+            )
+        return self.store
+    
+    def get_tree_store(self):
+        """Ouvre l'arborescence des favoris à la première synchronisation de type `tree`"""
+        if self.tree_store is None:
+            from .tree import SqliteTreeStore
+            self.tree_store = SqliteTreeStore(config.STORE_FILE_PATH)
+        return self.tree_store
+    
+    def new_metrics(self):
+        """Mesures d'un nouveau message, None si elles ne sont pas enregistrées"""
+        return MessageMetrics() if self.metrics_recorder is not None else None
+    
+    def record_metrics(self, metrics):
+        """Enregistre les mesures d'un message, une fois sa réponse envoyée"""
+        if metrics is not None and self.metrics_recorder is not None:
+            self.metrics_recorder.write(metrics)
+    
+    def get_message(self, metrics=None):
+        """Lit un message depuis stdin"""
+        message = read_message(sys.stdin.buffer, self.max_message_size, metrics)
+        if message is not None:
+            logging.info("Message reçu de l'extension")
+        return message
+    
+    def send_message(self, message_content, metrics=None):
+        """Envoie un message à stdout, découpé en trames si nécessaire (voir encode_frames)"""
+        frame_count = write_message(sys.stdout.buffer, message_content, self.max_reply_size, metrics)
+        logging.info(f"Message envoyé à l'extension ({frame_count} trame(s))")
+    
+    def message_source(self, message):
+        """Source des changements d'un message : `source` fourni par l'extension, sinon celle du host"""
+        source = message.get('source')
+        return source if isinstance(source, str) else self.source
+    
+    def quarantine(self, rejected, message):
+        """Compte les entrées rejetées d'un message et les écrit dans le fichier de quarantaine"""
+        set_counts(rejected=len(rejected))
+        if not rejected:
+            return
+        logging.warning(f"{len(rejected)} entrée(s) rejetée(s) : {rejected[0][3]}"
+                        + (" ..." if len(rejected) > 1 else ""))
+        if self.quarantine_recorder is None:
+            self.quarantine_recorder = QuarantineRecorder(config.QUARANTINE_FILE_PATH)
+        if isinstance(message, dict):
+            self.quarantine_recorder.write(rejected, self.message_source(message), message.get('type') or 'full')
+        else:
+            self.quarantine_recorder.write(rejected, self.source)
+    
+    def decode_error_reply(self, error):
+        """Réponse à un message illisible (MessageDecodeError), mis en quarantaine"""
+        self.quarantine([('message', None, error.payload, f'invalid JSON: {error.__cause__ or error}')], None)
+        return {'status': 'error', 'message': 'Invalid JSON'}
+    
+    def apply_changes(self, upserts, removals, source=None):
+        """Applique des changements au stockage
+
+        Retourne (stockage, None), ou (None, réponse d'erreur) si le stockage
+        ne peut être lu ou écrit.
+        """
+        try:
+            store = self.get_store()
+        except sqlite3.Error as e:
+            logging.error(f"Erreur lecture favoris locaux : {e}")
+            return None, {
+                'status': 'error',
+                'message': 'Could not read local bookmarks file'
+            }
+        
+        try:
+            store.apply(upserts, removals, source)
+        except sqlite3.Error as e:
+            logging.error(f"Erreur sauvegarde favoris : {e}")
+            return None, {
+                'status': 'error',
+                'message': 'Could not write bookmarks file'
+            }
+        return store, None
+    
+    def sync_reply(self, message):
+        """Réponse à une synchronisation des favoris (complète ou différentielle)"""
+        if message.get('type') == 'delta':
+            return self.delta_sync_reply(message)
+        if message.get('type') == 'tree':
+            return self.tree_sync_reply(message)
+        if message.get('type') == 'search':
+            return self.search_reply(message)
+        
+        extension_bookmarks, rejected = validate_bookmarks(message.get('bookmarks', []))
+        set_counts(bookmarks_in=len(extension_bookmarks))
+        self.quarantine(rejected, message)
+        
+        # Fusion des favoris
+        store, error = self.apply_changes(extension_bookmarks, [], self.message_source(message))
+        if store is None:
+            return error
+        
+        reply = full_reply(store)
+        if rejected:
+            reply['rejected'] = len(rejected)
+        logging.info(f"Fusion : {len(extension_bookmarks)} extension = {len(reply['bookmarks'])} uniques")
+        return reply
+    
+    def delta_sync_reply(self, message):
+        """Réponse à une synchronisation différentielle
+
+        Le message contient la dernière révision connue de l'extension et ses
+        changements locaux (`added`, `changed`, `removed`). La réponse ne
+        contient que les changements survenus depuis cette révision, ou la
+        liste complète si la révision n'est pas reconnue.
+        """
+        client_revision, upserts, removals, rejected = parse_delta(message)
+        set_counts(bookmarks_in=len(upserts) + len(removals))
+        self.quarantine(rejected, message)
+        
+        store, error = self.apply_changes(upserts, removals, self.message_source(message))
+        if store is None:
+            return error
+        logging.info(f"Delta : {len(upserts)} modifiés, {len(removals)} supprimés "
+                     f"depuis la révision {client_revision}")
+        
+        reply = delta_reply(store, client_revision, upserts, removals)
+        if rejected:
+            reply['rejected'] = len(rejected)
+        if reply['mode'] == 'full':
+            logging.info(f"Révision {client_revision} inconnue - synchronisation complète")
+        return reply
+    
+    def tree_sync_reply(self, message):
+        """Réponse à une synchronisation de l'arborescence (dossiers et ordre)
+
+        Le message contient l'arbre de l'extension (`tree`, au format de
+        chrome.bookmarks.getTree) et la révision reçue lors de la dernière
+        synchronisation. Voir syncmark.tree pour les règles de fusion. Sans
+        arbre, l'extension envoie seulement son empreinte racine
+        (`root_hash`) et, si elle les connaît, celles de ses dossiers
+        (`hashes`) : la réponse indique si les arbres sont identiques, ou
+        contient les seuls dossiers qui diffèrent.
+        """
+        from .tree import tree_reply, tree_summary_reply
+        
+        try:
+            tree_store = self.get_tree_store()
+            if 'tree' not in message and isinstance(message.get('root_hash'), str):
+                reply = tree_summary_reply(tree_store, message['root_hash'], message.get('hashes'))
+                logging.info(f"Empreinte de l'arborescence : {reply['mode']}")
+                return reply
+            merge = tree_store.merge(message.get('tree'), message.get('revision'), self.message_source(message))
+        except ValueError as e:
+            logging.warning(f"Arborescence refusée : {e}")
+            return {'status': 'error', 'message': 'Invalid bookmark tree'}
+        except sqlite3.Error as e:
+            logging.error(f"Erreur sauvegarde de l'arborescence : {e}")
+            return {'status': 'error', 'message': 'Could not write bookmarks file'}
+        
+        reply = tree_reply(tree_store, merge)
+        if reply['mode'] == 'tree_full':
+            logging.info(f"Révision {message.get('revision')} inconnue - arborescence complète")
+        return reply
+    
+    def search_reply(self, message):
+        """Réponse à une recherche dans la collection
+
+        Le message contient le texte saisi (`query`) et le nombre maximal de
+        résultats (`limit`, 20 par défaut). Chaque mot est un début de mot
+        du titre, de l'URL ou du dossier des favoris ; la réponse contient
+        les favoris correspondants, les plus pertinents d'abord (`results`).
+        """
+        query = message.get('query')
+        limit = message.get('limit', DEFAULT_SEARCH_LIMIT)
+        if (not isinstance(query, str) or not isinstance(limit, int) or isinstance(limit, bool)
+                or not 0 < limit <= MAX_SEARCH_LIMIT):
+            return {'status': 'error', 'message': 'Invalid search query'}
+        
+        try:
+            results = self.get_store().search(query, limit)
+        except sqlite3.Error as e:
+            logging.error(f"Erreur de recherche dans les favoris : {e}")
+            return {'status': 'error', 'message': 'Could not search bookmarks'}
+        logging.info(f"Recherche : {len(results)} résultat(s)")
+        return {'status': 'success', 'mode': 'search', 'results': results}
+    
+    def process_bookmarks(self, message):
+        """Traite la synchronisation des favoris"""
+        self.send_message(self.sync_reply(message))
+    
+    def process_delta(self, message):
+        """Traite une synchronisation différentielle (voir delta_sync_reply)"""
+        self.send_message(self.delta_sync_reply(message))
+    
+    def load_settings(self):
+        """Lit les paramètres du host dans la configuration"""
+        if self.store is None:
+            self.write_delay = SyncMarkConfig.get_setting('write_delay', DEFAULT_WRITE_DELAY)
+        self.max_message_size = SyncMarkConfig.get_setting('max_message_size', self.max_message_size)
+        if self.metrics_recorder is None and SyncMarkConfig.get_setting('metrics', True):
+            self.metrics_recorder = MetricsRecorder(config.METRICS_FILE_PATH)
+    
+    def build_reply(self, message, metrics=None):
+        """Réponse à un message de l'extension
+
+        Si le message porte un identifiant (`id`), la réponse le reprend :
+        l'extension peut ainsi avoir plusieurs requêtes en cours. Les entrées
+        mal formées (un message qui n'est pas un objet, des favoris sans URL
+        ou de types inattendus) sont mises en quarantaine ; le reste du
+        message est traité et la réponse indique le nombre de rejets
+        (`rejected`). Si `metrics`
+        est fourni, la lecture de la configuration et la fusion sont
+        chronométrées (l'écriture en base est mesurée par le stockage).
+        """
+        metrics = metrics or NULL_METRICS
+        if not isinstance(message, dict):
+            with metrics.active():
+                self.quarantine([('message', None, message, 'message is not an object')], message)
+            metrics.set(type='invalid', status='error')
+            return {'status': 'error', 'message': 'Invalid message'}
+        
+        with metrics.stage('config'):
+            enabled = SyncMarkConfig.is_sync_enabled()
+        if enabled:
+            logging.info("Synchronisation activée - traitement du message")
+            with metrics.active(), metrics.stage('merge'):
+                reply = self.sync_reply(message)
+        else:
+            logging.info("Synchronisation désactivée")
+            reply = {
+                'status': 'disabled',
+                'message': 'Sync is disabled by user'
+            }
+        metrics.set(type=message.get('type') or 'full', status=reply.get('status'),
+                    bookmarks_out=sum(len(value) for value in reply.values() if isinstance(value, list)))
+        return with_request_id(reply, message)
+    
+    def handle_message(self, message, metrics=None):
+        """Traite un message de l'extension, envoie la réponse puis enregistre les mesures"""
+        self.send_message(self.build_reply(message, metrics), metrics)
+        self.record_metrics(metrics)
+    
+    def run_host(self):
+        """Boucle principale du Native Host"""
+        logging.info("Native Host SyncMark démarré")
+        self.running = True
+        self.load_settings()
+        
+        while self.running:
+            try:
+                metrics = self.new_metrics()
+                message = self.get_message(metrics)
+                
+                if message is None:
+                    logging.info("Canal fermé par le navigateur")
+                    break
+                
+                self.handle_message(message, metrics)
+                    
+            except MessageTooLargeError as e:
+                logging.warning(str(e))
+                self.send_message({'status': 'error', 'message': 'Message too large'})
+            except MessageDecodeError as e:
+                # Le message a été lu en entier : le suivant peut être traité
+                self.send_message(self.decode_error_reply(e))
+            except (EOFError, OSError) as e:
+                # Flux tronqué ou fermé : les messages suivants ne peuvent plus être lus
+                logging.error(f"Canal interrompu, arrêt du Native Host : {e}", exc_info=True)
+                try:
+                    self.send_message({'status': 'error', 'message': str(e)})
+                except:
+                    pass
+                break
+            except Exception as e:
+                logging.error(f"Erreur dans la boucle principale : {e}", exc_info=True)
+                try:
+                    self.send_message({'status': 'error', 'message': str(e)})
+                except:
+                    pass
+        
+        self.close()
+    
+    def close(self):
+        """Ferme les stockages en écrivant les changements en attente"""
+        try:
+            if self.store is not None:
+                self.store.close()
+                self.store = None
+        finally:
+            if self.tree_store is not None:
+                self.tree_store.close()
+                self.tree_store = None
+    
+    def stop(self):
+        """Arrête le Native Host en écrivant les changements en attente"""
+        self.running = False
+        if self.store is not None:
+            try:
+                self.store.flush()
+            except sqlite3.Error as e:
+                logging.error(f"Erreur sauvegarde favoris : {e}")
@@ -0,0 +1,191 @@
+"""
+Installation du manifest Native Messaging : registre sous Windows, dossiers
+NativeMessagingHosts des navigateurs sous Linux et macOS
+"""
+
+import json
+import os
+import sys
+from pathlib import Path
+
+from . import config
+
+HOST_NAME = 'com.syncmark.host'
+# Racine de l'application : contient native_host_manifest.json et syncmark_unified.py
+APP_DIR = Path(__file__).resolve().parent.parent
+APP_SCRIPT = APP_DIR / 'syncmark_unified.py'
+# Script de lancement du mode host utilisé hors Windows quand l'application n'est pas compilée
+LAUNCHER_NAME = 'syncmark-host'
+
+# Dossiers NativeMessagingHosts par navigateur, relatifs au dossier personnel
+LINUX_MANIFEST_DIRS = {
+    'Google Chrome': '.config/google-chrome/NativeMessagingHosts',
+    'Chromium': '.config/chromium/NativeMessagingHosts',
+    'Microsoft Edge': '.config/microsoft-edge/NativeMessagingHosts',
+    'Brave': '.config/BraveSoftware/Brave-Browser/NativeMessagingHosts',
+}
+MACOS_MANIFEST_DIRS = {
+    'Google Chrome': 'Library/Application Support/Google/Chrome/NativeMessagingHosts',
+    'Chromium': 'Library/Application Support/Chromium/NativeMessagingHosts',
+    'Microsoft Edge': 'Library/Application Support/Microsoft Edge/NativeMessagingHosts',
+}
+
+class NativeHostInstaller:
+    """Gestionnaire d'installation du Native Host"""
+    
+    @staticmethod
+    def load_manifest(extension_id=None):
+        """Charge le manifest modèle (None en cas d'erreur)"""
+        manifest_path = APP_DIR / "native_host_manifest.json"
+        
+        if not manifest_path.exists():
+            print("❌ Fichier native_host_manifest.json non trouvé")
+            return None
+        
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except Exception as e:
+            print(f"❌ Erreur lecture manifest: {e}")
+            return None
+        
+        # Mise à jour de l'ID d'extension si fourni
+        if extension_id:
+            manifest["allowed_origins"] = [f"chrome-extension://{extension_id}/"]
+            print(f"✅ ID d'extension configuré: {extension_id}")
+        return manifest
+    
+    @staticmethod
+    def install_manifest(extension_id=None):
+        """Installe le manifest Native Host pour les navigateurs de la plateforme"""
+        print("🔧 Installation du Native Host SyncMark...")
+        
+        manifest = NativeHostInstaller.load_manifest(extension_id)
+        if manifest is None:
+            return False
+        
+        if sys.platform == 'win32':
+            return NativeHostInstaller.install_windows(manifest)
+        return NativeHostInstaller.install_unix(manifest)
+    
+    @staticmethod
+    def uninstall_manifest():
+        """Désinstalle le manifest Native Host"""
+        if sys.platform == 'win32':
+            return NativeHostInstaller.uninstall_windows()
+        return NativeHostInstaller.uninstall_unix()
+    
+    @staticmethod
+    def install_windows(manifest):
+        """Installe le manifest Native Host dans le registre Windows"""
+        import winreg
+        
+        # Mise à jour du chemin de l'exécutable
+        exe_path = os.path.abspath(sys.executable if getattr(sys, 'frozen', False) else APP_SCRIPT)
+        manifest["path"] = exe_path.replace('\\', '\\\\')
+        
+        # Création du manifest temporaire
+        temp_manifest_path = APP_DIR / "temp_manifest.json"
+        try:
+            with open(temp_manifest_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2)
+        except Exception as e:
+            print(f"❌ Erreur création manifest temporaire: {e}")
+            return False
+        
+        # Installation dans le registre
+        try:
+            registry_key = r"SOFTWARE\Google\Chrome\NativeMessagingHosts\com.syncmark.host"
+            with winreg.CreateKey(winreg.HKEY_CURRENT_USER, registry_key) as key:
+                winreg.SetValueEx(key, "", 0, winreg.REG_SZ, str(temp_manifest_path))
+            
+            print("✅ Native Host installé avec succès")
+            
+            # Nettoyage
+            try:
+                temp_manifest_path.unlink()
+            except:
+                pass
+                
+            return True
+            
+        except Exception as e:
+            print(f"❌ Erreur installation registre: {e}")
+            return False
+    
+    @staticmethod
+    def uninstall_windows():
+        """Désinstalle le manifest du registre"""
+        import winreg
+        
+        try:
+            registry_key = r"SOFTWARE\Google\Chrome\NativeMessagingHosts\com.syncmark.host"
+            winreg.DeleteKey(winreg.HKEY_CURRENT_USER, registry_key)
+            print("✅ Native Host désinstallé")
+            return True
+        except FileNotFoundError:
+            print("ℹ️ Native Host n'était pas installé")
+            return True
+        except Exception as e:
+            print(f"❌ Erreur désinstallation: {e}")
+            return False
+    
+    @staticmethod
+    def manifest_dirs():
+        """Dossiers NativeMessagingHosts des navigateurs installés (Chrome par défaut)"""
+        relative_dirs = MACOS_MANIFEST_DIRS if sys.platform == 'darwin' else LINUX_MANIFEST_DIRS
+        home = Path(config.HOME_DIR)
+        dirs = []
+        for browser, relative_dir in relative_dirs.items():
+            manifest_dir = home / relative_dir
+            # Le dossier de profil existe si le navigateur a déjà été lancé
+            if browser == 'Google Chrome' or manifest_dir.parent.exists():
+                dirs.append(manifest_dir)
+        return dirs
+    
+    @staticmethod
+    def host_command_path():
+        """Exécutable lancé par le navigateur en mode host"""
+        if getattr(sys, 'frozen', False):
+            return os.path.abspath(sys.executable)
+        
+        # Le navigateur exige un exécutable : un script de lancement appelle l'interpréteur
+        launcher_path = os.path.join(config.SYNC_DIR, LAUNCHER_NAME)
+        with open(launcher_path, 'w', encoding='utf-8') as f:
+            f.write(f'#!/bin/sh\nexec "{sys.executable}" "{APP_SCRIPT}" --mode host "$@"\n')
+        os.chmod(launcher_path, 0o755)
+        return launcher_path
+    
+    @staticmethod
+    def install_unix(manifest):
+        """Installe le manifest dans les dossiers NativeMessagingHosts (Linux, macOS)"""
+        try:
+            manifest["path"] = NativeHostInstaller.host_command_path()
+            for manifest_dir in NativeHostInstaller.manifest_dirs():
+                manifest_dir.mkdir(parents=True, exist_ok=True)
+                with open(manifest_dir / f"{HOST_NAME}.json", 'w', encoding='utf-8') as f:
+                    json.dump(manifest, f, indent=2)
+                print(f"✅ Manifest installé : {manifest_dir}")
+        except Exception as e:
+            print(f"❌ Erreur installation manifest: {e}")
+            return False
+        
+        print("✅ Native Host installé avec succès")
+        return True
+    
+    @staticmethod
+    def uninstall_unix():
+        """Supprime le manifest des dossiers NativeMessagingHosts (Linux, macOS)"""
+        removed = False
+        try:
+            for manifest_dir in NativeHostInstaller.manifest_dirs():
+                manifest_path = manifest_dir / f"{HOST_NAME}.json"
+                if manifest_path.exists():
+                    manifest_path.unlink()
+                    removed = True
+        except Exception as e:
+            print(f"❌ Erreur désinstallation: {e}")
+            return False
+        
+        print("✅ Native Host désinstallé" if removed else "ℹ️ Native Host n'était pas installé")
+        return True
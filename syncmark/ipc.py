@@ -0,0 +1,105 @@
+"""
+Relais du Native Host vers le démon de synchronisation
+Le démon écoute sur config.DAEMON_ADDRESS (socket Unix, ou tube nommé sous
+Windows). Les deux côtés s'authentifient avec la clé de
+config.DAEMON_KEY_FILE_PATH, lisible par le seul utilisateur : un autre
+processus local ne peut ni se connecter au démon ni se faire passer pour
+lui (nom de tube occupé avant lui). Le relais s'annonce d'abord par `{"source": ...}` (navigateur
+qui l'a lancé). Chaque message de l'extension est ensuite transmis tel
+quel ; le démon répond par les trames à renvoyer au navigateur, suivies
+d'une trame vide.
+"""
+
+import json
+import logging
+import os
+import struct
+
+from . import config
+from .framing import MAX_MESSAGE_SIZE, read_exact, skip_bytes
+
+def daemon_available():
+    """Vrai si le point d'accès du démon existe
+
+    Vérifié avant d'importer multiprocessing : sans démon, le démarrage du
+    Native Host ne paie pas cet import.
+    """
+    return os.path.exists(config.DAEMON_ADDRESS)
+
+def read_daemon_key():
+    """Clé d'authentification du démon (None s'il n'en a pas publié)"""
+    try:
+        with open(config.DAEMON_KEY_FILE_PATH, 'rb') as f:
+            return f.read() or None
+    except OSError:
+        return None
+
+def connect_daemon():
+    """Ouvre une connexion authentifiée au démon (None s'il ne répond pas)"""
+    if not daemon_available():
+        return None
+    authkey = read_daemon_key()
+    if authkey is None:
+        return None
+    from multiprocessing import AuthenticationError
+    from multiprocessing.connection import Client
+    try:
+        return Client(config.DAEMON_ADDRESS, authkey=authkey)
+    except (OSError, EOFError, AuthenticationError) as e:
+        logging.info(f"Démon de synchronisation injoignable : {e}")
+        return None
+
+def write_frame(stream, frame):
+    stream.write(struct.pack('@I', len(frame)))
+    stream.write(frame)
+
+def error_frame(message):
+    return json.dumps({'status': 'error', 'message': message}).encode('utf-8')
+
+def relay_messages(connection, stdin, stdout, max_message_size=MAX_MESSAGE_SIZE, source=None):
+    """Relaie les messages de l'extension vers le démon jusqu'à la fermeture de stdin
+
+    Les messages ne sont pas décodés : le relais n'importe ni le stockage ni
+    les codecs JSON. Retourne False si le démon a fermé la connexion.
+    """
+    try:
+        connection.send_bytes(json.dumps({'source': source}).encode('utf-8'))
+    except OSError as e:
+        logging.error(f"Connexion au démon perdue : {e}")
+        return False
+    
+    while True:
+        raw_length = read_exact(stdin, 4)
+        if raw_length is None:
+            logging.info("Canal fermé par le navigateur")
+            return True
+        
+        message_length = struct.unpack('@I', raw_length)[0]
+        if message_length > max_message_size:
+            skip_bytes(stdin, message_length)
+            logging.warning(f"Message de {message_length} octets refusé (maximum {max_message_size})")
+            write_frame(stdout, error_frame('Message too large'))
+            stdout.flush()
+            continue
+        
+        payload = read_exact(stdin, message_length) if message_length else bytearray()
+        if payload is None:
+            raise EOFError("Flux fermé avant le contenu du message")
+        
+        try:
+            connection.send_bytes(payload)
+            del payload
+            frame_count = 0
+            while True:
+                frame = connection.recv_bytes()
+                if not frame:
+                    break
+                write_frame(stdout, frame)
+                frame_count += 1
+        except (EOFError, OSError) as e:
+            logging.error(f"Connexion au démon perdue : {e}")
+            write_frame(stdout, error_frame('Sync daemon unavailable'))
+            stdout.flush()
+            return False
+        stdout.flush()
+        logging.info(f"Réponse du démon relayée ({frame_count} trame(s))")
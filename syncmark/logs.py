@@ -0,0 +1,154 @@
+"""
+Journal de SyncMark : enregistrements JSON mis en file d'attente et écrits
+par un thread dédié dans un fichier à rotation
+"""
+
+import atexit
+import copy
+import json
+import logging
+import queue
+
+from . import config
+from .config import SyncMarkConfig
+
+DEFAULT_LOG_LEVEL = 'INFO'
+# Niveau par défaut du mode host : les lignes INFO de chaque message ne sont
+# pas produites, le fichier n'est ouvert qu'en cas d'avertissement ou d'erreur
+HOST_LOG_LEVEL = 'WARNING'
+# Rotation par taille : fichier archivé en .1, .2... au-delà de cette taille
+DEFAULT_LOG_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_LOG_BACKUP_COUNT = 3
+
+# Thread d'écriture du journal, démarré par configure_logging
+_listener = None
+
+class JsonFormatter(logging.Formatter):
+    """Un objet JSON par ligne : date, niveau, processus, thread, message et exception"""
+    
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'process': record.process,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+class DeferredQueueHandler(logging.Handler):
+    """Met les enregistrements dans la file d'un QueueListener démarré au premier d'entre eux
+
+    Seul le message est résolu dans le thread appelant (ses arguments
+    peuvent changer ensuite) ; le formatage JSON, celui de l'exception et
+    l'écriture sur disque sont faits par le thread du QueueListener. Un
+    Native Host qui ne produit aucun enregistrement (niveau WARNING par
+    défaut) ne charge ni logging.handlers ni le thread d'écriture et
+    n'ouvre pas le fichier.
+    """
+    
+    def __init__(self, records):
+        super().__init__()
+        self.records = records
+        self.on_first_record = None
+    
+    def start_on_first_record(self, start):
+        """Appelle `start` au premier enregistrement, ou tout de suite si la file n'est pas vide"""
+        with self.lock:
+            if self.records.empty():
+                self.on_first_record = start
+                return
+        start()
+    
+    def emit(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        self.records.put_nowait(record)
+        if self.on_first_record is not None:
+            # Retiré avant l'appel : un avertissement émis au démarrage est seulement mis en file
+            start, self.on_first_record = self.on_first_record, None
+            start()
+
+def log_level(name, default):
+    """Niveau numérique d'un nom de niveau (`"DEBUG"`, `"warning"`...), `default` s'il est inconnu"""
+    level = logging.getLevelName(name.upper())
+    if isinstance(level, int):
+        return level
+    logging.warning(f"Niveau de log inconnu : {name!r}")
+    return logging.getLevelName(default)
+
+def rotating_handler(path):
+    """Gestionnaire de fichier à rotation selon config.json
+
+    `log_rotate_when` (par exemple `"midnight"`) choisit une rotation par
+    date ; sinon le fichier est archivé au-delà de `log_max_bytes` octets.
+    `log_backup_count` archives sont conservées. Le fichier n'est ouvert
+    qu'à la première écriture.
+    """
+    import logging.handlers
+    
+    backup_count = SyncMarkConfig.get_setting('log_backup_count', DEFAULT_LOG_BACKUP_COUNT)
+    when = SyncMarkConfig.get_setting('log_rotate_when')
+    if when:
+        try:
+            return logging.handlers.TimedRotatingFileHandler(
+                path, when=when, backupCount=backup_count, encoding='utf-8', delay=True)
+        except ValueError as e:
+            logging.warning(f"Rotation du log par date ignorée : {e}")
+    return logging.handlers.RotatingFileHandler(
+        path, maxBytes=SyncMarkConfig.get_setting('log_max_bytes', DEFAULT_LOG_MAX_BYTES),
+        backupCount=backup_count, encoding='utf-8', delay=True)
+
+def start_listener(records):
+    """Démarre le thread qui écrit les enregistrements de la file dans config.LOG_FILE"""
+    global _listener
+    import logging.handlers
+    
+    file_handler = rotating_handler(config.LOG_FILE)
+    file_handler.setFormatter(JsonFormatter())
+    _listener = logging.handlers.QueueListener(records, file_handler)
+    _listener.start()
+
+def configure_logging(host_mode=False):
+    """Configure le journal de l'application dans config.LOG_FILE
+
+    Le logger racine ne fait que mettre les enregistrements en file : un
+    QueueListener les formate en JSON et les écrit, si bien qu'aucune
+    écriture sur disque n'a lieu pendant le traitement d'un message. Le
+    niveau est lu dans config.json (`log_level`), par défaut INFO, ou
+    WARNING en mode host. Les enregistrements en attente sont écrits à la
+    sortie du processus (voir stop_logging).
+    """
+    stop_logging()
+    
+    # La file est en place avant la lecture de config.json : une erreur de
+    # lecture de la configuration est elle aussi journalisée
+    records = queue.SimpleQueue()
+    handler = DeferredQueueHandler(records)
+    root = logging.getLogger()
+    for previous in root.handlers[:]:
+        root.removeHandler(previous)
+        previous.close()
+    root.addHandler(handler)
+    
+    default_level = HOST_LOG_LEVEL if host_mode else DEFAULT_LOG_LEVEL
+    root.setLevel(log_level(SyncMarkConfig.get_setting('log_level', default_level), default_level))
+    handler.start_on_first_record(lambda: start_listener(records))
+    return handler
+
+def stop_logging():
+    """Écrit les enregistrements en attente et arrête le thread du journal"""
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
+atexit.register(stop_logging)
@@ -0,0 +1,45 @@
+"""
+Fusion des favoris reçus de l'extension et construction des réponses
+(synchronisation complète ou différentielle)
+"""
+
+from .urls import normalize_url
+from .validation import validate_bookmarks, validate_removals
+
+def parse_delta(message):
+    """Extrait (révision du client, favoris à fusionner, URLs supprimées, rejets) d'un message delta
+
+    Les entrées mal formées sont écartées (voir syncmark.validation).
+    """
+    client_revision = message.get('revision')
+    added, rejected = validate_bookmarks(message.get('added', []), 'added')
+    changed, rejected_changed = validate_bookmarks(message.get('changed', []), 'changed')
+    removals, rejected_removals = validate_removals(message.get('removed', []))
+    return client_revision, added + changed, removals, rejected + rejected_changed + rejected_removals
+
+def full_reply(store, mode=None):
+    """Réponse contenant la collection complète et la révision courante"""
+    reply = {'status': 'success', 'bookmarks': store.all_bookmarks(), 'revision': store.revision}
+    if mode:
+        reply['mode'] = mode
+    return reply
+
+def delta_reply(store, client_revision, upserts, removals):
+    """Réponse contenant les changements depuis `client_revision`
+
+    Les changements envoyés par l'extension ne lui sont pas renvoyés. Si la
+    révision n'est pas reconnue, la réponse contient la collection complète.
+    """
+    if not store.is_known(client_revision):
+        return full_reply(store, mode='full')
+    
+    sent_keys = {normalize_url(bm['url']) for bm in upserts}
+    sent_keys.update(normalize_url(url) for url in removals)
+    since_changed, since_removed = store.changes_since(client_revision)
+    return {
+        'status': 'success',
+        'mode': 'delta',
+        'revision': store.revision,
+        'changed': [bm for bm in since_changed if normalize_url(bm['url']) not in sent_keys],
+        'removed': [url for url in since_removed if normalize_url(url) not in sent_keys]
+    }
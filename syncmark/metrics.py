@@ -0,0 +1,192 @@
+"""
+Mesures du Native Host : durée de chaque étape du traitement d'un message,
+tailles et nombres de favoris, enregistrées en JSON lines
+"""
+
+import contextlib
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+# Étapes mesurées, dans l'ordre du traitement d'un message
+STAGES = ('read', 'decode', 'config', 'merge', 'persist', 'encode', 'write')
+# Compteurs enregistrés avec les durées
+COUNTERS = ('bytes_in', 'bytes_out', 'frames', 'bookmarks_in', 'bookmarks_out', 'rejected')
+PERCENTILES = (50, 95, 99)
+# Au-delà de cette taille, le fichier de mesures est renommé en .1 (une seule archive)
+MAX_METRICS_SIZE = 5 * 1024 * 1024
+
+_current = threading.local()
+
+class MessageMetrics:
+    """Mesures du traitement d'un message
+
+    `stage(nom)` chronomètre une étape. La durée d'une étape imbriquée est
+    retirée de l'étape qui la contient : l'écriture en base, mesurée pendant
+    la fusion, n'est comptée qu'une fois. Les durées d'une même étape
+    s'additionnent (encodage et écriture alternent pour chaque trame).
+    """
+    
+    def __init__(self):
+        self.timings = {}
+        self.counts = {}
+        self._nested = []
+    
+    @contextlib.contextmanager
+    def stage(self, name):
+        self._nested.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self._nested.pop()
+            if self._nested:
+                self._nested[-1] += elapsed
+            self.timings[name] = self.timings.get(name, 0.0) + elapsed - nested
+    
+    def set(self, **counts):
+        self.counts.update(counts)
+    
+    @contextlib.contextmanager
+    def active(self):
+        """Rend ces mesures courantes dans le thread (voir current_stage)"""
+        previous = getattr(_current, 'metrics', None)
+        _current.metrics = self
+        try:
+            yield
+        finally:
+            _current.metrics = previous
+    
+    def record(self):
+        """Enregistrement des mesures, durées en millisecondes"""
+        stages = {name: round(seconds * 1000, 3) for name, seconds in self.timings.items()}
+        return dict(self.counts, timestamp=round(time.time(), 3), stages=stages,
+                    total=round(sum(self.timings.values()) * 1000, 3))
+
+class NullMetrics:
+    """Mesures désactivées : aucune durée n'est prise"""
+    
+    def stage(self, name):
+        return contextlib.nullcontext()
+    
+    def set(self, **counts):
+        pass
+    
+    def active(self):
+        return contextlib.nullcontext()
+
+NULL_METRICS = NullMetrics()
+
+def current_stage(name):
+    """Chronomètre une étape du message traité par ce thread, s'il y en a un
+
+    Permet au stockage de mesurer l'écriture en base sans recevoir les
+    mesures en paramètre. Hors traitement d'un message (écriture différée
+    par un minuteur), rien n'est mesuré.
+    """
+    metrics = getattr(_current, 'metrics', None)
+    return metrics.stage(name) if metrics is not None else contextlib.nullcontext()
+
+def set_counts(**counts):
+    """Ajoute des compteurs aux mesures du message traité par ce thread, s'il y en a un"""
+    metrics = getattr(_current, 'metrics', None)
+    if metrics is not None:
+        metrics.set(**counts)
+
+class JsonLinesRecorder:
+    """Fichier JSON lines partagé, archivé en .1 (une seule archive) au-delà de `max_size` octets
+
+    Chaque écriture est faite en un seul appel en mode ajout : plusieurs
+    Native Hosts (profils) peuvent partager le fichier. Une erreur
+    d'écriture est seulement journalisée.
+    """
+    
+    # Début de l'avertissement journalisé quand l'écriture échoue
+    failure_message = "Lignes non enregistrées"
+    
+    def __init__(self, path, max_size):
+        self.path = path
+        self.max_size = max_size
+        self.lock = threading.Lock()
+    
+    def append(self, text):
+        """Ajoute des lignes JSON (terminées par un saut de ligne) au fichier"""
+        with self.lock:
+            try:
+                if os.path.getsize(self.path) >= self.max_size:
+                    os.replace(self.path, self.path + '.1')
+            except OSError:
+                pass
+            try:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(text)
+            except OSError as e:
+                logging.warning(f"{self.failure_message} : {e}")
+
+class MetricsRecorder(JsonLinesRecorder):
+    """Ajoute une ligne JSON par message au fichier `path`"""
+    
+    failure_message = "Mesures non enregistrées"
+    
+    def __init__(self, path, max_size=MAX_METRICS_SIZE):
+        super().__init__(path, max_size)
+    
+    def write(self, metrics):
+        self.append(json.dumps(metrics.record(), separators=(',', ':')) + '\n')
+
+def read_metrics(path):
+    """Enregistrements du fichier de mesures et de son archive, des plus anciens aux plus récents
+
+    Les lignes illisibles (écriture interrompue) sont ignorées.
+    """
+    records = []
+    for file_path in (path + '.1', path):
+        try:
+            with open(file_path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if isinstance(record, dict) and isinstance(record.get('stages'), dict):
+                        records.append(record)
+        except FileNotFoundError:
+            continue
+    return records
+
+def percentile(values, p):
+    """Percentile `p` d'une liste triée (méthode du rang le plus proche)"""
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+def distribution(values):
+    """Percentiles et maximum d'une série, None si elle est vide"""
+    if not values:
+        return None
+    values = sorted(values)
+    summary = {f'p{p}': percentile(values, p) for p in PERCENTILES}
+    summary['max'] = values[-1]
+    return summary
+
+def summarize(records):
+    """Résumé des mesures : nombre de messages par type, distribution de chaque étape et compteur
+
+    Les étapes absentes d'un message (message refusé, mode désactivé)
+    n'entrent pas dans la distribution de l'étape.
+    """
+    types = {}
+    for record in records:
+        name = record.get('type') or 'inconnu'
+        types[name] = types.get(name, 0) + 1
+    
+    stages = {name: distribution([record['stages'][name] for record in records if name in record['stages']])
+              for name in STAGES}
+    stages['total'] = distribution([record['total'] for record in records
+                                    if isinstance(record.get('total'), (int, float))])
+    counters = {name: distribution([record[name] for record in records
+                                    if isinstance(record.get(name), (int, float))])
+                for name in COUNTERS}
+    return {'count': len(records), 'types': types, 'stages': stages, 'counters': counters}
@@ -0,0 +1,84 @@
+"""
+Représentation compacte des favoris gardés en mémoire (cache du mode host
+et du démon)
+"""
+
+import sys
+from collections.abc import Mapping
+
+class BookmarkRecord(Mapping):
+    """Favori en mémoire : un emplacement fixe par champ plutôt qu'un dictionnaire
+
+    Les champs courants des favoris de l'extension (`url`, `title`,
+    `dateAdded`, `folder`) ont chacun un emplacement (`__slots__`) ; les
+    autres, ou ceux d'un type inattendu, sont gardés dans `extra` (tuple de
+    paires clé/valeur). Le chemin du dossier, répété par tous les favoris
+    d'un même dossier, est internalisé. Un BookmarkRecord se lit comme un
+    dictionnaire en lecture seule (`record['url']`, `record.get('title')`,
+    égalité avec un dict) ; les codecs JSON l'encodent comme to_dict().
+    """
+    
+    __slots__ = ('url', 'title', 'date_added', 'folder', 'extra')
+    
+    # Champ du favori -> emplacement
+    FIELDS = {'url': 'url', 'title': 'title', 'dateAdded': 'date_added', 'folder': 'folder'}
+    
+    def __init__(self, url, title=None, date_added=None, folder=None, extra=None):
+        self.url = url
+        self.title = title
+        self.date_added = date_added
+        self.folder = folder
+        self.extra = extra
+    
+    @classmethod
+    def from_dict(cls, bookmark, url=None):
+        """Enregistrement d'un favori décodé ; `url`, égale à `bookmark['url']`, est partagée si fournie"""
+        title = date_added = folder = None
+        extra = []
+        for key, value in bookmark.items():
+            if key == 'url':
+                continue
+            if key == 'title' and type(value) is str:
+                title = value
+            elif key == 'dateAdded' and type(value) is int:
+                date_added = value
+            elif key == 'folder' and type(value) is str:
+                folder = sys.intern(value)
+            else:
+                extra.append((key, value))
+        return cls(bookmark['url'] if url is None else url, title, date_added, folder,
+                   tuple(extra) if extra else None)
+    
+    def to_dict(self):
+        """Dictionnaire du favori, tel que reçu de l'extension"""
+        bookmark = {'url': self.url}
+        if self.title is not None:
+            bookmark['title'] = self.title
+        if self.date_added is not None:
+            bookmark['dateAdded'] = self.date_added
+        if self.folder is not None:
+            bookmark['folder'] = self.folder
+        if self.extra:
+            bookmark.update(self.extra)
+        return bookmark
+    
+    def __getitem__(self, key):
+        field = self.FIELDS.get(key)
+        if field is not None:
+            value = getattr(self, field)
+            if value is not None:
+                return value
+        for extra_key, extra_value in self.extra or ():
+            if extra_key == key:
+                return extra_value
+        raise KeyError(key)
+    
+    def __iter__(self):
+        return iter(self.to_dict())
+    
+    def __len__(self):
+        return (1 + (self.title is not None) + (self.date_added is not None) + (self.folder is not None)
+                + len(self.extra or ()))
+    
+    def __repr__(self):
+        return f'BookmarkRecord({self.to_dict()!r})'
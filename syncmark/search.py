@@ -0,0 +1,85 @@
+"""
+Recherche plein texte dans les favoris (index SQLite FTS5)
+
+L'index couvre le titre, les mots de l'URL et le chemin du dossier
+(`folder`) de chaque favori. Il est tenu à jour par des triggers sur la
+table `bookmarks` : chaque écriture du stockage (fusion, dédoublonnage,
+restauration) met l'index à jour dans sa propre transaction.
+"""
+
+import re
+
+# Version de l'index : il est reconstruit à l'ouverture quand elle change
+SEARCH_VERSION = 1
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 1000
+# Nombre maximal de correspondances classées : au-delà (mot très courant,
+# première lettre d'une saisie), seules les plus récentes sont classées
+MAX_RANKED_MATCHES = 2000
+
+# Colonnes indexées, calculées depuis une ligne de `bookmarks`
+_TITLE = "coalesce(json_extract({row}.data, '$.title'), '')"
+_FOLDER = "coalesce(json_extract({row}.data, '$.folder'), '')"
+
+def _index_row(row):
+    return f"{row}.id, {_TITLE.format(row=row)}, {row}.url, {_FOLDER.format(row=row)}"
+
+# Trigger d'indexation des favoris ajoutés, suspendu pendant un import
+INSERT_TRIGGER = 'bookmarks_fts_insert'
+
+# Index sans contenu (content='') : les textes ne sont pas dupliqués, les
+# résultats sont relus dans `bookmarks`. Une ligne est retirée de l'index
+# avec la commande 'delete' et les valeurs qui y avaient été insérées.
+SEARCH_STATEMENTS = (
+    "CREATE VIRTUAL TABLE bookmarks_fts USING fts5("
+    "title, url, folder, content='', tokenize='unicode61 remove_diacritics 2')",
+    f"""CREATE TRIGGER {INSERT_TRIGGER} AFTER INSERT ON bookmarks BEGIN
+        INSERT INTO bookmarks_fts (rowid, title, url, folder) VALUES ({_index_row('new')});
+    END""",
+    f"""CREATE TRIGGER bookmarks_fts_delete AFTER DELETE ON bookmarks BEGIN
+        INSERT INTO bookmarks_fts (bookmarks_fts, rowid, title, url, folder) VALUES ('delete', {_index_row('old')});
+    END""",
+    f"""CREATE TRIGGER bookmarks_fts_update AFTER UPDATE OF url, data ON bookmarks BEGIN
+        INSERT INTO bookmarks_fts (bookmarks_fts, rowid, title, url, folder) VALUES ('delete', {_index_row('old')});
+        INSERT INTO bookmarks_fts (rowid, title, url, folder) VALUES ({_index_row('new')});
+    END""",
+    # Classement BM25 : un mot du titre compte plus qu'un mot du dossier, lui-même plus qu'un mot de l'URL
+    "INSERT INTO bookmarks_fts (bookmarks_fts, rank) VALUES ('rank', 'bm25(10.0, 2.0, 5.0)')",
+    f"INSERT INTO bookmarks_fts (rowid, title, url, folder) SELECT {_index_row('bookmarks')} FROM bookmarks",
+)
+
+# Indexation en une requête des favoris ajoutés après la ligne `id` donnée
+INDEX_ROWS_AFTER = (f"INSERT INTO bookmarks_fts (rowid, title, url, folder) "
+                    f"SELECT {_index_row('bookmarks')} FROM bookmarks WHERE id > ?")
+
+DROP_STATEMENTS = (
+    "DROP TRIGGER IF EXISTS bookmarks_fts_insert",
+    "DROP TRIGGER IF EXISTS bookmarks_fts_delete",
+    "DROP TRIGGER IF EXISTS bookmarks_fts_update",
+    "DROP TABLE IF EXISTS bookmarks_fts",
+)
+
+# Le classement BM25 de toutes les correspondances d'un mot présent dans
+# des centaines de milliers de favoris coûterait des centaines de
+# millisecondes : il est limité aux MAX_RANKED_MATCHES plus récentes
+SEARCH_QUERY = f"""
+    SELECT bookmarks.data FROM (
+        SELECT rowid, rank FROM bookmarks_fts WHERE bookmarks_fts MATCH ?
+        ORDER BY rowid DESC LIMIT {MAX_RANKED_MATCHES}
+    ) AS matches JOIN bookmarks ON bookmarks.id = matches.rowid
+    ORDER BY matches.rank LIMIT ?
+"""
+
+_WORD = re.compile(r'\w+')
+
+def match_query(text):
+    """Requête FTS5 d'un texte saisi : chaque mot est un préfixe, tous doivent être présents
+
+    Les mots sont mis entre guillemets : la syntaxe FTS5 (AND, NEAR,
+    colonne:...) n'est pas interprétée. Retourne None si le texte ne
+    contient aucun mot.
+    """
+    words = _WORD.findall(text)
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
@@ -0,0 +1,1057 @@
+"""
+Stockage des favoris : base SQLite indexée par URL normalisée, cache mémoire
+et écritures différées pour le mode host
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from . import config
+from .config import atomic_write, file_lock, file_signature
+from .codec import get_codec
+from .metrics import current_stage
+from .records import BookmarkRecord
+from .search import (DROP_STATEMENTS, INDEX_ROWS_AFTER, INSERT_TRIGGER, SEARCH_QUERY, SEARCH_STATEMENTS,
+                     SEARCH_VERSION, match_query)
+from .urls import KEY_VERSION, normalize_url
+
+# Délai (secondes) de regroupement des écritures en mode host
+DEFAULT_WRITE_DELAY = 0.5
+
+# Nombre de favoris écrits par requête lors d'un import (voir import_bookmarks)
+IMPORT_BATCH_SIZE = 10000
+
+# Cache de pages SQLite pendant un import (en Kio, PRAGMA cache_size négatif) :
+# l'index des URLs d'une grande collection ne tient pas dans le cache par défaut
+IMPORT_CACHE_SIZE = -64 * 1024
+
+# Nombre de lignes lues par bloc pour compresser une entrée de l'historique
+HISTORY_FETCH_SIZE = 1000
+
+# Nombre maximal de suppressions mémorisées pour la synchronisation différentielle
+MAX_TOMBSTONES = 10000
+
+# Attente maximale (secondes) du verrou SQLite quand plusieurs processus écrivent
+BUSY_TIMEOUT = 30
+
+# Nombre d'entrées de l'historique entre deux instantanés complets
+HISTORY_CHECKPOINT_INTERVAL = 100
+
+# Nombre d'instantanés conservés : l'historique plus ancien est oublié
+HISTORY_MAX_CHECKPOINTS = 50
+
+def atomic_write_json(path, data, pretty=False):
+    """Écrit un fichier JSON atomiquement (voir config.atomic_write)"""
+    codec = get_codec()
+    atomic_write(path, codec.dumps_pretty(data) if pretty else codec.dumps(data))
+
+class BookmarkStore:
+    """Interface d'un stockage de favoris versionné
+
+    Chaque modification appliquée par `apply` crée une nouvelle révision.
+    `changes_since(revision)` retourne les favoris modifiés et les URLs
+    supprimées après cette révision, tant qu'elle est comprise entre
+    `base_revision` (plus ancienne révision dont l'historique est complet)
+    et `revision`.
+    """
+    
+    revision = 0
+    base_revision = 0
+    
+    def is_known(self, revision):
+        """Indique si les changements depuis `revision` peuvent être calculés"""
+        return (isinstance(revision, int) and not isinstance(revision, bool)
+                and self.base_revision <= revision <= self.revision)
+    
+    def count(self):
+        """Nombre de favoris stockés"""
+        raise NotImplementedError
+    
+    def all_bookmarks(self):
+        """Liste complète des favoris, dans l'ordre d'insertion"""
+        raise NotImplementedError
+    
+    def apply(self, upserts, removals, source=None):
+        """Insère/met à jour des favoris et supprime des URLs
+
+        `source` identifie le navigateur/profil qui envoie les changements ;
+        il est mémorisé pour les favoris ajoutés. Retourne la liste des URLs
+        réellement modifiées et celle des URLs réellement supprimées.
+        """
+        raise NotImplementedError
+    
+    def bookmark_sources(self):
+        """Dictionnaire URL -> navigateur/profil qui a ajouté le favori (None si inconnu)"""
+        raise NotImplementedError
+    
+    def changes_since(self, revision):
+        """Retourne (favoris modifiés, URLs supprimées) après `revision`"""
+        raise NotImplementedError
+    
+    def search(self, text, limit):
+        """Au plus `limit` favoris correspondant à un texte, les plus pertinents d'abord (voir syncmark.search)"""
+        raise NotImplementedError
+    
+    def export_json(self, path, pretty=False):
+        """Exporte la liste complète des favoris au format JSON historique
+
+        La collection est lue sous un verrou entre processus : quand
+        plusieurs hosts exportent en même temps, le dernier fichier écrit
+        contient toujours l'état le plus récent.
+        """
+        with file_lock(path + '.lock'):
+            atomic_write_json(path, self.all_bookmarks(), pretty=pretty)
+    
+    def flush(self):
+        """Écrit les changements en attente (aucun par défaut)"""
+    
+    def checkpoint_due(self):
+        """Indique si un instantané de l'historique est dû (aucun par défaut)"""
+        return False
+    
+    def write_checkpoint(self):
+        """Écrit un instantané de l'historique s'il est dû ; retourne True s'il a été écrit"""
+        return False
+    
+    def close(self):
+        """Libère les ressources du stockage"""
+
+class SqliteBookmarkStore(BookmarkStore):
+    """Stockage SQLite indexé par URL normalisée
+
+    Les fusions sont des upserts indexés : seul le coût des favoris reçus est
+    payé, et non celui de la collection complète. La clé normalisée
+    (`url_key`, voir syncmark.urls) est calculée à l'écriture ; quand la
+    normalisation change (KEY_VERSION), les clés sont recalculées et les
+    doublons fusionnés à l'ouverture.
+    """
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS bookmarks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            url_key TEXT NOT NULL,
+            url TEXT NOT NULL,
+            data TEXT NOT NULL,
+            revision INTEGER NOT NULL,
+            source TEXT
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_bookmarks_url_key ON bookmarks(url_key);
+        CREATE INDEX IF NOT EXISTS idx_bookmarks_revision ON bookmarks(revision);
+        CREATE TABLE IF NOT EXISTS tombstones (
+            url_key TEXT PRIMARY KEY,
+            url TEXT NOT NULL,
+            revision INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_tombstones_revision ON tombstones(revision);
+        CREATE TABLE IF NOT EXISTS history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp REAL NOT NULL,
+            revision INTEGER NOT NULL,
+            checkpoint INTEGER NOT NULL,
+            source TEXT,
+            data BLOB NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_history_checkpoint ON history(checkpoint, timestamp);
+    """
+    
+    # Upsert par URL normalisée : un favori identique au stocké n'est pas réécrit
+    UPSERT = (
+        "INSERT INTO bookmarks (url_key, url, data, revision, source) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT(url_key) DO UPDATE SET "
+        "url = excluded.url, data = excluded.data, revision = excluded.revision "
+        "WHERE bookmarks.data != excluded.data"
+    )
+    
+    def __init__(self, path, migrate_keys=True, auto_checkpoint=True):
+        self.path = path
+        self.codec = get_codec()
+        # Sans écriture automatique, les instantanés sont écrits par l'appelant (voir WriteBehindStore)
+        self.auto_checkpoint = auto_checkpoint
+        # Les écritures différées sont faites depuis un thread (voir WriteBehindStore)
+        self.conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None,
+                                    check_same_thread=False)
+        self.conn.executescript(self.SCHEMA)
+        
+        if self._get_meta('revision') is None:
+            self._initialize()
+        self._add_source_column()
+        if self._get_meta('search_version') != SEARCH_VERSION:
+            self._create_search_index()
+        if migrate_keys and self._get_meta('key_version') != KEY_VERSION:
+            duplicates = self.deduplicate()
+            logging.info(f"Clés des favoris recalculées : {len(duplicates)} doublons fusionnés")
+    
+    def _add_source_column(self):
+        """Ajoute la colonne `source` aux bases créées par une version précédente"""
+        def has_source_column():
+            return any(row[1] == 'source' for row in self.conn.execute("PRAGMA table_info(bookmarks)"))
+        
+        if has_source_column():
+            return
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Un autre processus a pu faire la migration pendant l'attente du verrou
+            if not has_source_column():
+                self.conn.execute("ALTER TABLE bookmarks ADD COLUMN source TEXT")
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+    
+    def _create_search_index(self):
+        """Crée (ou recrée) l'index de recherche et y ajoute les favoris stockés
+
+        Sans le module FTS5 de SQLite, la recherche est indisponible mais le
+        stockage fonctionne normalement.
+        """
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self._get_meta('search_version') != SEARCH_VERSION:
+                for statement in DROP_STATEMENTS + SEARCH_STATEMENTS:
+                    self.conn.execute(statement)
+                self._set_meta('search_version', SEARCH_VERSION)
+            self.conn.execute("COMMIT")
+        except sqlite3.OperationalError as e:
+            self.conn.execute("ROLLBACK")
+            logging.warning(f"Index de recherche indisponible : {e}")
+            return
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        logging.info("Index de recherche des favoris créé")
+    
+    def _get_meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+    
+    def _set_meta(self, key, value):
+        self.conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value)
+        )
+    
+    @property
+    def revision(self):
+        return self._get_meta('revision')
+    
+    @property
+    def base_revision(self):
+        return self._get_meta('base_revision')
+    
+    def _initialize(self):
+        """Crée un stockage neuf, en important l'ancien fichier JSON s'il existe"""
+        revision = 1
+        if os.path.exists(config.SYNC_STATE_FILE_PATH):
+            try:
+                with open(config.SYNC_STATE_FILE_PATH, 'r', encoding='utf-8') as f:
+                    # Les révisions déjà distribuées doivent rester inconnues
+                    revision = int(json.load(f).get('revision', 0)) + 1
+            except (IOError, ValueError, AttributeError) as e:
+                logging.error(f"Journal des révisions illisible, ignoré : {e}")
+        
+        legacy_bookmarks = []
+        if os.path.exists(config.BOOKMARKS_FILE_PATH):
+            try:
+                with open(config.BOOKMARKS_FILE_PATH, 'r', encoding='utf-8') as f:
+                    content = f.read()
+                    legacy_bookmarks = self.codec.loads(content) if content else []
+            except (IOError, ValueError) as e:
+                logging.error(f"Import des favoris JSON impossible : {e}")
+        
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self._get_meta('revision') is None:
+                self._upsert_rows(legacy_bookmarks, revision)
+                self._set_meta('revision', revision)
+                self._set_meta('base_revision', revision)
+                self._set_meta('key_version', KEY_VERSION)
+                self._record_history(revision)
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self._after_commit()
+        
+        if legacy_bookmarks:
+            logging.info(f"Migration : {len(legacy_bookmarks)} favoris importés depuis {config.BOOKMARKS_FILE_PATH}")
+    
+    def _upsert_rows(self, bookmarks, revision, source=None):
+        """Upsert indexé ; un favori identique au stocké n'est pas réécrit
+
+        La source n'est enregistrée qu'à l'ajout : elle désigne le
+        navigateur/profil d'où vient le favori.
+        """
+        changed_urls = []
+        for bm in bookmarks:
+            if not isinstance(bm, dict) or not isinstance(bm.get('url'), str):
+                continue
+            url_key = normalize_url(bm['url'])
+            cursor = self.conn.execute(
+                self.UPSERT,
+                (url_key, bm['url'], self.codec.dumps(bm, sort_keys=True).decode('utf-8'), revision, source)
+            )
+            if cursor.rowcount:
+                changed_urls.append(bm['url'])
+                self.conn.execute("DELETE FROM tombstones WHERE url_key = ?", (url_key,))
+        return changed_urls
+    
+    def _remove_rows(self, urls, revision):
+        removed_urls = []
+        for url in urls:
+            url_key = normalize_url(url)
+            row = self.conn.execute(
+                "DELETE FROM bookmarks WHERE url_key = ? RETURNING url", (url_key,)
+            ).fetchone()
+            if row:
+                removed_urls.append(row[0])
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO tombstones (url_key, url, revision) VALUES (?, ?, ?)",
+                    (url_key, row[0], revision)
+                )
+        return removed_urls
+    
+    def _trim_tombstones(self):
+        """Oublie les suppressions les plus anciennes au-delà de MAX_TOMBSTONES"""
+        row = self.conn.execute(
+            "SELECT revision FROM tombstones ORDER BY revision DESC LIMIT 1 OFFSET ?",
+            (MAX_TOMBSTONES,)
+        ).fetchone()
+        if row:
+            # Les clients antérieurs devront refaire une synchronisation complète
+            self.conn.execute("DELETE FROM tombstones WHERE revision <= ?", (row[0],))
+            self._set_meta('base_revision', max(self.base_revision, row[0]))
+    
+    def _rekey(self, revision):
+        """Recalcule les clés normalisées en une passe et supprime les doublons
+
+        Parmi des favoris de même clé, le plus récemment modifié est gardé ;
+        il passe à `revision` et les autres sont remplacés par des
+        suppressions, pour que les clients synchronisés les retirent.
+        Retourne {clé: (URL gardée, URLs supprimées)}.
+        """
+        keepers = {}
+        removed = {}
+        for row_id, url_key, url, row_revision in self.conn.execute(
+                "SELECT id, url_key, url, revision FROM bookmarks ORDER BY id"):
+            key = normalize_url(url)
+            row = (row_id, url_key, url, row_revision)
+            kept = keepers.get(key)
+            if kept is None:
+                keepers[key] = row
+                continue
+            if row_revision > kept[3]:
+                keepers[key], row = row, kept
+            removed.setdefault(key, []).append(row)
+        
+        # Index unique supprimé le temps de la passe : deux clés peuvent s'échanger
+        self.conn.execute("DROP INDEX IF EXISTS idx_bookmarks_url_key")
+        self.conn.executemany("DELETE FROM bookmarks WHERE id = ?",
+                              [(row[0],) for rows in removed.values() for row in rows])
+        self.conn.executemany("UPDATE bookmarks SET url_key = ? WHERE id = ?",
+                              [(key, row[0]) for key, row in keepers.items() if row[1] != key])
+        self.conn.executemany("UPDATE bookmarks SET revision = ? WHERE id = ?",
+                              [(revision, keepers[key][0]) for key in removed])
+        self.conn.execute("CREATE UNIQUE INDEX idx_bookmarks_url_key ON bookmarks(url_key)")
+        
+        tombstones = {}
+        for url, tombstone_revision in self.conn.execute(
+                "SELECT url, revision FROM tombstones ORDER BY revision"):
+            tombstones[normalize_url(url)] = (url, tombstone_revision)
+        for key, rows in removed.items():
+            tombstones[key] = (rows[-1][2], revision)
+        self.conn.execute("DELETE FROM tombstones")
+        self.conn.executemany("INSERT INTO tombstones (url_key, url, revision) VALUES (?, ?, ?)",
+                              [(key, url, tombstone_revision)
+                               for key, (url, tombstone_revision) in tombstones.items()])
+        return {key: (keepers[key][2], [row[2] for row in rows]) for key, rows in removed.items()}
+    
+    def deduplicate(self, dry_run=False):
+        """Recalcule les clés normalisées et fusionne les doublons (voir _rekey)
+
+        Une seule passe linéaire sur la collection, en une transaction ; avec
+        `dry_run`, la transaction est annulée et seul le rapport est retourné.
+        """
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            revision = self.revision + 1
+            duplicates = self._rekey(revision)
+            if dry_run:
+                self.conn.execute("ROLLBACK")
+                return duplicates
+            if duplicates:
+                self._set_meta('revision', revision)
+                self._record_history(revision, 'dedupe')
+                self._trim_tombstones()
+            self._set_meta('key_version', KEY_VERSION)
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        if duplicates:
+            self._after_commit()
+        return duplicates
+    
+    def _record_history(self, revision, source=None):
+        """Ajoute une révision à l'historique, dans la transaction qui l'a créée
+
+        Les entrées ne sont jamais modifiées : chacune contient les favoris
+        modifiés et les URLs supprimées par la révision, compressés avec
+        zlib. Les instantanés de la collection complète sont écrits après
+        la transaction (voir write_checkpoint) : une synchronisation ne
+        compresse que ses propres changements.
+        """
+        removed = [url for (url,) in self.conn.execute(
+            "SELECT url FROM tombstones WHERE revision = ?", (revision,))]
+        data = self._compress_rows(b'{"changed":[', self._fetch_blocks(self.conn.execute(
+            "SELECT data FROM bookmarks WHERE revision = ? ORDER BY id", (revision,))),
+            b'],"removed":' + self.codec.dumps(removed) + b'}')
+        self.conn.execute(
+            "INSERT INTO history (timestamp, revision, checkpoint, source, data) VALUES (?, ?, ?, ?, ?)",
+            (time.time(), revision, 0, source, data)
+        )
+    
+    def _after_commit(self):
+        if self.auto_checkpoint:
+            self.write_checkpoint()
+    
+    @staticmethod
+    def _checkpoint_due(conn):
+        """Indique si HISTORY_CHECKPOINT_INTERVAL entrées suivent le dernier instantané (ou s'il n'y en a pas)"""
+        row = conn.execute(
+            "SELECT id FROM history WHERE checkpoint = 1 ORDER BY id DESC LIMIT 1").fetchone()
+        if row is None:
+            return True
+        return conn.execute("SELECT COUNT(*) FROM history WHERE id > ?",
+                            (row[0],)).fetchone()[0] >= HISTORY_CHECKPOINT_INTERVAL
+    
+    def checkpoint_due(self):
+        return self._checkpoint_due(self.conn)
+    
+    def write_checkpoint(self):
+        """Enregistre un instantané de la collection complète dans l'historique, s'il est dû
+
+        Un état passé se reconstruit depuis l'instantané précédent, sans
+        rejouer tout l'historique. La collection est lue et compressée hors
+        de toute transaction d'écriture, par blocs de HISTORY_FETCH_SIZE
+        lignes sur une connexion dédiée (appel possible depuis un autre
+        thread) : les synchronisations des autres processus ne sont pas
+        bloquées pendant la compression. Si une révision est écrite entre
+        temps, l'instantané est abandonné et sera retenté au prochain appel.
+        Seuls les HISTORY_MAX_CHECKPOINTS derniers instantanés et les
+        entrées qui les suivent sont conservés. Retourne True si
+        l'instantané a été écrit.
+        """
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        try:
+            if not self._checkpoint_due(conn):
+                return False
+            revision = conn.execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()[0]
+            data = self._compress_rows(b'{"bookmarks":[', self._read_blocks(conn), b']}')
+            
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if (conn.execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()[0] != revision
+                        or not self._checkpoint_due(conn)):
+                    conn.execute("ROLLBACK")
+                    return False
+                conn.execute(
+                    "INSERT INTO history (timestamp, revision, checkpoint, source, data) VALUES (?, ?, 1, NULL, ?)",
+                    (time.time(), revision, data)
+                )
+                oldest = conn.execute(
+                    "SELECT id FROM history WHERE checkpoint = 1 ORDER BY id DESC LIMIT 1 OFFSET ?",
+                    (HISTORY_MAX_CHECKPOINTS - 1,)
+                ).fetchone()
+                if oldest is not None:
+                    conn.execute("DELETE FROM history WHERE id < ?", (oldest[0],))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+        return True
+    
+    @staticmethod
+    def _fetch_blocks(cursor):
+        """Blocs de HISTORY_FETCH_SIZE valeurs `data` lus sur un curseur"""
+        while True:
+            batch = cursor.fetchmany(HISTORY_FETCH_SIZE)
+            if not batch:
+                return
+            yield [data for (data,) in batch]
+    
+    @staticmethod
+    def _read_blocks(conn):
+        """Blocs de HISTORY_FETCH_SIZE favoris de la collection, chacun lu par une requête distincte
+
+        Le verrou de lecture de la base n'est gardé que le temps d'un bloc.
+        """
+        last_id = 0
+        while True:
+            batch = conn.execute("SELECT id, data FROM bookmarks WHERE id > ? ORDER BY id LIMIT ?",
+                                 (last_id, HISTORY_FETCH_SIZE)).fetchall()
+            if not batch:
+                return
+            last_id = batch[-1][0]
+            yield [data for _, data in batch]
+    
+    @staticmethod
+    def _compress_rows(prefix, blocks, suffix):
+        """Compresse avec zlib `prefix`, les blocs de JSON séparés par des virgules, puis `suffix`
+
+        Les favoris sont déjà encodés en JSON dans la base : ils ne sont pas
+        décodés. Les lignes sont lues et compressées par blocs, sans
+        assembler le texte complet d'une révision (un import peut en
+        modifier des centaines de milliers).
+        """
+        compressor = zlib.compressobj()
+        parts = [compressor.compress(prefix)]
+        separator = b''
+        for block in blocks:
+            parts.append(compressor.compress(separator + ','.join(block).encode('utf-8')))
+            separator = b','
+        parts.append(compressor.compress(suffix))
+        parts.append(compressor.flush())
+        return b''.join(parts)
+    
+    def history(self):
+        """Entrées de l'historique, des plus anciennes aux plus récentes
+
+        Chaque entrée est un dictionnaire : `timestamp`, `revision`,
+        `checkpoint`, `source`, puis `bookmarks` (nombre de favoris d'un
+        instantané) ou `changed` et `removed` (nombres de changements).
+        """
+        entries = []
+        for timestamp, revision, checkpoint, source, data in self.conn.execute(
+                "SELECT timestamp, revision, checkpoint, source, data FROM history ORDER BY id"):
+            entry = {'timestamp': timestamp, 'revision': revision, 'checkpoint': bool(checkpoint),
+                     'source': source}
+            content = self.codec.loads(zlib.decompress(data))
+            if checkpoint:
+                entry['bookmarks'] = len(content['bookmarks'])
+            else:
+                entry['changed'] = len(content['changed'])
+                entry['removed'] = len(content['removed'])
+            entries.append(entry)
+        return entries
+    
+    def bookmarks_at(self, timestamp):
+        """Collection telle qu'elle était à `timestamp` (secondes depuis l'epoch)
+
+        L'état est reconstruit depuis le dernier instantané antérieur, en
+        appliquant au plus HISTORY_CHECKPOINT_INTERVAL entrées. Lève
+        LookupError si l'historique ne remonte pas jusqu'à cette date.
+        """
+        row = self.conn.execute(
+            "SELECT id, data FROM history WHERE checkpoint = 1 AND timestamp <= ? "
+            "ORDER BY id DESC LIMIT 1", (timestamp,)
+        ).fetchone()
+        if row is None:
+            raise LookupError("Aucun instantané antérieur dans l'historique")
+        checkpoint_id, data = row
+        bookmarks = {normalize_url(bm['url']): bm
+                     for bm in self.codec.loads(zlib.decompress(data))['bookmarks']}
+        
+        for entry_timestamp, checkpoint, data in self.conn.execute(
+                "SELECT timestamp, checkpoint, data FROM history WHERE id > ? ORDER BY id", (checkpoint_id,)):
+            if entry_timestamp > timestamp or checkpoint:
+                break
+            delta = self.codec.loads(zlib.decompress(data))
+            for url in delta['removed']:
+                bookmarks.pop(normalize_url(url), None)
+            for bm in delta['changed']:
+                bookmarks[normalize_url(bm['url'])] = bm
+        return list(bookmarks.values())
+    
+    def restore(self, timestamp, source='restore'):
+        """Rétablit la collection de `timestamp` dans une nouvelle révision
+
+        Les favoris ajoutés depuis sont supprimés et les favoris supprimés ou
+        modifiés retrouvent leur état : les extensions reçoivent la
+        restauration à leur prochaine synchronisation. Retourne (URLs
+        modifiées, URLs supprimées).
+        """
+        bookmarks = self.bookmarks_at(timestamp)
+        keys = {normalize_url(bm['url']) for bm in bookmarks}
+        removals = [url for (url,) in self.conn.execute("SELECT url FROM bookmarks")
+                    if normalize_url(url) not in keys]
+        return self.apply(bookmarks, removals, source)
+    
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM bookmarks").fetchone()[0]
+    
+    def all_bookmarks(self):
+        return list(self.iter_bookmarks())
+    
+    def iter_bookmarks(self):
+        """Favoris dans l'ordre d'insertion, lus en flux"""
+        loads = self.codec.loads
+        for (data,) in self.conn.execute("SELECT data FROM bookmarks ORDER BY id"):
+            yield loads(data)
+    
+    def bookmark_sources(self):
+        return dict(self.conn.execute("SELECT url, source FROM bookmarks ORDER BY id"))
+    
+    def bookmarks_by_folder(self):
+        """Favoris triés par dossier (`folder`), lus en flux
+
+        Les chemins sont comparés dossier par dossier (`/` trié avant tout
+        autre caractère) : les favoris d'un dossier précèdent ceux de ses
+        sous-dossiers et chaque dossier forme un seul groupe, si bien que
+        l'arborescence peut être écrite au fil de l'eau (voir syncmark.formats).
+        """
+        loads = self.codec.loads
+        for (data,) in self.conn.execute(
+                "SELECT data FROM bookmarks "
+                "ORDER BY replace(coalesce(json_extract(data, '$.folder'), ''), '/', char(1)), id"):
+            yield loads(data)
+    
+    def import_bookmarks(self, bookmarks, source='import', batch_size=IMPORT_BATCH_SIZE):
+        """Fusionne des favoris lus en flux (fichier d'un navigateur) en une seule révision
+
+        Les favoris sont écrits par lots de `batch_size` avec l'upsert de
+        `apply` : seul un lot est gardé en mémoire, quelle que soit la taille
+        de l'import. L'index de recherche des favoris ajoutés est construit
+        en une requête à la fin plutôt que par un trigger à chaque ligne. Une
+        erreur de lecture annule tout l'import. Retourne (nombre de favoris
+        lus, nombre de favoris ajoutés ou modifiés).
+        """
+        return self._import_rows(self._encode_rows(bookmarks, source), source, batch_size)
+    
+    def merge_batch(self, sources, workers=None, source='batch', batch_size=IMPORT_BATCH_SIZE):
+        """Fusionne plusieurs sources en une seule révision (voir syncmark.batch.merge_sources)
+
+        `sources` est une suite de (source, favoris), les favoris pouvant
+        être lus en flux : le résultat est celui d'appels successifs à
+        `apply` avec les favoris valides (voir syncmark.validation), mais
+        la validation, la normalisation, l'encodage et la fusion de chaque
+        tranche sont répartis sur `workers` processus. Les lignes sont
+        ensuite écrites comme un import. Retourne (nombre de
+        favoris valides reçus, nombre de favoris ajoutés ou modifiés).
+        """
+        from .batch import merge_sources
+        valid_count, rows = merge_sources(sources, workers, self.codec.name)
+        _, changed_count = self._import_rows(rows, source, batch_size)
+        return valid_count, changed_count
+    
+    def _encode_rows(self, bookmarks, source):
+        """Lignes (URL normalisée, URL, JSON, source) des favoris valides"""
+        dumps = self.codec.dumps
+        for bm in bookmarks:
+            if isinstance(bm, dict) and isinstance(bm.get('url'), str):
+                yield normalize_url(bm['url']), bm['url'], dumps(bm, sort_keys=True).decode('utf-8'), source
+    
+    def _import_rows(self, rows, source, batch_size):
+        """Écrit des lignes (URL normalisée, URL, JSON, source) par lots, en une révision"""
+        cache_size = self.conn.execute("PRAGMA cache_size").fetchone()[0]
+        self.conn.execute(f"PRAGMA cache_size = {IMPORT_CACHE_SIZE}")
+        try:
+            return self._write_rows(rows, source, batch_size)
+        finally:
+            self.conn.execute(f"PRAGMA cache_size = {cache_size}")
+    
+    def _write_rows(self, rows, source, batch_size):
+        read_count = 0
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            revision = self.revision + 1
+            last_id = self.conn.execute("SELECT coalesce(max(id), 0) FROM bookmarks").fetchone()[0]
+            row = self.conn.execute(
+                "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (INSERT_TRIGGER,)
+            ).fetchone()
+            if row:
+                self.conn.execute(f"DROP TRIGGER {INSERT_TRIGGER}")
+            
+            batch = []
+            for url_key, url, data, row_source in rows:
+                batch.append((url_key, url, data, revision, row_source))
+                if len(batch) >= batch_size:
+                    self.conn.executemany(self.UPSERT, batch)
+                    read_count += len(batch)
+                    batch = []
+            self.conn.executemany(self.UPSERT, batch)
+            read_count += len(batch)
+            
+            changed_count = self.conn.execute(
+                "SELECT COUNT(*) FROM bookmarks WHERE revision = ?", (revision,)).fetchone()[0]
+            if not changed_count:
+                self.conn.execute("ROLLBACK")
+                return read_count, 0
+            self.conn.execute(
+                "DELETE FROM tombstones WHERE EXISTS (SELECT 1 FROM bookmarks "
+                "WHERE bookmarks.url_key = tombstones.url_key AND bookmarks.revision = ?)", (revision,))
+            if row:
+                # Les favoris modifiés ont été réindexés par le trigger de mise à jour
+                self.conn.execute(row[0])
+                self.conn.execute(INDEX_ROWS_AFTER, (last_id,))
+            self._set_meta('revision', revision)
+            self._record_history(revision, source)
+            self._trim_tombstones()
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self._after_commit()
+        return read_count, changed_count
+    
+    def apply(self, upserts, removals, source=None):
+        with current_stage('persist'):
+            return self._apply(upserts, removals, source)
+    
+    def _apply(self, upserts, removals, source):
+        # BEGIN IMMEDIATE prend le verrou d'écriture de la base : les fusions
+        # de plusieurs processus (profils, navigateurs) sont sérialisées.
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            revision = self.revision + 1
+            changed_urls = self._upsert_rows(upserts, revision, source)
+            removed_urls = self._remove_rows(removals, revision)
+            if not changed_urls and not removed_urls:
+                self.conn.execute("ROLLBACK")
+                return [], []
+            self._set_meta('revision', revision)
+            self._record_history(revision, source)
+            self._trim_tombstones()
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self._after_commit()
+        return changed_urls, removed_urls
+    
+    def search(self, text, limit):
+        query = match_query(text)
+        if query is None:
+            return []
+        return [self.codec.loads(data) for (data,) in self.conn.execute(SEARCH_QUERY, (query, limit))]
+    
+    def changes_since(self, revision):
+        changed = [self.codec.loads(data) for (data,) in self.conn.execute(
+            "SELECT data FROM bookmarks WHERE revision > ? ORDER BY id", (revision,))]
+        removed = [url for (url,) in self.conn.execute(
+            "SELECT url FROM tombstones WHERE revision > ?", (revision,))]
+        return changed, removed
+    
+    def close(self):
+        self.conn.close()
+
+class CachedBookmarkStore(BookmarkStore):
+    """Cache mémoire de la collection complète au-dessus d'un stockage
+
+    En mode host, le processus vit aussi longtemps que la connexion avec le
+    navigateur : la collection n'est chargée qu'une fois, puis rafraîchie
+    uniquement lorsque le fichier du stockage change (inode, taille ou date
+    de modification), par exemple quand un autre profil synchronise. Le
+    rafraîchissement ne relit que les changements depuis la révision en cache.
+    
+    Les favoris sont gardés sous forme compacte (BookmarkRecord) : la
+    collection est chargée en une passe sur la base, sans liste
+    intermédiaire, et la clé d'un favori dont l'URL est déjà normalisée
+    est la chaîne de son URL.
+    """
+    
+    def __init__(self, store):
+        self.store = store
+        self.bookmarks = None
+        self.cached_revision = None
+        self.signature = None
+    
+    @property
+    def path(self):
+        return self.store.path
+    
+    @property
+    def revision(self):
+        return self.store.revision
+    
+    @property
+    def base_revision(self):
+        return self.store.base_revision
+    
+    def _load(self):
+        # Signature et révision sont lues avant les données : une écriture
+        # concurrente sera simplement réappliquée au prochain rafraîchissement.
+        self.signature = file_signature(self.store.path)
+        self.cached_revision = self.store.revision
+        self.bookmarks = {}
+        for bm in self.store.iter_bookmarks():
+            self._put(normalize_url(bm['url']), bm)
+        logging.info(f"Cache des favoris chargé : {len(self.bookmarks)} favoris")
+    
+    def _refresh(self):
+        signature = file_signature(self.store.path)
+        if signature == self.signature:
+            return
+        if not self.store.is_known(self.cached_revision):
+            self._load()
+            return
+        
+        revision = self.store.revision
+        changed, removed = self.store.changes_since(self.cached_revision)
+        # Un doublon supprimé a la même clé que le favori gardé (voir _rekey)
+        for url in removed:
+            self.bookmarks.pop(normalize_url(url), None)
+        for bm in changed:
+            self._put(normalize_url(bm['url']), bm)
+        self.cached_revision = revision
+        self.signature = signature
+    
+    def _put(self, url_key, bm):
+        self.bookmarks[url_key] = BookmarkRecord.from_dict(bm, url_key if url_key == bm['url'] else None)
+    
+    def _ensure_loaded(self):
+        if self.bookmarks is None:
+            self._load()
+        else:
+            self._refresh()
+    
+    def invalidate(self):
+        """Oublie le contenu du cache"""
+        self.bookmarks = None
+    
+    def bookmark_map(self):
+        """Dictionnaire URL normalisée -> favori (BookmarkRecord, ne pas modifier)"""
+        self._ensure_loaded()
+        return self.bookmarks
+    
+    def count(self):
+        if self.bookmarks is None:
+            return self.store.count()
+        self._refresh()
+        return len(self.bookmarks)
+    
+    def all_bookmarks(self):
+        self._ensure_loaded()
+        return list(self.bookmarks.values())
+    
+    def bookmark_sources(self):
+        return self.store.bookmark_sources()
+    
+    def apply(self, upserts, removals, source=None):
+        result = self.store.apply(upserts, removals, source)
+        if self.bookmarks is not None:
+            self._refresh()
+        return result
+    
+    def changes_since(self, revision):
+        return self.store.changes_since(revision)
+    
+    def search(self, text, limit):
+        return self.store.search(text, limit)
+    
+    def checkpoint_due(self):
+        return self.store.checkpoint_due()
+    
+    def write_checkpoint(self):
+        return self.store.write_checkpoint()
+    
+    def close(self):
+        self.invalidate()
+        self.store.close()
+
+class WriteBehindStore(BookmarkStore):
+    """Écritures différées et regroupées au-dessus d'un CachedBookmarkStore
+
+    Les changements sont visibles immédiatement en mémoire (l'extension est
+    acquittée sans attendre le disque) puis écrits en une seule transaction
+    `delay` secondes après le premier changement en attente. `flush` force
+    l'écriture ; elle est appelée à la fermeture du stockage.
+
+    `revision` reste la dernière révision écrite : un client acquitté avant
+    l'écriture recevra à nouveau ces changements à sa prochaine synchro.
+
+    Les instantanés de l'historique sont écrits par un thread après
+    l'écriture, quand ils sont dus : ni la transaction ni l'extension
+    n'attendent la compression de la collection.
+    """
+    
+    def __init__(self, store, delay=0, export_path=None, export_pretty=False):
+        self.store = store
+        self.delay = delay
+        self.export_path = export_path
+        self.export_pretty = export_pretty
+        self.pending = {}
+        self.timer = None
+        self.checkpoint_thread = None
+        self.lock = threading.RLock()
+    
+    @property
+    def path(self):
+        return self.store.path
+    
+    @property
+    def revision(self):
+        with self.lock:
+            return self.store.revision
+    
+    @property
+    def base_revision(self):
+        with self.lock:
+            return self.store.base_revision
+    
+    def count(self):
+        with self.lock:
+            if not self.pending:
+                return self.store.count()
+            stored = self.store.bookmark_map()
+            count = len(stored)
+            for url_key, (bookmark, _, _) in self.pending.items():
+                if url_key in stored:
+                    count -= bookmark is None
+                else:
+                    count += bookmark is not None
+            return count
+    
+    def all_bookmarks(self):
+        """Favoris stockés, avec les changements en attente, en une passe sans copie de la collection"""
+        with self.lock:
+            if not self.pending:
+                return self.store.all_bookmarks()
+            stored = self.store.bookmark_map()
+            bookmarks = []
+            for url_key, bookmark in stored.items():
+                change = self.pending.get(url_key)
+                if change is None:
+                    bookmarks.append(bookmark)
+                elif change[0] is not None:
+                    bookmarks.append(change[0])
+            bookmarks.extend(bookmark for url_key, (bookmark, _, _) in self.pending.items()
+                             if bookmark is not None and url_key not in stored)
+            return bookmarks
+    
+    def bookmark_sources(self):
+        with self.lock:
+            sources = self.store.bookmark_sources()
+            for bookmark, url, source in self.pending.values():
+                if bookmark is None:
+                    sources.pop(url, None)
+                else:
+                    sources.setdefault(url, source)
+            return sources
+    
+    def apply(self, upserts, removals, source=None):
+        """Met les changements en attente et retourne les URLs concernées"""
+        changed_urls, removed_urls = [], []
+        with self.lock:
+            for bm in upserts:
+                if isinstance(bm, dict) and isinstance(bm.get('url'), str):
+                    self.pending[normalize_url(bm['url'])] = (bm, bm['url'], source)
+                    changed_urls.append(bm['url'])
+            for url in removals:
+                self.pending[normalize_url(url)] = (None, url, source)
+                removed_urls.append(url)
+            
+            if not self.pending:
+                return [], []
+            if self.delay <= 0:
+                self.flush()
+            elif self.timer is None:
+                self.timer = threading.Timer(self.delay, self._flush_in_background)
+                self.timer.daemon = True
+                self.timer.start()
+        return changed_urls, removed_urls
+    
+    def changes_since(self, revision):
+        with self.lock:
+            changed, removed = self.store.changes_since(revision)
+            if not self.pending:
+                return changed, removed
+            changed = [bm for bm in changed if normalize_url(bm['url']) not in self.pending]
+            removed = [url for url in removed if normalize_url(url) not in self.pending]
+            for bookmark, url, _ in self.pending.values():
+                if bookmark is None:
+                    removed.append(url)
+                else:
+                    changed.append(bookmark)
+            return changed, removed
+    
+    def search(self, text, limit):
+        """Recherche dans la base, après écriture des changements en attente"""
+        with self.lock:
+            self.flush()
+            return self.store.search(text, limit)
+    
+    def flush(self):
+        """Écrit les changements en attente, en une transaction par source"""
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if not self.pending:
+                return
+            
+            pending, self.pending = self.pending, {}
+            by_source = {}
+            for bookmark, url, source in pending.values():
+                upserts, removals = by_source.setdefault(source, ([], []))
+                if bookmark is None:
+                    removals.append(url)
+                else:
+                    upserts.append(bookmark)
+            changed_urls, removed_urls = [], []
+            try:
+                # Une transaction déjà validée sera réappliquée sans effet en cas d'échec
+                for source, (upserts, removals) in by_source.items():
+                    changed, removed = self.store.apply(upserts, removals, source)
+                    changed_urls += changed
+                    removed_urls += removed
+            except BaseException:
+                # Les changements plus récents restent prioritaires
+                pending.update(self.pending)
+                self.pending = pending
+                raise
+            logging.info(f"Écriture différée : {len(changed_urls)} modifiés, {len(removed_urls)} supprimés")
+            
+            if (changed_urls or removed_urls) and self.export_path:
+                try:
+                    self.store.export_json(self.export_path, pretty=self.export_pretty)
+                    logging.info("Favoris exportés en JSON")
+                except IOError as e:
+                    logging.error(f"Erreur export JSON des favoris : {e}")
+            if changed_urls or removed_urls:
+                self._start_checkpoint()
+    
+    def _start_checkpoint(self):
+        if self.checkpoint_thread is not None and self.checkpoint_thread.is_alive():
+            return
+        if self.store.checkpoint_due():
+            self.checkpoint_thread = threading.Thread(target=self._checkpoint_in_background, daemon=True)
+            self.checkpoint_thread.start()
+    
+    def _checkpoint_in_background(self):
+        try:
+            if self.store.write_checkpoint():
+                logging.info("Instantané de l'historique écrit")
+        except Exception as e:
+            logging.error(f"Erreur instantané de l'historique : {e}", exc_info=True)
+    
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        except Exception as e:
+            logging.error(f"Erreur écriture différée des favoris : {e}", exc_info=True)
+            with self.lock:
+                if self.pending and self.timer is None:
+                    self.timer = threading.Timer(self.delay, self._flush_in_background)
+                    self.timer.daemon = True
+                    self.timer.start()
+    
+    def close(self):
+        with self.lock:
+            try:
+                self.flush()
+            finally:
+                if self.checkpoint_thread is not None:
+                    self.checkpoint_thread.join()
+                self.store.close()
@@ -0,0 +1,714 @@
+"""
+Arborescence des favoris : dossiers, ordre et doublons d'URL conservés
+Chaque nœud a un identifiant stable (`node_id`), un parent, une position et
+une date de modification. L'arbre envoyé par l'extension est fusionné à
+trois voies avec l'arbre stocké : la base est l'état de l'arbre à la
+révision reçue par l'extension lors de sa dernière synchronisation,
+reconstruite à partir de l'historique des nœuds.
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+
+from .metrics import current_stage
+from .store import BUSY_TIMEOUT
+
+# Identifiant du nœud racine (racine de chrome.bookmarks.getTree())
+ROOT_ID = 'root'
+
+# Nombre de révisions pendant lesquelles l'historique des nœuds est conservé
+MAX_TREE_HISTORY = 1000
+
+# Bornes des dates stockées : entier SQLite (64 bits signé)
+MIN_NODE_DATE = -2 ** 63
+MAX_NODE_DATE = 2 ** 63 - 1
+
+def node_hash(title, url, child_hashes=()):
+    """Empreinte d'un sous-arbre : titre, URL et empreintes des enfants dans l'ordre
+
+    16 premiers octets du SHA-256 de : titre en UTF-8, puis `\0F` pour un
+    dossier ou `\0B` suivi de l'URL pour un favori, puis les empreintes des
+    enfants. L'extension peut la calculer avec crypto.subtle.digest. La
+    position du nœud n'en fait pas partie : elle compte dans l'empreinte de
+    son parent.
+    """
+    digest = hashlib.sha256(title.encode('utf-8'))
+    if url is None:
+        digest.update(b'\0F')
+    else:
+        digest.update(b'\0B' + url.encode('utf-8'))
+    for child_hash in child_hashes:
+        digest.update(child_hash)
+    return digest.digest()[:16]
+
+def node_modified(data):
+    """Date de dernière modification d'un nœud de l'extension (ms, 0 si inconnue)
+
+    Lève ValueError pour une date non finie (NaN, Infinity) ou hors des
+    bornes d'un entier SQLite.
+    """
+    for key in ('modified', 'dateGroupModified', 'dateAdded'):
+        value = data.get(key)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            # Faux pour NaN : la comparaison suffit aussi pour les valeurs non finies
+            if not MIN_NODE_DATE <= value <= MAX_NODE_DATE:
+                raise ValueError(f"Date {key} invalide : {value!r}")
+            return int(value)
+    return 0
+
+class ClientNode:
+    """Nœud de l'arbre envoyé par l'extension (format de chrome.bookmarks.getTree)
+
+    Un sous-arbre que l'extension n'a pas modifié depuis sa dernière
+    synchronisation peut être remplacé par un résumé `{"node_id": ...,
+    "hash": ...}` (empreinte en hexadécimal, voir node_hash) : il n'est
+    alors ni transmis ni fusionné.
+    """
+    
+    __slots__ = ('local_id', 'sent_id', 'node_id', 'title', 'url', 'modified', 'children', 'hash', 'summary')
+    
+    def __init__(self, data):
+        local_id = data.get('id')
+        self.local_id = None if local_id is None else str(local_id)
+        node_id = data.get('node_id')
+        self.sent_id = node_id if isinstance(node_id, str) else None
+        self.node_id = None
+        title = data.get('title')
+        self.title = title if isinstance(title, str) else ''
+        url = data.get('url')
+        self.url = url if isinstance(url, str) else None
+        self.modified = node_modified(data)
+        self.children = [] if self.url is None else None
+        self.hash = None
+        self.summary = (self.sent_id is not None and 'children' not in data and 'url' not in data
+                        and isinstance(data.get('hash'), str))
+        if self.summary:
+            self.children = None
+            self.hash = bytes.fromhex(data['hash'])
+
+def parse_tree(data):
+    """Construit l'arbre de l'extension et calcule les empreintes
+
+    Retourne (racine, nœuds en ordre préfixe). Le parcours est itératif :
+    la profondeur de l'arbre n'est pas limitée par la pile Python.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Arbre des favoris invalide")
+    root = ClientNode(data)
+    root.title, root.url, root.children, root.summary = '', None, [], False
+    
+    nodes = []
+    stack = [(root, data)]
+    while stack:
+        node, node_data = stack.pop()
+        nodes.append(node)
+        if node.children is None:
+            continue
+        children = node_data.get('children')
+        for child_data in children if isinstance(children, list) else ():
+            if isinstance(child_data, dict):
+                child = ClientNode(child_data)
+                node.children.append(child)
+                stack.append((child, child_data))
+    
+    # Ordre préfixe inversé : les enfants sont traités avant leur parent
+    for node in reversed(nodes):
+        if not node.summary:
+            node.hash = node_hash(node.title, node.url,
+                                  [child.hash for child in node.children] if node.children else ())
+    return root, nodes
+
+def node_reply(row):
+    """Nœud stocké au format des réponses"""
+    node = {'node_id': row['node_id'], 'parent_id': row['parent_id'], 'index': row['position'],
+            'title': row['title'], 'modified': row['modified']}
+    if row['url'] is not None:
+        node['url'] = row['url']
+    return node
+
+def parents_first(rows):
+    """Ordonne des nœuds pour qu'un parent précède toujours ses enfants"""
+    by_parent = {}
+    ids = {row['node_id'] for row in rows}
+    for row in rows:
+        parent_id = row['parent_id'] if row['parent_id'] in ids else None
+        by_parent.setdefault(parent_id, []).append(row)
+    
+    ordered = []
+    stack = list(reversed(by_parent.get(None, [])))
+    while stack:
+        row = stack.pop()
+        ordered.append(row)
+        stack.extend(reversed(by_parent.get(row['node_id'], [])))
+    return ordered
+
+class TreeMerge:
+    """Fusion à trois voies de l'arbre de l'extension dans l'arbre stocké
+
+    La descente compare les empreintes : un sous-arbre identique au stocké
+    n'est pas parcouru, et seuls les dossiers qui diffèrent sont lus dans
+    la base. Pour chaque différence :
+    - un changement d'un seul côté par rapport à la base est retenu ;
+    - un changement des deux côtés est résolu par la date de modification
+      la plus récente (le stockage l'emporte à égalité) ;
+    - un nœud absent de l'arbre de l'extension n'est supprimé que s'il
+      existait dans la base et n'a pas été modifié depuis ;
+    - l'ordre de l'extension est retenu si elle a réordonné le dossier,
+      sinon l'ordre stocké est conservé et les nouveaux nœuds sont insérés
+      à leur position dans l'extension.
+
+    Sans base (première synchronisation d'un profil), l'arbre complet est
+    parcouru et fusionné par union, sans suppression : les nœuds sans
+    identifiant sont rapprochés des nœuds stockés par URL (favoris), titre
+    (dossiers) ou position (dossiers racines).
+    """
+    
+    def __init__(self, store, root, nodes, base_revision, revision, source=None):
+        self.store = store
+        self.conn = store.conn
+        self.root = root
+        self.nodes = nodes
+        self.base_revision = base_revision
+        self.revision = revision
+        self.source = source
+        # local_id -> node_id des nœuds identifiés pendant la fusion
+        self.id_map = {}
+        # node_id -> (parent, index, titre, URL) tels que connus de l'extension
+        self.client_state = {}
+        # node_id -> nœud de l'extension, pour les nœuds déjà identifiés
+        self.client_ids = {}
+        self.aliases = {}
+        self.folders = {}
+        self.arrived = set()
+        self.created = set()
+        self.removed = set()
+        self.touched = set()
+        self.dirty = set()
+    
+    def node(self, node_id):
+        return self.conn.execute("SELECT * FROM tree_nodes WHERE node_id = ?", (node_id,)).fetchone()
+    
+    def children(self, node_id):
+        return self.conn.execute(
+            "SELECT * FROM tree_nodes WHERE parent_id = ? AND deleted = 0 ORDER BY position", (node_id,)
+        ).fetchall()
+    
+    def base(self, node_id):
+        """État du nœud à la révision de base (None s'il n'existait pas)"""
+        if self.base_revision is None:
+            return None
+        row = self.conn.execute(
+            "SELECT * FROM tree_history WHERE node_id = ? AND revision <= ? "
+            "ORDER BY revision DESC LIMIT 1", (node_id, self.base_revision)
+        ).fetchone()
+        return None if row is None or row['deleted'] else row
+    
+    def save(self, node_id, row, **changes):
+        """Écrit un nœud modifié dans la révision de la fusion, avec son historique"""
+        values = dict(row) if row is not None else {'node_id': node_id, 'deleted': 0}
+        values.update(changes)
+        values['revision'] = self.revision
+        if values['url'] is not None:
+            # Empreinte d'un favori : calculée directement, sans relire le nœud
+            if 'hash' not in changes:
+                values['hash'] = node_hash(values['title'], values['url'])
+        else:
+            values.setdefault('hash', b'')
+            self.dirty.add(node_id)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO tree_nodes "
+            "(node_id, parent_id, position, title, url, modified, revision, hash, deleted) "
+            "VALUES (:node_id, :parent_id, :position, :title, :url, :modified, :revision, :hash, :deleted)",
+            values
+        )
+        self.conn.execute(
+            "INSERT OR REPLACE INTO tree_history "
+            "(node_id, revision, parent_id, position, title, url, deleted) "
+            "VALUES (:node_id, :revision, :parent_id, :position, :title, :url, :deleted)",
+            values
+        )
+        self.touched.add(node_id)
+        self.dirty.add(values['parent_id'])
+        if row is not None:
+            self.dirty.add(row['parent_id'])
+    
+    def identify(self):
+        """Associe aux nœuds de l'extension les identifiants déjà connus
+
+        Un nœud est identifié par le `node_id` qu'envoie l'extension ou, à
+        défaut, par l'identifiant local déjà vu pour la même source.
+        """
+        if self.source is not None:
+            self.aliases = dict(self.conn.execute(
+                "SELECT local_id, node_id FROM tree_aliases WHERE source = ?", (self.source,)))
+        for node in self.nodes[1:]:
+            node_id = node.sent_id or self.aliases.get(node.local_id)
+            if node_id is not None and node_id != ROOT_ID and node_id not in self.client_ids:
+                node.node_id = node_id
+                self.client_ids[node_id] = node
+        self.root.node_id = ROOT_ID
+    
+    def run(self):
+        self.identify()
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node.summary:
+                # Inchangé côté extension : l'état stocké est conservé
+                continue
+            if node.node_id in self.created:
+                # Nœud créé par cette fusion : seuls ses enfants restent à créer
+                if node.children:
+                    self.folders[node.node_id] = self.resolve_children(node)
+                    stack.extend(child for child in node.children if child.node_id is not None)
+                continue
+            row = self.node(node.node_id)
+            # Sous-arbre identique : rien à fusionner (sauf sans base, pour identifier tous les nœuds)
+            if (self.base_revision is not None and row is not None
+                    and not row['deleted'] and row['hash'] == node.hash):
+                continue
+            if node is not self.root:
+                self.merge_fields(node, row)
+            if node.children is None:
+                continue
+            self.folders[node.node_id] = self.resolve_children(node)
+            stack.extend(child for child in node.children if child.node_id is not None)
+        
+        for folder_id, children in self.folders.items():
+            self.order_folder(folder_id, children)
+        self.update_hashes()
+        self.save_aliases()
+    
+    def merge_fields(self, node, row):
+        """Fusion du titre et de l'URL d'un nœud"""
+        client = (node.title, node.url)
+        current = (row['title'], row['url'])
+        if client == current or (node.url is None) != (row['url'] is None):
+            return
+        base = self.base(node.node_id)
+        if base is not None and (base['title'], base['url']) == current:
+            client_wins = True
+        elif base is not None and (base['title'], base['url']) == client:
+            client_wins = False
+        else:
+            client_wins = node.modified > row['modified']
+        if client_wins:
+            self.save(node.node_id, row, title=node.title, url=node.url, modified=node.modified)
+    
+    def resolve_children(self, folder):
+        """Identifie et place les enfants d'un dossier de l'extension
+
+        Retourne la liste des node_id des enfants retenus, dans l'ordre de
+        l'extension.
+        """
+        folder_id = folder.node_id
+        available = {}
+        for index, row in enumerate(self.children(folder_id)):
+            if row['node_id'] not in self.client_ids:
+                # Les dossiers racines (barre de favoris, autres favoris...) ont un
+                # titre traduit dans la langue du navigateur : rapprochés par position
+                key = index if folder_id == ROOT_ID else (row['title'] if row['url'] is None else None, row['url'])
+                available.setdefault(key, []).append(row['node_id'])
+        
+        resolved = []
+        for index, child in enumerate(folder.children):
+            row = self.node(child.node_id) if child.node_id is not None else None
+            if row is not None and (row['parent_id'] is None or (
+                    not child.summary and (row['url'] is None) != (child.url is None))):
+                row = None
+            if child.summary and (row is None or row['deleted']):
+                # Résumé d'un nœud inconnu ou supprimé : rien à fusionner
+                child.node_id = None
+                continue
+            if row is not None and row['deleted'] and not self.changed_since_base(child, row['node_id']):
+                # Supprimé par un autre client et inchangé ici : la suppression l'emporte
+                child.node_id = None
+                continue
+            if row is None:
+                key = index if folder_id == ROOT_ID else (child.title if child.url is None else None, child.url)
+                candidates = available.get(key)
+                if candidates:
+                    child.node_id = candidates.pop(0)
+                    row = self.node(child.node_id)
+                else:
+                    child.node_id = os.urandom(8).hex()
+            
+            self.place(child, row, folder_id, index)
+            if child.local_id is not None and child.sent_id != child.node_id:
+                self.id_map[child.local_id] = child.node_id
+            if child.summary:
+                self.client_state[child.node_id] = (folder_id, index, None, None)
+            else:
+                self.client_state[child.node_id] = (folder_id, index, child.title, child.url)
+            resolved.append(child.node_id)
+        return resolved
+    
+    def changed_since_base(self, node, node_id):
+        base = self.base(node_id)
+        return base is not None and (base['title'], base['url']) != (node.title, node.url)
+    
+    def is_ancestor(self, node_id, folder_id):
+        """Vrai si `node_id` est `folder_id` ou l'un de ses ancêtres"""
+        while folder_id is not None:
+            if folder_id == node_id:
+                return True
+            folder_id = self.node(folder_id)['parent_id']
+        return False
+    
+    def place(self, node, row, folder_id, index):
+        """Crée, restaure ou déplace un nœud dans le dossier où l'extension le place"""
+        if row is None:
+            self.save(node.node_id, None, parent_id=folder_id, position=index,
+                      title=node.title, url=node.url, modified=node.modified, hash=node.hash)
+            self.created.add(node.node_id)
+            self.arrived.add(node.node_id)
+            return
+        if row['deleted']:
+            # Supprimé par un autre client mais modifié ici : la modification l'emporte
+            self.save(node.node_id, row, parent_id=folder_id, position=index, deleted=0,
+                      title=node.title, url=node.url, modified=max(node.modified, row['modified']))
+            self.arrived.add(node.node_id)
+            return
+        if row['parent_id'] == folder_id:
+            return
+        
+        base = self.base(node.node_id)
+        if base is not None and base['parent_id'] == row['parent_id']:
+            client_moved = True
+        elif base is not None and base['parent_id'] == folder_id:
+            client_moved = False
+        else:
+            client_moved = node.modified > row['modified']
+        # Deux déplacements croisés ne doivent pas créer de cycle
+        if client_moved and not self.is_ancestor(node.node_id, folder_id):
+            self.save(node.node_id, row, parent_id=folder_id, position=index)
+            self.arrived.add(node.node_id)
+    
+    def deleted_by_client(self, row):
+        """Vrai si un nœud absent de l'extension existait dans sa base et n'a pas changé depuis"""
+        base = self.base(row['node_id'])
+        return base is not None and (base['parent_id'], base['title'], base['url']) == (
+            row['parent_id'], row['title'], row['url'])
+    
+    def delete_subtree(self, node_id):
+        stack = [node_id]
+        while stack:
+            row = self.node(stack.pop())
+            self.save(row['node_id'], row, deleted=1)
+            self.removed.add(row['node_id'])
+            stack.extend(child['node_id'] for child in self.children(row['node_id']))
+    
+    def order_folder(self, folder_id, client_order):
+        """Supprime les nœuds retirés par l'extension et renumérote les positions du dossier"""
+        rows = self.children(folder_id)
+        current = {row['node_id'] for row in rows}
+        client_order = [node_id for node_id in client_order if node_id in current]
+        in_client = set(client_order)
+        
+        server_order = []
+        for row in rows:
+            node_id = row['node_id']
+            if node_id not in in_client and node_id not in self.client_ids and self.deleted_by_client(row):
+                self.delete_subtree(node_id)
+            else:
+                server_order.append(node_id)
+        
+        base_positions = {}
+        for node_id in client_order:
+            base = self.base(node_id)
+            if base is not None and base['parent_id'] == folder_id:
+                base_positions[node_id] = base['position']
+        known = [node_id for node_id in client_order if node_id in base_positions]
+        
+        if known != sorted(known, key=base_positions.get):
+            # Dossier réordonné par l'extension
+            order = list(client_order)
+            for index, node_id in enumerate(server_order):
+                if node_id not in in_client:
+                    order.insert(min(index, len(order)), node_id)
+        else:
+            order = [node_id for node_id in server_order if node_id not in self.arrived]
+            for index, node_id in enumerate(client_order):
+                if node_id in self.arrived:
+                    order.insert(min(index, len(order)), node_id)
+        
+        positions = {row['node_id']: row for row in rows}
+        for position, node_id in enumerate(order):
+            row = positions[node_id]
+            if row['position'] != position:
+                self.save(node_id, self.node(node_id), position=position)
+    
+    def update_hashes(self):
+        """Recalcule les empreintes des nœuds modifiés et de leurs ancêtres, des feuilles vers la racine"""
+        depths = {}
+        for node_id in self.dirty:
+            chain = []
+            while node_id is not None and node_id not in depths:
+                chain.append(node_id)
+                row = self.node(node_id)
+                node_id = row['parent_id'] if row is not None else None
+            depth = depths[node_id] + 1 if node_id is not None else 0
+            for offset, chained_id in enumerate(reversed(chain)):
+                depths[chained_id] = depth + offset
+        
+        for node_id in sorted(depths, key=depths.get, reverse=True):
+            row = self.node(node_id)
+            if row is None or row['deleted']:
+                continue
+            child_hashes = [child['hash'] for child in self.children(node_id)] if row['url'] is None else ()
+            new_hash = node_hash(row['title'], row['url'], child_hashes)
+            if new_hash != row['hash']:
+                self.conn.execute("UPDATE tree_nodes SET hash = ? WHERE node_id = ?", (new_hash, node_id))
+    
+    def save_aliases(self):
+        """Mémorise l'identifiant local des nœuds identifiés pour la source"""
+        if self.source is None:
+            return
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO tree_aliases (source, local_id, node_id) VALUES (?, ?, ?)",
+            [(self.source, local_id, node_id) for local_id, node_id in self.id_map.items()
+             if self.aliases.get(local_id) != node_id]
+        )
+
+class SqliteTreeStore:
+    """Arborescence des favoris, dans la base SQLite du stockage
+
+    Les nœuds supprimés restent dans `tree_nodes` (colonne `deleted`) et
+    chaque version d'un nœud est gardée dans `tree_history` pendant
+    MAX_TREE_HISTORY révisions : l'état de base d'une fusion est lu nœud
+    par nœud, seulement pour les nœuds qui diffèrent.
+    """
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS tree_nodes (
+            node_id TEXT PRIMARY KEY,
+            parent_id TEXT,
+            position INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            url TEXT,
+            modified INTEGER NOT NULL,
+            revision INTEGER NOT NULL,
+            hash BLOB NOT NULL,
+            deleted INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_tree_nodes_parent ON tree_nodes(parent_id, position);
+        CREATE INDEX IF NOT EXISTS idx_tree_nodes_revision ON tree_nodes(revision);
+        CREATE TABLE IF NOT EXISTS tree_history (
+            node_id TEXT NOT NULL,
+            revision INTEGER NOT NULL,
+            parent_id TEXT,
+            position INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            url TEXT,
+            deleted INTEGER NOT NULL,
+            PRIMARY KEY (node_id, revision)
+        );
+        CREATE TABLE IF NOT EXISTS tree_aliases (
+            source TEXT NOT NULL,
+            local_id TEXT NOT NULL,
+            node_id TEXT NOT NULL,
+            PRIMARY KEY (source, local_id)
+        );
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None,
+                                    check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(self.SCHEMA)
+        if self._get_meta('tree_revision') is None:
+            self._initialize()
+    
+    def _get_meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+    
+    def _set_meta(self, key, value):
+        self.conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value)
+        )
+    
+    @property
+    def revision(self):
+        return self._get_meta('tree_revision')
+    
+    @property
+    def base_revision(self):
+        return self._get_meta('tree_base_revision')
+    
+    def is_known(self, revision):
+        """Indique si l'état de l'arbre à `revision` peut être reconstruit"""
+        return (isinstance(revision, int) and not isinstance(revision, bool)
+                and self.base_revision <= revision <= self.revision)
+    
+    def _initialize(self):
+        """Crée l'arbre vide (nœud racine seul)"""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self._get_meta('tree_revision') is None:
+                self.conn.execute(
+                    "INSERT INTO tree_nodes (node_id, parent_id, position, title, url, modified, revision, hash) "
+                    "VALUES (?, NULL, 0, '', NULL, 0, 1, ?)", (ROOT_ID, node_hash('', None))
+                )
+                self.conn.execute(
+                    "INSERT INTO tree_history (node_id, revision, parent_id, position, title, url, deleted) "
+                    "VALUES (?, 1, NULL, 0, '', NULL, 0)", (ROOT_ID,)
+                )
+                self._set_meta('tree_revision', 1)
+                self._set_meta('tree_base_revision', 1)
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+    
+    def _trim_history(self, revision):
+        """Oublie l'historique antérieur à MAX_TREE_HISTORY révisions
+
+        La dernière version de chaque nœud avant la coupure est gardée : elle
+        reste la base des nœuds inchangés depuis. Le nettoyage est fait par
+        paliers d'un dixième de l'historique.
+        """
+        cutoff = revision - MAX_TREE_HISTORY
+        if cutoff - self.base_revision < MAX_TREE_HISTORY // 10:
+            return
+        self.conn.execute(
+            "DELETE FROM tree_history WHERE revision < :cutoff AND EXISTS ("
+            "SELECT 1 FROM tree_history AS newer WHERE newer.node_id = tree_history.node_id "
+            "AND newer.revision > tree_history.revision AND newer.revision <= :cutoff)",
+            {'cutoff': cutoff}
+        )
+        self.conn.execute(
+            "DELETE FROM tree_history WHERE node_id IN "
+            "(SELECT node_id FROM tree_nodes WHERE deleted = 1 AND revision <= ?)", (cutoff,)
+        )
+        self.conn.execute("DELETE FROM tree_nodes WHERE deleted = 1 AND revision <= ?", (cutoff,))
+        # Les clients antérieurs devront refaire une synchronisation complète
+        self._set_meta('tree_base_revision', cutoff)
+    
+    @property
+    def root_hash(self):
+        return self.conn.execute("SELECT hash FROM tree_nodes WHERE node_id = ?", (ROOT_ID,)).fetchone()[0]
+    
+    def count(self):
+        """Nombre de nœuds (dossiers et favoris, hors racine)"""
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM tree_nodes WHERE deleted = 0 AND parent_id IS NOT NULL").fetchone()[0]
+    
+    def all_nodes(self):
+        """Liste complète des nœuds, chaque parent avant ses enfants"""
+        rows = self.conn.execute(
+            "SELECT * FROM tree_nodes WHERE deleted = 0 AND parent_id IS NOT NULL ORDER BY position").fetchall()
+        return [node_reply(row) for row in parents_first(rows)]
+    
+    def differing_subtrees(self, client_hashes):
+        """Dossiers dont l'empreinte diffère de celle de l'extension, et leur contenu
+
+        `client_hashes` associe des node_id aux empreintes (hexadécimal) de
+        l'extension. La descente part de la racine et ne parcourt que les
+        dossiers dont l'empreinte diffère : pour chacun, la liste complète
+        de ses enfants est retournée. Retourne (node_id des dossiers, nœuds).
+        """
+        folders = []
+        nodes = []
+        stack = [ROOT_ID]
+        while stack:
+            folder_id = stack.pop()
+            folders.append(folder_id)
+            children = self.conn.execute(
+                "SELECT * FROM tree_nodes WHERE parent_id = ? AND deleted = 0 ORDER BY position", (folder_id,)
+            ).fetchall()
+            for row in children:
+                nodes.append(node_reply(row))
+                if row['url'] is None and client_hashes.get(row['node_id']) != row['hash'].hex():
+                    stack.append(row['node_id'])
+        return folders, nodes
+    
+    def changes_since(self, revision):
+        """Retourne (nœuds modifiés, node_id supprimés) après `revision`"""
+        rows = self.conn.execute(
+            "SELECT * FROM tree_nodes WHERE revision > ? AND parent_id IS NOT NULL ORDER BY position",
+            (revision,)
+        ).fetchall()
+        changed = [node_reply(row) for row in parents_first([row for row in rows if not row['deleted']])]
+        removed = [row['node_id'] for row in rows if row['deleted']]
+        return changed, removed
+    
+    def merge(self, data, client_revision, source=None):
+        """Fusionne l'arbre de l'extension (voir TreeMerge) en une transaction
+
+        `client_revision` est la révision reçue par l'extension lors de sa
+        dernière synchronisation ; si elle n'est pas reconnue, la fusion se
+        fait sans base. Retourne la fusion effectuée.
+        """
+        root, nodes = parse_tree(data)
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            revision = self.revision
+            base_revision = client_revision if self.is_known(client_revision) else None
+            merge = TreeMerge(self, root, nodes, base_revision, revision + 1, source)
+            merge.run()
+            if merge.touched:
+                self._set_meta('tree_revision', merge.revision)
+                self._trim_history(merge.revision)
+            else:
+                merge.revision = revision
+            # Les nœuds sont écrits au fil de la fusion : seule la validation est comptée comme écriture
+            with current_stage('persist'):
+                self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        logging.info(f"Fusion de l'arborescence : {len(merge.touched)} nœuds modifiés, "
+                     f"{len(merge.folders)} dossiers parcourus sur {len(nodes)} nœuds reçus")
+        return merge
+    
+    def close(self):
+        self.conn.close()
+
+def tree_reply(store, merge):
+    """Réponse à une synchronisation de l'arborescence
+
+    `ids` associe les identifiants locaux de l'extension aux node_id
+    attribués. Avec une révision reconnue, la réponse ne contient que les
+    nœuds modifiés depuis, hors changements venus de l'extension ; sinon
+    elle contient l'arbre complet.
+    """
+    reply = {'status': 'success', 'revision': merge.revision, 'root_hash': store.root_hash.hex(),
+             'ids': [{'id': local_id, 'node_id': node_id} for local_id, node_id in merge.id_map.items()]}
+    if merge.base_revision is None:
+        reply['mode'] = 'tree_full'
+        reply['nodes'] = store.all_nodes()
+        return reply
+    
+    changed, removed = store.changes_since(merge.base_revision)
+    client_state = merge.client_state
+    reply['mode'] = 'tree'
+    reply['changed'] = [node for node in changed if client_state.get(node['node_id']) != (
+        node['parent_id'], node['index'], node['title'], node.get('url'))]
+    reply['removed'] = [node_id for node_id in removed if node_id not in merge.removed]
+    return reply
+
+def tree_summary_reply(store, root_hash, client_hashes=None):
+    """Réponse à un résumé de l'arbre de l'extension
+
+    Si l'empreinte racine est celle de l'arbre stocké, la réponse est
+    `in_sync` : une seule lecture, quelle que soit la taille de l'arbre.
+    Sinon, elle contient les dossiers qui diffèrent des empreintes connues
+    de l'extension (`hashes`, voir SqliteTreeStore.differing_subtrees).
+    """
+    stored_hash = store.root_hash.hex()
+    if root_hash == stored_hash:
+        return {'status': 'success', 'mode': 'in_sync', 'revision': store.revision}
+    
+    folders, nodes = store.differing_subtrees(client_hashes if isinstance(client_hashes, dict) else {})
+    return {'status': 'success', 'mode': 'tree_diff', 'revision': store.revision,
+            'root_hash': stored_hash, 'folders': folders, 'nodes': nodes}
@@ -0,0 +1,98 @@
+"""
+Interface graphique de configuration (Tk)
+"""
+
+import logging
+import tkinter as tk
+from tkinter import messagebox
+
+from .config import SyncMarkConfig
+
+class SettingsUI:
+    """Interface graphique de configuration"""
+    
+    def __init__(self, root=None):
+        if root is None:
+            self.root = tk.Tk()
+            self.own_root = True
+        else:
+            self.root = root
+            self.own_root = False
+            
+        self.setup_window()
+        self.sync_enabled = tk.BooleanVar()
+        self.load_config()
+        self.create_widgets()
+    
+    def setup_window(self):
+        """Configure la fenêtre principale"""
+        self.root.title("SyncMark - Paramètres")
+        
+        window_width = 400
+        window_height = 200
+        screen_width = self.root.winfo_screenwidth()
+        screen_height = self.root.winfo_screenheight()
+        center_x = int(screen_width/2 - window_width/2)
+        center_y = int(screen_height/2 - window_height/2)
+        
+        self.root.geometry(f'{window_width}x{window_height}+{center_x}+{center_y}')
+        self.root.resizable(False, False)
+    
+    def load_config(self):
+        """Charge la configuration actuelle"""
+        try:
+            self.sync_enabled.set(SyncMarkConfig.is_sync_enabled())
+        except Exception as e:
+            messagebox.showerror("Erreur", f"Impossible de charger la configuration :\n{e}")
+            self.sync_enabled.set(False)
+    
+    def save_config(self):
+        """Sauvegarde la configuration"""
+        if SyncMarkConfig.set_sync_enabled(self.sync_enabled.get()):
+            logging.info(f"Configuration sauvegardée : sync_enabled = {self.sync_enabled.get()}")
+        else:
+            messagebox.showerror("Erreur", "Impossible de sauvegarder la configuration")
+    
+    def create_widgets(self):
+        """Crée l'interface utilisateur"""
+        main_frame = tk.Frame(self.root, padx=20, pady=20)
+        main_frame.pack(expand=True, fill=tk.BOTH)
+        
+        title_label = tk.Label(
+            main_frame,
+            text="SyncMark - Configuration",
+            font=('Helvetica', 14, 'bold')
+        )
+        title_label.pack(pady=(0, 15))
+        
+        desc_label = tk.Label(
+            main_frame,
+            text="Contrôlez la synchronisation de vos favoris entre\nvotre navigateur et votre système local.",
+            wraplength=350,
+            justify=tk.CENTER
+        )
+        desc_label.pack(pady=(0, 15))
+        
+        checkbox = tk.Checkbutton(
+            main_frame,
+            text="Activer la synchronisation en arrière-plan",
+            variable=self.sync_enabled,
+            command=self.save_config,
+            font=('Helvetica', 10, 'bold')
+        )
+        checkbox.pack(pady=10)
+        
+        # Bouton pour fermer
+        if self.own_root:
+            close_button = tk.Button(
+                main_frame,
+                text="Fermer",
+                command=self.root.quit,
+                width=10
+            )
+            close_button.pack(pady=(15, 0))
+    
+    def run(self):
+        """Lance l'interface graphique"""
+        if self.own_root:
+            self.root.mainloop()
@@ -0,0 +1,81 @@
+"""
+Normalisation des URLs : clé d'indexation des favoris et de détection des doublons
+"""
+
+import re
+from urllib.parse import urlsplit, urlunsplit
+
+# Version de la normalisation : les clés stockées sont recalculées quand elle change
+KEY_VERSION = 2
+
+# Paramètres de suivi retirés de la requête (en plus des paramètres utm_*)
+TRACKING_PARAMS = frozenset({
+    'fbclid', 'gclid', 'dclid', 'gbraid', 'wbraid', 'msclkid', 'yclid', 'twclid',
+    'igshid', 'mc_cid', 'mc_eid', '_ga', '_gl', '_hsenc', '_hsmi', 'mkt_tok', 'ref_src',
+})
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# URL http(s) courante sans port, identifiants, requête, fragment, majuscules
+# dans l'hôte ni espaces : sa clé se calcule sans urlsplit
+_SIMPLE_URL = re.compile(r'https?://([a-z0-9][a-z0-9.-]*)(/[^?#\s]*)?')
+
+def is_tracking_param(name):
+    name = name.lower()
+    return name.startswith('utm_') or name in TRACKING_PARAMS
+
+def strip_tracking_params(query):
+    """Retire les paramètres de suivi d'une requête, sans changer l'ordre des autres"""
+    if not query:
+        return query
+    return '&'.join(param for param in query.split('&')
+                    if param and not is_tracking_param(param.partition('=')[0]))
+
+def normalize_host(host):
+    """Hôte en minuscules, sans point final, en punycode (IDNA) s'il n'est pas ASCII"""
+    host = host.lower().rstrip('.')
+    if not host.isascii():
+        try:
+            host = host.encode('idna').decode('ascii')
+        except UnicodeError:
+            pass
+    return host
+
+def normalize_url(url):
+    """Clé d'indexation d'une URL
+
+    Deux URLs de même clé désignent la même page :
+    - schéma insensible à la casse, http et https confondus ;
+    - hôte en minuscules, sans point final ni port par défaut, noms de
+      domaine internationalisés en punycode ;
+    - barre oblique finale du chemin ignorée ;
+    - paramètres de suivi (utm_*, fbclid, gclid...) retirés.
+    Les URLs sans hôte (about:, javascript:...) sont seulement débarrassées
+    des espaces.
+    """
+    url = url.strip()
+    simple = _SIMPLE_URL.fullmatch(url)
+    if simple:
+        host, path = simple.groups()
+        return 'https://' + host.rstrip('.') + (path or '').rstrip('/')
+    return normalize_split_url(url)
+
+def normalize_split_url(url):
+    """Clé d'indexation d'une URL déjà débarrassée des espaces, calculée avec urlsplit"""
+    parts = urlsplit(url)
+    if not parts.scheme or not parts.netloc:
+        return url
+    try:
+        port = parts.port
+    except ValueError:
+        return url
+
+    scheme = parts.scheme.lower()
+    host = normalize_host(parts.hostname or '')
+    if ':' in host:
+        host = f'[{host}]'
+    if port is not None and port != DEFAULT_PORTS.get(scheme):
+        host = f'{host}:{port}'
+    userinfo, at, _ = parts.netloc.rpartition('@')
+    return urlunsplit(('https' if scheme == 'http' else scheme, userinfo + at + host,
+                       parts.path.rstrip('/'), strip_tracking_params(parts.query), parts.fragment))
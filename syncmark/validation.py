@@ -0,0 +1,129 @@
+"""
+Validation des messages de l'extension : les entrées mal formées sont
+écartées de la fusion et mises en quarantaine (JSON lines) avec leur raison
+"""
+
+import json
+import time
+
+from .metrics import JsonLinesRecorder
+
+# Longueur maximale d'une URL (celle de Chrome)
+MAX_URL_LENGTH = 2 * 1024 * 1024
+
+# Types acceptés des champs connus d'un favori, en types exacts (un booléen
+# n'est pas une date) ; les autres champs sont conservés tels quels
+BOOKMARK_FIELDS = {
+    'title': (str, type(None)),
+    'dateAdded': (int, float),
+    'folder': (str,),
+}
+
+# Au-delà de cette taille, le fichier de quarantaine est renommé en .1 (une seule archive)
+MAX_QUARANTINE_SIZE = 5 * 1024 * 1024
+# Taille maximale (caractères JSON) d'une entrée recopiée dans la quarantaine
+MAX_QUARANTINED_ENTRY = 4096
+
+# Vérifications précalculées : (champ, types acceptés, raison du rejet)
+_FIELD_CHECKS = tuple((name, frozenset(types), f'{name} is not {" or ".join(t.__name__ for t in types)}')
+                      for name, types in BOOKMARK_FIELDS.items())
+_TITLE_TYPES = frozenset(BOOKMARK_FIELDS['title'])
+_DATE_TYPES = frozenset(BOOKMARK_FIELDS['dateAdded'])
+_FOLDER_TYPES = frozenset(BOOKMARK_FIELDS['folder'])
+
+def bookmark_error(bm):
+    """Raison du rejet d'un favori, None s'il est valide"""
+    if type(bm) is not dict:
+        return 'bookmark is not an object'
+    url = bm.get('url')
+    if type(url) is not str:
+        return 'missing url' if url is None else 'url is not a string'
+    if not url:
+        return 'empty url'
+    if len(url) > MAX_URL_LENGTH:
+        return 'url too long'
+    if len(bm) > 1:
+        for name, types, reason in _FIELD_CHECKS:
+            if name in bm and type(bm[name]) not in types:
+                return reason
+    return None
+
+def url_error(entry):
+    """Raison du rejet d'une suppression (URL ou objet avec `url`), None si elle est valide"""
+    url = entry.get('url') if type(entry) is dict else entry
+    if type(url) is not str:
+        return 'removal has no url'
+    if not url or len(url) > MAX_URL_LENGTH:
+        return 'invalid url'
+    return None
+
+def validate_bookmarks(items, field='bookmarks'):
+    """Sépare les favoris valides des autres, en une passe
+
+    Retourne (favoris valides, rejets) ; un rejet est (champ du message,
+    index ou None si le champ n'est pas une liste, entrée, raison).
+    """
+    if type(items) is not list:
+        return [], [(field, None, items, f'{field} is not a list')]
+    valid, rejected = [], []
+    append = valid.append
+    for index, bm in enumerate(items):
+        # Chemin rapide des favoris valides, équivalent à bookmark_error
+        if type(bm) is dict:
+            url = bm.get('url')
+            if (type(url) is str and 0 < len(url) <= MAX_URL_LENGTH
+                    and type(bm.get('title')) in _TITLE_TYPES
+                    and type(bm.get('dateAdded', 0)) in _DATE_TYPES
+                    and type(bm.get('folder', '')) in _FOLDER_TYPES):
+                append(bm)
+                continue
+        reason = bookmark_error(bm)
+        if reason is None:
+            append(bm)
+        else:
+            rejected.append((field, index, bm, reason))
+    return valid, rejected
+
+def validate_removals(items, field='removed'):
+    """URLs des suppressions valides et rejets (voir validate_bookmarks)"""
+    if type(items) is not list:
+        return [], [(field, None, items, f'{field} is not a list')]
+    urls, rejected = [], []
+    for index, entry in enumerate(items):
+        reason = url_error(entry)
+        if reason is None:
+            urls.append(entry['url'] if type(entry) is dict else entry)
+        else:
+            rejected.append((field, index, entry, reason))
+    return urls, rejected
+
+class QuarantineRecorder(JsonLinesRecorder):
+    """Ajoute une ligne JSON par entrée rejetée au fichier `path`
+    
+    Chaque ligne contient la date, la source et le type du message, le
+    champ et l'index de l'entrée, la raison du rejet et l'entrée elle-même
+    (tronquée au-delà de MAX_QUARANTINED_ENTRY caractères). Les lignes d'un
+    message sont écrites en un seul appel (voir JsonLinesRecorder).
+    """
+    
+    failure_message = "Quarantaine non enregistrée"
+    
+    def __init__(self, path, max_size=MAX_QUARANTINE_SIZE):
+        super().__init__(path, max_size)
+    
+    @staticmethod
+    def line(timestamp, source, message_type, field, index, entry, reason):
+        record = {'timestamp': timestamp, 'source': source, 'type': message_type,
+                  'field': field, 'index': index, 'reason': reason}
+        text = json.dumps(entry, ensure_ascii=False, separators=(',', ':'), default=repr)
+        if len(text) > MAX_QUARANTINED_ENTRY:
+            record['truncated'] = text[:MAX_QUARANTINED_ENTRY]
+        else:
+            record['entry'] = entry
+        return json.dumps(record, ensure_ascii=False, separators=(',', ':'), default=repr) + '\n'
+    
+    def write(self, rejected, source=None, message_type=None):
+        """Enregistre des rejets (champ, index, entrée, raison)"""
+        timestamp = round(time.time(), 3)
+        self.append(''.join(self.line(timestamp, source, message_type, field, index, entry, reason)
+                            for field, index, entry, reason in rejected))
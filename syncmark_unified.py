@@ -4,363 +4,328 @@ SyncMark - Application Unifiée
 Consolide toutes les fonctionnalités de SyncMark en une seule application :
 - Native Host pour communication avec l'extension Chrome
 - Interface de configuration
-- Service d'arrière-plan
+- Service d'arrière-plan (démon partagé par les Native Hosts)
 - Installation automatique du Native Host
+
+Le cœur (configuration, stockage, fusion, trames) est dans le paquet
+`syncmark` et fonctionne sous Windows, Linux et macOS. L'interface Tk et
+l'installateur ne sont importés que par les modes qui les utilisent.
 """
 
 import sys
-import json
-import os
-import struct
 import logging
-import time
-import threading
-import argparse
-import tkinter as tk
-from tkinter import messagebox
-import winreg
-from pathlib import Path
 
-# --- Configuration Globale ---
-HOME_DIR = os.path.expanduser("~")
-SYNC_DIR = os.path.join(HOME_DIR, 'Documents', 'SyncMark')
-os.makedirs(SYNC_DIR, exist_ok=True)
-CONFIG_FILE = os.path.join(SYNC_DIR, 'config.json')
-LOG_FILE = os.path.join(SYNC_DIR, 'syncmark_unified.log')
-BOOKMARKS_FILE_PATH = os.path.join(SYNC_DIR, 'syncmark_bookmarks.json')
+from syncmark import config
 
-# --- Configuration du Logging ---
-logging.basicConfig(
-    filename=LOG_FILE,
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+def configure_logging(host_mode=False):
+    """Configure le fichier de log de l'application (voir syncmark.logs)"""
+    from syncmark.logs import configure_logging
+    configure_logging(host_mode)
 
-class SyncMarkConfig:
-    """Gestionnaire de configuration centralisé"""
-    
-    @staticmethod
-    def is_sync_enabled():
-        """Vérifie si la synchronisation est activée"""
-        try:
-            if not os.path.exists(CONFIG_FILE):
-                with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-                    json.dump({'enabled': True}, f)
-                return True
-            
-            with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-                return config.get('enabled', False)
-        except Exception as e:
-            logging.error(f"Erreur lors de la lecture de la configuration : {e}")
-            return False
+def browser_host_mode(argv):
+    """Détecte le mode host sans argparse
+
+    Le navigateur lance un nouveau processus pour chaque connexion : la
+    ligne de commande du host est reconnue directement pour ne pas payer
+    l'import d'argparse à chaque synchronisation.
+    """
+    if '--mode=host' in argv:
+        return True
+    if '--mode' in argv:
+        index = argv.index('--mode')
+        return argv[index + 1:index + 2] == ['host']
+    return any(arg.startswith('chrome-extension://') for arg in argv)
+
+def run_host():
+    """Mode Native Host : relais vers le démon s'il tourne, traitement local sinon"""
+    from syncmark.config import SyncMarkConfig, detect_source
+    from syncmark.ipc import connect_daemon
+    source = detect_source(sys.argv[1:])
+    connection = connect_daemon()
+    if connection is not None:
+        from syncmark.framing import MAX_MESSAGE_SIZE
+        from syncmark.ipc import relay_messages
+        logging.info("Native Host SyncMark démarré en relais du démon")
+        with connection:
+            relay_messages(connection, sys.stdin.buffer, sys.stdout.buffer,
+                           SyncMarkConfig.get_setting('max_message_size', MAX_MESSAGE_SIZE), source)
+        return
     
-    @staticmethod
-    def set_sync_enabled(enabled):
-        """Active ou désactive la synchronisation"""
-        try:
-            with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-                json.dump({'enabled': enabled}, f, indent=4)
-            return True
-        except Exception as e:
-            logging.error(f"Erreur lors de la sauvegarde de la configuration : {e}")
-            return False
+    from syncmark.host import NativeHostManager
+    host_manager = NativeHostManager(source=source)
+    if SyncMarkConfig.get_setting('host_engine') == 'async':
+        from syncmark.async_host import AsyncNativeHost
+        AsyncNativeHost(host_manager).run_host()
+        return
+    host_manager.run_host()
+
+def run_daemon():
+    """Mode Démon : stockage partagé par les Native Hosts"""
+    import signal
+    from syncmark.daemon import SyncDaemon
+    daemon = SyncDaemon()
+    signal.signal(signal.SIGTERM, lambda signum, frame: daemon.stop())
+    sys.exit(0 if daemon.serve_forever() else 1)
 
-class NativeHostManager:
-    """Gestionnaire du Native Host pour communication avec Chrome"""
+def run_dedupe(dry_run=False):
+    """Mode Dédoublonnage : fusionne les favoris de même URL normalisée (voir syncmark.urls)"""
+    from syncmark.store import SqliteBookmarkStore
+    store = SqliteBookmarkStore(config.STORE_FILE_PATH, migrate_keys=False)
+    try:
+        duplicates = store.deduplicate(dry_run=dry_run)
+        count = store.count()
+    finally:
+        store.close()
     
-    def __init__(self):
-        self.running = False
+    for kept_url, removed_urls in duplicates.values():
+        print(kept_url)
+        for url in removed_urls:
+            print(f"  - {url}")
+    removed_count = sum(len(removed_urls) for _, removed_urls in duplicates.values())
+    print(f"{removed_count} doublon(s) {'trouvé(s)' if dry_run else 'supprimé(s)'} "
+          f"dans {len(duplicates)} groupe(s), {count} favoris")
+    logging.info(f"Dédoublonnage : {removed_count} doublons, {len(duplicates)} groupes (simulation : {dry_run})")
+
+def format_timestamp(timestamp):
+    from datetime import datetime
+    return datetime.fromtimestamp(timestamp).isoformat(sep=' ', timespec='seconds')
+
+def parse_timestamp(value):
+    """Date de --at : secondes depuis l'epoch ou date ISO 8601 (heure locale par défaut)"""
+    from datetime import datetime
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+def run_history():
+    """Mode Historique : liste les révisions enregistrées de la collection"""
+    from syncmark.store import SqliteBookmarkStore
+    store = SqliteBookmarkStore(config.STORE_FILE_PATH)
+    try:
+        entries = store.history()
+    finally:
+        store.close()
     
-    def get_message(self):
-        """Lit un message depuis stdin"""
-        raw_length = sys.stdin.buffer.read(4)
-        if not raw_length:
-            return None
-        
-        message_length = struct.unpack('@I', raw_length)[0]
-        message_json = sys.stdin.buffer.read(message_length).decode('utf-8')
-        logging.info(f"Message reçu de longueur {message_length}")
-        return json.loads(message_json)
+    for entry in entries:
+        if entry['checkpoint']:
+            summary = f"instantané, {entry['bookmarks']} favoris"
+        else:
+            summary = f"{entry['changed']} modifié(s), {entry['removed']} supprimé(s)"
+        source = f" ({entry['source']})" if entry['source'] else ''
+        print(f"{format_timestamp(entry['timestamp'])}  révision {entry['revision']}  {summary}{source}")
+    if not entries:
+        print("Historique vide")
+
+def run_restore(timestamp, output=None):
+    """Mode Restauration : rétablit (ou exporte avec --output) la collection d'une date passée"""
+    from syncmark.store import SqliteBookmarkStore, atomic_write_json
+    store = SqliteBookmarkStore(config.STORE_FILE_PATH)
+    try:
+        if output:
+            bookmarks = store.bookmarks_at(timestamp)
+            atomic_write_json(output, bookmarks, pretty=True)
+            print(f"{len(bookmarks)} favoris du {format_timestamp(timestamp)} exportés dans {output}")
+            return True
+        changed, removed = store.restore(timestamp)
+    except LookupError as e:
+        print(f"Restauration impossible : {e}")
+        return False
+    finally:
+        store.close()
     
-    def send_message(self, message_content):
-        """Envoie un message à stdout"""
-        encoded_content = json.dumps(message_content).encode('utf-8')
-        message_length = struct.pack('@I', len(encoded_content))
-        
-        sys.stdout.buffer.write(message_length)
-        sys.stdout.buffer.write(encoded_content)
-        sys.stdout.buffer.flush()
-        logging.info("Message envoyé à l'extension")
+    logging.info(f"Restauration au {format_timestamp(timestamp)} : {len(changed)} modifiés, {len(removed)} supprimés")
+    print(f"Collection du {format_timestamp(timestamp)} rétablie : "
+          f"{len(changed)} favori(s) rétabli(s), {len(removed)} supprimé(s)")
+    return True
+
+def run_search(query, limit):
+    """Mode Recherche : affiche les favoris correspondant à un texte, les plus pertinents d'abord
+
+    Retourne False si la recherche est impossible (SQLite sans FTS5, index
+    de recherche absent).
+    """
+    import sqlite3
+    from syncmark.store import SqliteBookmarkStore
+    store = SqliteBookmarkStore(config.STORE_FILE_PATH)
+    try:
+        results = store.search(query, limit)
+    except sqlite3.OperationalError as e:
+        logging.error(f"Recherche impossible : {e}")
+        print(f"Recherche impossible : {e}")
+        return False
+    finally:
+        store.close()
     
-    def process_bookmarks(self, message):
-        """Traite la synchronisation des favoris"""
-        extension_bookmarks = message.get('bookmarks', [])
-        
-        local_bookmarks = []
-        if os.path.exists(BOOKMARKS_FILE_PATH):
-            try:
-                with open(BOOKMARKS_FILE_PATH, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    if content:
-                        local_bookmarks = json.loads(content)
-            except (IOError, json.JSONDecodeError) as e:
-                logging.error(f"Erreur lecture favoris locaux : {e}")
-                self.send_message({
-                    'status': 'error',
-                    'message': 'Could not read local bookmarks file'
-                })
-                return
-        
-        # Fusion des favoris
-        merged_bookmarks_map = {bm['url']: bm for bm in local_bookmarks if 'url' in bm}
-        merged_bookmarks_map.update({bm['url']: bm for bm in extension_bookmarks if 'url' in bm})
-        
-        synced_bookmarks = list(merged_bookmarks_map.values())
-        logging.info(f"Fusion : {len(local_bookmarks)} locaux + {len(extension_bookmarks)} extension = {len(synced_bookmarks)} uniques")
-        
-        # Sauvegarde
-        try:
-            with open(BOOKMARKS_FILE_PATH, 'w', encoding='utf-8') as f:
-                json.dump(synced_bookmarks, f, indent=4, ensure_ascii=False)
-            logging.info("Favoris sauvegardés")
-        except IOError as e:
-            logging.error(f"Erreur sauvegarde favoris : {e}")
-            self.send_message({
-                'status': 'error',
-                'message': 'Could not write bookmarks file'
-            })
-            return
-        
-        self.send_message({'status': 'success', 'bookmarks': synced_bookmarks})
+    for bookmark in results:
+        folder = bookmark.get('folder')
+        print(bookmark.get('title') or bookmark['url'])
+        print(f"  {bookmark['url']}" + (f"  [{folder}]" if isinstance(folder, str) and folder else ''))
+    print(f"{len(results)} résultat(s)")
+    return True
+
+def run_import(paths, file_format=None, workers=None):
+    """Mode Import : fusionne les favoris de fichiers HTML ou Bookmarks de Chrome
+
+    Un fichier unique est lu en flux ; plusieurs fichiers sont fusionnés en
+    une révision, répartis sur `workers` processus (voir merge_batch).
+    """
+    from syncmark.formats import read_bookmark_file
+    from syncmark.store import SqliteBookmarkStore
+    store = SqliteBookmarkStore(config.STORE_FILE_PATH)
+    try:
+        if len(paths) == 1:
+            read_count, changed_count = store.import_bookmarks(read_bookmark_file(paths[0], file_format))
+        else:
+            # Fichiers lus en flux, par tranches (voir syncmark.batch.read_chunks)
+            sources = (('import', read_bookmark_file(path, file_format)) for path in paths)
+            read_count, changed_count = store.merge_batch(sources, workers, source='import')
+    except (OSError, ValueError) as e:
+        print(f"Import impossible : {e}")
+        return False
+    finally:
+        store.close()
     
-    def run_host(self):
-        """Boucle principale du Native Host"""
-        logging.info("Native Host SyncMark démarré")
-        self.running = True
-        
-        while self.running:
-            try:
-                message = self.get_message()
-                
-                if message is None:
-                    logging.info("Canal fermé par le navigateur")
-                    break
-                
-                if SyncMarkConfig.is_sync_enabled():
-                    logging.info("Synchronisation activée - traitement du message")
-                    self.process_bookmarks(message)
-                else:
-                    logging.info("Synchronisation désactivée")
-                    self.send_message({
-                        'status': 'disabled',
-                        'message': 'Sync is disabled by user'
-                    })
-                    
-            except Exception as e:
-                logging.error(f"Erreur dans la boucle principale : {e}", exc_info=True)
-                try:
-                    self.send_message({'status': 'error', 'message': str(e)})
-                except:
-                    pass
-                break
+    logging.info(f"Import de {', '.join(paths)} : {read_count} favoris lus, {changed_count} ajoutés ou modifiés")
+    print(f"{read_count} favori(s) lu(s), {changed_count} ajouté(s) ou modifié(s)")
+    return True
+
+def run_export(path, file_format=None):
+    """Mode Export : écrit la collection dans un fichier HTML ou Bookmarks de Chrome"""
+    from syncmark.config import atomic_write
+    from syncmark.formats import export_chunks, export_format
+    from syncmark.store import SqliteBookmarkStore
+    store = SqliteBookmarkStore(config.STORE_FILE_PATH)
+    try:
+        atomic_write(path, export_chunks(store.bookmarks_by_folder, file_format or export_format(path)))
+        count = store.count()
+    except OSError as e:
+        print(f"Export impossible : {e}")
+        return False
+    finally:
+        store.close()
     
-    def stop(self):
-        """Arrête le Native Host"""
-        self.running = False
+    logging.info(f"Export de {count} favoris dans {path}")
+    print(f"{count} favori(s) exporté(s) dans {path}")
+    return True
 
-class SettingsUI:
-    """Interface graphique de configuration"""
+def run_stats():
+    """Mode Statistiques : percentiles des durées par étape et des tailles des messages"""
+    from syncmark.metrics import PERCENTILES, STAGES, read_metrics, summarize
+    summary = summarize(read_metrics(config.METRICS_FILE_PATH))
+    if not summary['count']:
+        print(f"Aucune mesure dans {config.METRICS_FILE_PATH}")
+        return
     
-    def __init__(self, root=None):
-        if root is None:
-            self.root = tk.Tk()
-            self.own_root = True
-        else:
-            self.root = root
-            self.own_root = False
-            
-        self.setup_window()
-        self.sync_enabled = tk.BooleanVar()
-        self.load_config()
-        self.create_widgets()
+    types = ', '.join(f"{name} {count}" for name, count in sorted(summary['types'].items()))
+    print(f"{summary['count']} message(s) : {types}")
+    columns = [f'p{p}' for p in PERCENTILES] + ['max']
+    print(f"{'':<15}" + ''.join(f"{column:>12}" for column in columns))
+    for name in STAGES + ('total',):
+        distribution = summary['stages'][name]
+        if distribution:
+            print(f"{name + ' (ms)':<15}" + ''.join(f"{distribution[column]:>12.3f}" for column in columns))
+    for name, distribution in summary['counters'].items():
+        if distribution:
+            print(f"{name:<15}" + ''.join(f"{distribution[column]:>12}" for column in columns))
+
+def main():
+    """Fonction principale avec gestion des arguments"""
+    if getattr(sys, 'frozen', False):
+        # Exécutable PyInstaller : un processus de --workers relance main() et
+        # doit exécuter sa tâche au lieu d'ouvrir un mode (import sinon évité
+        # pour le démarrage du host)
+        import multiprocessing
+        multiprocessing.freeze_support()
+    host_mode = browser_host_mode(sys.argv[1:])
+    configure_logging(host_mode)
+    if host_mode:
+        run_host()
+        return
     
-    def setup_window(self):
-        """Configure la fenêtre principale"""
-        self.root.title("SyncMark - Paramètres")
-        
-        window_width = 400
-        window_height = 200
-        screen_width = self.root.winfo_screenwidth()
-        screen_height = self.root.winfo_screenheight()
-        center_x = int(screen_width/2 - window_width/2)
-        center_y = int(screen_height/2 - window_height/2)
-        
-        self.root.geometry(f'{window_width}x{window_height}+{center_x}+{center_y}')
-        self.root.resizable(False, False)
+    import argparse
     
-    def load_config(self):
-        """Charge la configuration actuelle"""
-        try:
-            self.sync_enabled.set(SyncMarkConfig.is_sync_enabled())
-        except Exception as e:
-            messagebox.showerror("Erreur", f"Impossible de charger la configuration :\n{e}")
-            self.sync_enabled.set(False)
+    parser = argparse.ArgumentParser(description='SyncMark - Application Unifiée')
+    parser.add_argument('--mode', choices=['host', 'daemon', 'settings', 'install', 'uninstall', 'dedupe',
+                                           'history', 'restore', 'stats', 'search', 'import', 'export'],
+                       help='Mode de fonctionnement (settings par défaut)')
+    parser.add_argument('--extension-id', help='ID de l\'extension Chrome pour l\'installation')
+    parser.add_argument('--dry-run', action='store_true',
+                       help='Mode dedupe : affiche les doublons sans les supprimer')
+    parser.add_argument('--at', type=parse_timestamp,
+                       help='Mode restore : date à rétablir (ISO 8601, ex. 2024-05-01T18:30, ou timestamp)')
+    parser.add_argument('--output', help='Mode restore : exporte la collection en JSON sans modifier la base')
+    parser.add_argument('--limit', type=int, default=20, help='Mode search : nombre maximal de résultats')
+    parser.add_argument('--format', choices=['html', 'chrome'],
+                       help='Modes import/export : HTML Netscape ou fichier Bookmarks de Chrome '
+                            '(détecté d\'après le contenu ou l\'extension par défaut)')
+    parser.add_argument('--workers', type=int,
+                       help='Mode import de plusieurs fichiers : nombre de processus (un par cœur par défaut)')
+    parser.add_argument('target', nargs='*',
+                       help='Mode search : mots recherchés (débuts de mots) ; mode import : fichier(s) ; '
+                            'mode export : fichier')
     
-    def save_config(self):
-        """Sauvegarde la configuration"""
-        if SyncMarkConfig.set_sync_enabled(self.sync_enabled.get()):
-            logging.info(f"Configuration sauvegardée : sync_enabled = {self.sync_enabled.get()}")
-        else:
-            messagebox.showerror("Erreur", "Impossible de sauvegarder la configuration")
+    # Le navigateur ajoute ses propres arguments (origine de l'extension, fenêtre parente)
+    args, _ = parser.parse_known_args()
+    if args.mode is None:
+        args.mode = 'settings'
     
-    def create_widgets(self):
-        """Crée l'interface utilisateur"""
-        main_frame = tk.Frame(self.root, padx=20, pady=20)
-        main_frame.pack(expand=True, fill=tk.BOTH)
-        
-        title_label = tk.Label(
-            main_frame,
-            text="SyncMark - Configuration",
-            font=('Helvetica', 14, 'bold')
-        )
-        title_label.pack(pady=(0, 15))
-        
-        desc_label = tk.Label(
-            main_frame,
-            text="Contrôlez la synchronisation de vos favoris entre\nvotre navigateur et votre système local.",
-            wraplength=350,
-            justify=tk.CENTER
-        )
-        desc_label.pack(pady=(0, 15))
+    if args.mode == 'host':
+        run_host()
         
-        checkbox = tk.Checkbutton(
-            main_frame,
-            text="Activer la synchronisation en arrière-plan",
-            variable=self.sync_enabled,
-            command=self.save_config,
-            font=('Helvetica', 10, 'bold')
-        )
-        checkbox.pack(pady=10)
+    elif args.mode == 'daemon':
+        run_daemon()
         
-        # Bouton pour fermer
-        if self.own_root:
-            close_button = tk.Button(
-                main_frame,
-                text="Fermer",
-                command=self.root.quit,
-                width=10
-            )
-            close_button.pack(pady=(15, 0))
-    
-    def run(self):
-        """Lance l'interface graphique"""
-        if self.own_root:
-            self.root.mainloop()
-
-class NativeHostInstaller:
-    """Gestionnaire d'installation du Native Host"""
-    
-    @staticmethod
-    def install_manifest(extension_id=None):
-        """Installe le manifest Native Host dans le registre Windows"""
-        print("🔧 Installation du Native Host SyncMark...")
+    elif args.mode == 'dedupe':
+        run_dedupe(args.dry_run)
         
-        # Chemin du manifest
-        manifest_path = Path(__file__).parent / "native_host_manifest.json"
+    elif args.mode == 'history':
+        run_history()
         
-        if not manifest_path.exists():
-            print("❌ Fichier native_host_manifest.json non trouvé")
-            return False
+    elif args.mode == 'restore':
+        if args.at is None:
+            parser.error('--mode restore nécessite --at')
+        sys.exit(0 if run_restore(args.at, args.output) else 1)
         
-        try:
-            with open(manifest_path, 'r', encoding='utf-8') as f:
-                manifest = json.load(f)
-        except Exception as e:
-            print(f"❌ Erreur lecture manifest: {e}")
-            return False
+    elif args.mode == 'search':
+        if not args.target:
+            parser.error('--mode search nécessite un texte à rechercher')
+        if args.limit <= 0:
+            parser.error('--limit doit être strictement positif')
+        sys.exit(0 if run_search(' '.join(args.target), args.limit) else 1)
         
-        # Mise à jour de l'ID d'extension si fourni
-        if extension_id:
-            manifest["allowed_origins"] = [f"chrome-extension://{extension_id}/"]
-            print(f"✅ ID d'extension configuré: {extension_id}")
+    elif args.mode == 'import':
+        if not args.target:
+            parser.error('--mode import nécessite au moins un fichier')
+        if args.workers is not None and args.workers <= 0:
+            parser.error('--workers doit être strictement positif')
+        sys.exit(0 if run_import(args.target, args.format, args.workers) else 1)
         
-        # Mise à jour du chemin de l'exécutable
-        exe_path = os.path.abspath(sys.executable if getattr(sys, 'frozen', False) else __file__)
-        manifest["path"] = exe_path.replace('\\', '\\\\')
+    elif args.mode == 'export':
+        if len(args.target) != 1:
+            parser.error('--mode export nécessite un fichier')
+        sys.exit(0 if run_export(args.target[0], args.format) else 1)
         
-        # Création du manifest temporaire
-        temp_manifest_path = Path(__file__).parent / "temp_manifest.json"
-        try:
-            with open(temp_manifest_path, 'w', encoding='utf-8') as f:
-                json.dump(manifest, f, indent=2)
-        except Exception as e:
-            print(f"❌ Erreur création manifest temporaire: {e}")
-            return False
-        
-        # Installation dans le registre
-        try:
-            registry_key = r"SOFTWARE\Google\Chrome\NativeMessagingHosts\com.syncmark.host"
-            with winreg.CreateKey(winreg.HKEY_CURRENT_USER, registry_key) as key:
-                winreg.SetValueEx(key, "", 0, winreg.REG_SZ, str(temp_manifest_path))
-            
-            print("✅ Native Host installé avec succès")
-            
-            # Nettoyage
-            try:
-                temp_manifest_path.unlink()
-            except:
-                pass
-                
-            return True
-            
-        except Exception as e:
-            print(f"❌ Erreur installation registre: {e}")
-            return False
-    
-    @staticmethod
-    def uninstall_manifest():
-        """Désinstalle le manifest du registre"""
-        try:
-            registry_key = r"SOFTWARE\Google\Chrome\NativeMessagingHosts\com.syncmark.host"
-            winreg.DeleteKey(winreg.HKEY_CURRENT_USER, registry_key)
-            print("✅ Native Host désinstallé")
-            return True
-        except FileNotFoundError:
-            print("ℹ️ Native Host n'était pas installé")
-            return True
-        except Exception as e:
-            print(f"❌ Erreur désinstallation: {e}")
-            return False
-
-def main():
-    """Fonction principale avec gestion des arguments"""
-    parser = argparse.ArgumentParser(description='SyncMark - Application Unifiée')
-    parser.add_argument('--mode', choices=['host', 'settings', 'install', 'uninstall'], 
-                       default='settings', help='Mode de fonctionnement')
-    parser.add_argument('--extension-id', help='ID de l\'extension Chrome pour l\'installation')
-    
-    args = parser.parse_args()
-    
-    if args.mode == 'host':
-        # Mode Native Host
-        host_manager = NativeHostManager()
-        host_manager.run_host()
+    elif args.mode == 'stats':
+        run_stats()
         
     elif args.mode == 'settings':
         # Mode Interface de configuration
+        from syncmark.ui import SettingsUI
         settings_ui = SettingsUI()
         settings_ui.run()
         
     elif args.mode == 'install':
         # Mode Installation
+        from syncmark.installer import NativeHostInstaller
         success = NativeHostInstaller.install_manifest(args.extension_id)
         sys.exit(0 if success else 1)
         
     elif args.mode == 'uninstall':
         # Mode Désinstallation
+        from syncmark.installer import NativeHostInstaller
         success = NativeHostInstaller.uninstall_manifest()
         sys.exit(0 if success else 1)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
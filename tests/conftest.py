@@ -0,0 +1,69 @@
+import pytest
+import io
+import json
+import os
+import struct
+import sys
+from unittest.mock import MagicMock, patch
+
+# Ajouter la racine du dépôt au sys.path pour permettre l'import du paquet syncmark
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+# Aides partagées par les tests du protocole (from conftest import frame, ...)
+
+def raw_frame(payload):
+    """Trame Native Messaging : longueur (entier natif) puis contenu brut"""
+    return struct.pack('@I', len(payload)) + payload
+
+
+def frame(message):
+    """Trame Native Messaging d'un message JSON"""
+    return raw_frame(json.dumps(message, ensure_ascii=False).encode('utf-8'))
+
+
+def read_frames(data):
+    """Messages des trames écrites par un host, dans l'ordre"""
+    from syncmark.framing import read_message
+    stream = io.BytesIO(data)
+    messages = []
+    while True:
+        message = read_message(stream)
+        if message is None:
+            return messages
+        messages.append(message)
+
+
+def run_host(data, host):
+    """Exécute `host.run_host()` avec `data` sur l'entrée standard ; retourne les octets écrits"""
+    fake_stdin, fake_stdout = MagicMock(), MagicMock()
+    fake_stdin.buffer = io.BytesIO(data)
+    fake_stdout.buffer = io.BytesIO()
+    with patch('sys.stdin', fake_stdin), patch('sys.stdout', fake_stdout):
+        host.run_host()
+    return fake_stdout.buffer.getvalue()
+
+
+@pytest.fixture
+def mock_sync_dir(tmp_path, monkeypatch):
+    """Crée un répertoire de synchronisation temporaire et patche les variables globales."""
+    sync_dir = tmp_path / "SyncMark"
+    sync_dir.mkdir()
+
+    from syncmark import config
+
+    monkeypatch.setattr(config, "SYNC_DIR", str(sync_dir))
+    monkeypatch.setattr(config, "CONFIG_FILE", os.path.join(str(sync_dir), 'config.json'))
+    monkeypatch.setattr(config, "BOOKMARKS_FILE_PATH", os.path.join(str(sync_dir), 'syncmark_bookmarks.json'))
+    monkeypatch.setattr(config, "STORE_FILE_PATH", os.path.join(str(sync_dir), 'syncmark_bookmarks.db'))
+    monkeypatch.setattr(config, "LOG_FILE", os.path.join(str(sync_dir), 'syncmark_unified.log'))
+    monkeypatch.setattr(config, "METRICS_FILE_PATH", os.path.join(str(sync_dir), 'syncmark_metrics.jsonl'))
+    monkeypatch.setattr(config, "QUARANTINE_FILE_PATH", os.path.join(str(sync_dir), 'syncmark_quarantine.jsonl'))
+    monkeypatch.setattr(config, "SYNC_STATE_FILE_PATH", os.path.join(str(sync_dir), 'syncmark_sync_state.json'))
+    monkeypatch.setattr(config, "DAEMON_KEY_FILE_PATH", os.path.join(str(sync_dir), 'syncmark_daemon.key'))
+    if sys.platform == 'win32':
+        monkeypatch.setattr(config, "DAEMON_ADDRESS", r'\\.\pipe\syncmark-test-' + tmp_path.name)
+    else:
+        monkeypatch.setattr(config, "DAEMON_ADDRESS", os.path.join(str(sync_dir), 'syncmark.sock'))
+
+    return str(sync_dir)
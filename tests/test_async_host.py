@@ -0,0 +1,97 @@
+import io
+import struct
+import threading
+
+from conftest import frame, read_frames
+from syncmark.async_host import AsyncNativeHost
+from syncmark.host import NativeHostManager
+
+
+def run_async_host(data, host=None, stdin=None):
+    stdout = io.BytesIO()
+    AsyncNativeHost(host or NativeHostManager(), stdin or io.BytesIO(data), stdout).run_host()
+    return read_frames(stdout.getvalue())
+
+
+class SignalingStream(io.BytesIO):
+    """Flux qui signale quand la lecture a dépassé une position donnée."""
+
+    def __init__(self, data, position):
+        super().__init__(data)
+        self.position = position
+        self.passed = threading.Event()
+
+    def readinto(self, buffer):
+        count = super().readinto(buffer)
+        if self.tell() >= self.position:
+            self.passed.set()
+        return count
+
+
+def test_replies_carry_request_ids_in_order(mock_sync_dir):
+    """Chaque réponse reprend l'identifiant de sa requête."""
+    replies = run_async_host(
+        frame({'id': 1, 'bookmarks': [{'url': 'https://a.com'}]})
+        + frame({'id': 'b', 'type': 'delta', 'revision': 0, 'added': [{'url': 'https://b.com'}]})
+        + frame({'bookmarks': []})
+    )
+    assert [reply.get('id') for reply in replies] == [1, 'b', None]
+    assert all(reply['status'] == 'success' for reply in replies)
+
+
+def test_next_message_is_read_while_processing(mock_sync_dir):
+    """La lecture du message suivant n'attend pas la fin du traitement en cours."""
+    first = frame({'id': 1, 'bookmarks': [{'url': 'https://a.com'}]})
+    second = frame({'id': 2, 'bookmarks': []})
+    stdin = SignalingStream(first + second, len(first) + len(second))
+    host = NativeHostManager()
+    build_reply = host.build_reply
+    overlapped = []
+
+    def slow_build_reply(message, metrics=None):
+        if message['id'] == 1:
+            overlapped.append(stdin.passed.wait(5))
+        return build_reply(message, metrics)
+
+    host.build_reply = slow_build_reply
+    replies = run_async_host(b'', host=host, stdin=stdin)
+    assert overlapped == [True]
+    assert [reply['id'] for reply in replies] == [1, 2]
+
+
+def test_failed_request_does_not_stop_the_host(mock_sync_dir):
+    """Une requête en erreur reçoit une erreur avec son identifiant, les suivantes sont traitées."""
+    host = NativeHostManager()
+    replies = run_async_host(frame({'id': 1, 'type': 'search', 'query': 5})
+                             + frame(['pas', 'un', 'objet'])
+                             + frame({'id': 3, 'type': 'delta', 'added': 5})
+                             + frame({'id': 4, 'bookmarks': [{'url': 'https://a.com'}]}), host=host)
+    assert [reply['status'] for reply in replies] == ['error', 'error', 'success', 'success']
+    assert replies[0]['id'] == 1 and replies[2]['id'] == 3 and replies[3]['id'] == 4
+    assert replies[2]['rejected'] == 1
+
+
+def test_invalid_json_does_not_stop_the_host(mock_sync_dir):
+    """Un message illisible mais reçu en entier reçoit une erreur, les suivants sont traités."""
+    replies = run_async_host(struct.pack('@I', 5) + b'{"id"' + frame({'id': 2, 'bookmarks': []}))
+    assert replies[0] == {'status': 'error', 'message': 'Invalid JSON'}
+    assert replies[1]['id'] == 2 and replies[1]['status'] == 'success'
+
+
+def test_chunked_reply_frames_carry_request_id(mock_sync_dir):
+    """Les trames partielles d'une réponse découpée portent l'identifiant de la requête."""
+    host = NativeHostManager(max_reply_size=200)
+    bookmarks = [{'url': f'https://site{i}.example.com', 'title': 'x' * 20} for i in range(10)]
+    replies = run_async_host(frame({'id': 7, 'bookmarks': bookmarks}), host=host)
+    assert len(replies) > 2
+    assert all(reply['id'] == 7 for reply in replies)
+    assert replies[-1]['chunks'] == len(replies) - 1
+
+
+def test_oversized_message_is_refused(mock_sync_dir):
+    """Un message trop grand est refusé sans interrompre la lecture."""
+    host = NativeHostManager(max_message_size=100)
+    replies = run_async_host(frame({'bookmarks': [{'url': 'https://a.com', 'title': 'x' * 200}]})
+                             + frame({'id': 2, 'bookmarks': []}), host=host)
+    assert replies[0] == {'status': 'error', 'message': 'Message too large'}
+    assert replies[1]['id'] == 2
@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+from syncmark import batch
+from syncmark.store import SqliteBookmarkStore
+from syncmark.urls import normalize_url
+
+
+def profile(name, count, offset=0):
+    return [{'url': f'https://www.site{i % 7}.com/page/{i}', 'title': f'{name} {i}', 'folder': f'{name}/Dossier {i % 3}'}
+            for i in range(offset, offset + count)]
+
+
+SOURCES = [
+    ('chrome:Default', profile('Perso', 60) + [{'title': 'sans url'}, 'texte', {'url': 3}]),
+    ('chrome:Profile 1', profile('Travail', 50, offset=30) + [{'url': 'HTTPS://site1.com/page/1/', 'title': 'Autre'}]),
+    ('import', profile('Import', 40, offset=10) + profile('Perso', 5)),
+]
+
+
+def contents(store):
+    rows = store.conn.execute("SELECT url_key, url, data, source FROM bookmarks ORDER BY id").fetchall()
+    return rows, store.all_bookmarks()
+
+
+@pytest.fixture
+def serial_store(tmp_path):
+    store = SqliteBookmarkStore(os.path.join(tmp_path, 'serial.db'))
+    store.apply(profile('Existant', 20, offset=40), [])
+    yield store
+    store.close()
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_batch_merge_matches_serial_merge(tmp_path, serial_store, workers):
+    """La fusion en lot donne les mêmes favoris, dans le même ordre et avec les mêmes sources, qu'en série."""
+    store = SqliteBookmarkStore(os.path.join(tmp_path, f'batch{workers}.db'))
+    try:
+        store.apply(profile('Existant', 20, offset=40), [])
+        for source, bookmarks in SOURCES:
+            serial_store.apply(bookmarks, [], source)
+
+        revision = store.revision
+        valid_count, changed_count = store.merge_batch(SOURCES, workers=workers)
+        assert valid_count == sum(len(bookmarks) for _, bookmarks in SOURCES) - 3
+        assert contents(store) == contents(serial_store)
+        assert changed_count == store.conn.execute(
+            "SELECT COUNT(*) FROM bookmarks WHERE revision = ?", (store.revision,)).fetchone()[0]
+        assert store.revision == revision + 1 and store.history()[-1]['source'] == 'batch'
+    finally:
+        store.close()
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_small_chunks_keep_first_position_and_source(workers):
+    """Une URL répétée entre tranches garde sa première place et sa première source, avec le dernier contenu."""
+    # Sources lues en flux, comme les fichiers importés
+    sources = iter([('a', iter([{'url': 'https://x.com'}, {'url': 'https://y.com'}, {'url': 'https://z.com', 'title': 1}])),
+                    ('b', iter([{'url': 'https://y.com/', 'title': 'Y'}, {'url': 'https://x.com', 'title': 'X'}]))])
+    valid_count, rows = batch.merge_sources(sources, workers=workers, codec_name='json', chunk_size=1)
+    assert valid_count == 4
+    assert rows == [(normalize_url('https://x.com'), 'https://x.com', '{"title":"X","url":"https://x.com"}', 'a'),
+                    (normalize_url('https://y.com'), 'https://y.com/', '{"title":"Y","url":"https://y.com/"}', 'a')]
+
+
+@pytest.mark.parametrize('workers', [0, -1])
+def test_non_positive_workers_are_rejected(workers):
+    """Un nombre de processus nul ou négatif est refusé."""
+    with pytest.raises(ValueError):
+        batch.merge_sources(SOURCES, workers=workers)
@@ -0,0 +1,38 @@
+import pytest
+from unittest.mock import patch
+
+from syncmark import config
+from syncmark.host import NativeHostManager
+from syncmark.store import CachedBookmarkStore, SqliteBookmarkStore
+
+
+@pytest.fixture
+def host(mock_sync_dir):
+    host = NativeHostManager()
+    host.send_message = lambda message: None
+    yield host
+    host.get_store().close()
+
+
+def test_repeated_syncs_reuse_cache(host):
+    """Les synchronisations suivantes ne relisent pas la collection complète."""
+    host.process_bookmarks({'bookmarks': [{'url': 'https://a.com'}]})
+    store = host.get_store().store
+    assert isinstance(store, CachedBookmarkStore)
+
+    with patch.object(store.store, 'iter_bookmarks') as mock_all:
+        host.process_bookmarks({'bookmarks': [{'url': 'https://b.com'}]})
+        host.process_bookmarks({'bookmarks': []})
+    mock_all.assert_not_called()
+    assert [bm['url'] for bm in store.all_bookmarks()] == ['https://a.com', 'https://b.com']
+
+
+def test_cache_sees_changes_from_other_process(host):
+    """Une écriture d'un autre processus invalide le cache."""
+    host.process_bookmarks({'bookmarks': [{'url': 'https://a.com'}]})
+
+    other = SqliteBookmarkStore(config.STORE_FILE_PATH)
+    other.apply([{'url': 'https://other.com'}], ['https://a.com'])
+    other.close()
+
+    assert [bm['url'] for bm in host.get_store().all_bookmarks()] == ['https://other.com']
@@ -0,0 +1,74 @@
+import pytest
+
+from syncmark import config
+from syncmark.codec import JSON_CODECS, get_codec
+from syncmark.records import BookmarkRecord
+from syncmark.store import CachedBookmarkStore, SqliteBookmarkStore, WriteBehindStore
+
+BOOKMARK = {'url': 'https://a.com/page', 'title': 'Page', 'dateAdded': 1700000000000, 'folder': 'Barre de favoris/Dev'}
+
+
+def test_record_reads_like_the_bookmark_dict():
+    """Un enregistrement se lit et se compare comme le dictionnaire du favori, champs inhabituels compris."""
+    unusual = {'url': 'https://b.com', 'title': None, 'dateAdded': 1.5, 'folder': 3, 'id': '12', 'tags': ['x']}
+    for bookmark in (BOOKMARK, unusual, {'url': 'https://c.com'}):
+        record = BookmarkRecord.from_dict(bookmark)
+        assert record == bookmark and record.to_dict() == bookmark
+        assert len(record) == len(bookmark) and set(record) == set(bookmark)
+        assert record.get('title', 'absent') == bookmark.get('title', 'absent')
+    assert 'folder' not in BookmarkRecord.from_dict({'url': 'https://c.com'})
+    with pytest.raises(KeyError):
+        BookmarkRecord.from_dict(BOOKMARK)['id']
+    assert not hasattr(BookmarkRecord.from_dict(BOOKMARK), '__dict__')
+
+
+def test_folders_are_shared():
+    """Le chemin d'un dossier n'est gardé qu'une fois en mémoire."""
+    first = BookmarkRecord.from_dict(dict(BOOKMARK, folder=''.join(['Barre de favoris', '/Dev'])))
+    second = BookmarkRecord.from_dict(dict(BOOKMARK, folder=''.join(['Barre de favoris/', 'Dev'])))
+    assert first.folder is second.folder
+
+
+@pytest.mark.parametrize('name', list(JSON_CODECS))
+def test_codecs_encode_records(name):
+    """Les codecs encodent un enregistrement comme son dictionnaire."""
+    try:
+        codec = get_codec(name)
+    except ImportError:
+        pytest.skip(f"{name} n'est pas installé")
+    value = {'bookmarks': [BookmarkRecord.from_dict(BOOKMARK)]}
+    assert codec.loads(codec.dumps(value)) == {'bookmarks': [BOOKMARK]}
+    assert codec.dumps(value, sort_keys=True) == codec.dumps({'bookmarks': [BOOKMARK]}, sort_keys=True)
+    assert codec.loads(codec.dumps_pretty(value)) == {'bookmarks': [BOOKMARK]}
+    with pytest.raises(TypeError):
+        codec.dumps({'bookmarks': [object()]})
+
+
+def test_cache_keeps_compact_records(mock_sync_dir):
+    """Le cache garde des enregistrements ; la clé d'une URL déjà normalisée est la chaîne de l'URL."""
+    cache = CachedBookmarkStore(SqliteBookmarkStore(config.STORE_FILE_PATH))
+    try:
+        cache.apply([BOOKMARK, {'url': 'http://b.com/', 'title': 'B'}], [])
+        records = cache.bookmark_map()
+        assert all(isinstance(record, BookmarkRecord) for record in records.values())
+        key = next(key for key in records if key == BOOKMARK['url'])
+        assert key is records[key].url
+        assert cache.all_bookmarks() == [BOOKMARK, {'url': 'http://b.com/', 'title': 'B'}]
+    finally:
+        cache.close()
+
+
+def test_pending_changes_are_overlaid_in_order(mock_sync_dir):
+    """Les changements en attente remplacent les favoris stockés à leur place, sans copie de la collection."""
+    store = WriteBehindStore(CachedBookmarkStore(SqliteBookmarkStore(config.STORE_FILE_PATH)), delay=60)
+    try:
+        store.apply([{'url': f'https://site{i}.com'} for i in range(4)], [])
+        store.flush()
+        store.apply([{'url': 'https://site1.com', 'title': 'Un'}, {'url': 'https://new.com'}],
+                    ['https://site2.com', 'https://absent.com'])
+        assert store.all_bookmarks() == [
+            {'url': 'https://site0.com'}, {'url': 'https://site1.com', 'title': 'Un'},
+            {'url': 'https://site3.com'}, {'url': 'https://new.com'}]
+        assert store.count() == 4
+    finally:
+        store.close()
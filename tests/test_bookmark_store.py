@@ -0,0 +1,108 @@
+import json
+import os
+import pytest
+
+from syncmark import config
+from syncmark.host import NativeHostManager
+from syncmark.store import SqliteBookmarkStore, normalize_url
+
+
+@pytest.fixture
+def store(mock_sync_dir):
+    store = SqliteBookmarkStore(config.STORE_FILE_PATH)
+    yield store
+    store.close()
+
+
+def test_normalize_url_ignores_scheme_and_host_case():
+    """Le schéma et l'hôte ne distinguent pas deux favoris."""
+    assert normalize_url('HTTPS://Example.COM/Path') == 'https://example.com/Path'
+
+
+def test_apply_upserts_by_normalized_url(store):
+    """Un favori existant est mis à jour, pas dupliqué."""
+    store.apply([{'url': 'https://a.com/', 'title': 'Old'}], [])
+    changed, removed = store.apply([{'url': 'https://A.com/', 'title': 'New'}], [])
+
+    assert changed == ['https://A.com/']
+    assert store.all_bookmarks() == [{'url': 'https://A.com/', 'title': 'New'}]
+
+
+def test_apply_unchanged_bookmark_keeps_revision(store):
+    """Renvoyer un favori identique ne crée pas de nouvelle révision."""
+    store.apply([{'url': 'https://a.com', 'title': 'A'}], [])
+    revision = store.revision
+
+    assert store.apply([{'url': 'https://a.com', 'title': 'A'}], []) == ([], [])
+    assert store.revision == revision
+
+
+def test_changes_since_tracks_removals(store):
+    """Les suppressions sont conservées comme pierres tombales."""
+    store.apply([{'url': 'https://a.com'}, {'url': 'https://b.com'}], [])
+    revision = store.revision
+    store.apply([], ['https://a.com'])
+
+    assert store.changes_since(revision) == ([], ['https://a.com'])
+
+
+def test_legacy_json_file_is_imported(mock_sync_dir):
+    """Le fichier JSON historique est importé à la création du stockage."""
+    with open(config.BOOKMARKS_FILE_PATH, 'w', encoding='utf-8') as f:
+        json.dump([{'url': 'https://legacy.com', 'title': 'Legacy'}], f)
+
+    store = SqliteBookmarkStore(config.STORE_FILE_PATH)
+    try:
+        assert store.all_bookmarks() == [{'url': 'https://legacy.com', 'title': 'Legacy'}]
+        assert not store.is_known(0)
+    finally:
+        store.close()
+
+
+def test_export_json_is_optional(mock_sync_dir):
+    """Le fichier JSON n'est réécrit que si l'export est activé."""
+    host = NativeHostManager()
+    host.send_message = lambda message: None
+
+    host.process_bookmarks({'bookmarks': [{'url': 'https://a.com'}]})
+    assert not os.path.exists(config.BOOKMARKS_FILE_PATH)
+
+    host.get_store().close()
+
+    with open(config.CONFIG_FILE, 'w', encoding='utf-8') as f:
+        json.dump({'enabled': True, 'export_json': True}, f)
+    host = NativeHostManager()
+    host.send_message = lambda message: None
+    host.process_bookmarks({'bookmarks': [{'url': 'https://b.com'}]})
+    with open(config.BOOKMARKS_FILE_PATH, 'r', encoding='utf-8') as f:
+        assert [bm['url'] for bm in json.load(f)] == ['https://a.com', 'https://b.com']
+    host.get_store().close()
+
+
+def test_source_is_recorded_when_bookmark_is_added(store):
+    """Le navigateur/profil d'origine est gardé quand un autre profil modifie le favori."""
+    store.apply([{'url': 'https://a.com', 'title': 'A'}], [], source='chrome/Default')
+    store.apply([{'url': 'https://a.com', 'title': 'A2'}, {'url': 'https://b.com'}], [], source='msedge/Profile 1')
+    assert store.bookmark_sources() == {'https://a.com': 'chrome/Default', 'https://b.com': 'msedge/Profile 1'}
+
+
+def test_source_column_is_added_to_existing_store(mock_sync_dir):
+    """Une base créée sans colonne source est migrée à l'ouverture."""
+    import sqlite3
+    conn = sqlite3.connect(config.STORE_FILE_PATH)
+    conn.executescript(
+        "CREATE TABLE meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);"
+        "CREATE TABLE bookmarks (id INTEGER PRIMARY KEY AUTOINCREMENT, url_key TEXT NOT NULL, "
+        "url TEXT NOT NULL, data TEXT NOT NULL, revision INTEGER NOT NULL);"
+        "INSERT INTO meta VALUES ('revision', 3), ('base_revision', 1);"
+        "INSERT INTO bookmarks (url_key, url, data, revision) VALUES ('https://a.com', 'https://a.com', '{\"url\":\"https://a.com\"}', 3);"
+    )
+    conn.close()
+
+    store = SqliteBookmarkStore(config.STORE_FILE_PATH)
+    try:
+        store.apply([{'url': 'https://b.com'}], [], source='chrome/Default')
+        assert store.bookmark_sources() == {'https://a.com': None, 'https://b.com': 'chrome/Default'}
+        assert store.revision == 4
+    finally:
+        store.close()
@@ -0,0 +1,104 @@
+import errno
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import frame
+from syncmark import config
+from syncmark.store import SqliteBookmarkStore
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+PROCESS_COUNT = 8
+MESSAGES_PER_PROCESS = 20
+
+
+def test_concurrent_hosts_lose_no_bookmarks(tmp_path, monkeypatch):
+    """N hosts lancés en parallèle sur le même stockage ne perdent aucun favori."""
+    sync_dir = tmp_path / 'Documents' / 'SyncMark'
+    sync_dir.mkdir(parents=True)
+    with open(sync_dir / 'config.json', 'w', encoding='utf-8') as f:
+        json.dump({'enabled': True, 'export_json': True, 'write_delay': 0}, f)
+    # Ancien fichier JSON : la migration ne doit être faite qu'une fois malgré la concurrence
+    legacy = [{'url': f'https://legacy.example.com/{i}'} for i in range(5)]
+    with open(sync_dir / 'syncmark_bookmarks.json', 'w', encoding='utf-8') as f:
+        json.dump(legacy, f)
+
+    env = dict(os.environ, HOME=str(tmp_path), USERPROFILE=str(tmp_path))
+    processes = []
+    for profile in range(PROCESS_COUNT):
+        messages = b''.join(frame({
+            'type': 'delta',
+            'revision': 0,
+            'source': f'chrome/Profile {profile}',
+            'added': [{'url': f'https://profile{profile}.example.com/{i}', 'title': f'{profile}-{i}'}],
+        }) for i in range(MESSAGES_PER_PROCESS))
+        # Les réponses vont dans des fichiers : un pipe plein bloquerait le host
+        with open(tmp_path / f'messages{profile}', 'wb') as f:
+            f.write(messages)
+        with open(tmp_path / f'messages{profile}', 'rb') as stdin, \
+                open(tmp_path / f'replies{profile}', 'wb') as stdout:
+            processes.append(subprocess.Popen([sys.executable, 'syncmark_unified.py', '--mode', 'host'],
+                                              stdin=stdin, stdout=stdout, stderr=subprocess.PIPE,
+                                              cwd=ROOT_DIR, env=env))
+    for process in processes:
+        _, stderr = process.communicate(timeout=120)
+        assert process.returncode == 0, stderr
+
+    monkeypatch.setattr(config, 'BOOKMARKS_FILE_PATH', str(tmp_path / 'absent.json'))
+    store = SqliteBookmarkStore(str(sync_dir / 'syncmark_bookmarks.db'))
+    try:
+        sources = store.bookmark_sources()
+        assert store.count() == PROCESS_COUNT * MESSAGES_PER_PROCESS + len(legacy)
+        assert store.revision == 1 + PROCESS_COUNT * MESSAGES_PER_PROCESS
+        for profile in range(PROCESS_COUNT):
+            for i in range(MESSAGES_PER_PROCESS):
+                assert sources[f'https://profile{profile}.example.com/{i}'] == f'chrome/Profile {profile}'
+        assert sources['https://legacy.example.com/0'] is None
+    finally:
+        store.close()
+
+    with open(sync_dir / 'syncmark_bookmarks.json', 'r', encoding='utf-8') as f:
+        assert len(json.load(f)) == PROCESS_COUNT * MESSAGES_PER_PROCESS + len(legacy)
+
+
+class FakeMsvcrt:
+    """msvcrt de Windows : `locking` lève l'erreur donnée tant que `failures` n'est pas épuisé."""
+    LK_NBLCK, LK_UNLCK = 2, 0
+
+    def __init__(self, error_number, failures):
+        self.error_number = error_number
+        self.failures = failures
+        self.calls = 0
+
+    def locking(self, fd, mode, size):
+        self.calls += 1
+        if mode == self.LK_NBLCK and self.calls <= self.failures:
+            raise OSError(self.error_number, 'locking')
+
+
+def test_windows_lock_retries_only_while_held(tmp_path, monkeypatch):
+    """Sous Windows, le verrou est réessayé tant qu'il est pris, jusqu'au délai ; les autres erreurs sont levées."""
+    monkeypatch.setattr(sys, 'platform', 'win32')
+    path = str(tmp_path / 'export.lock')
+
+    msvcrt = FakeMsvcrt(errno.EACCES, failures=3)
+    monkeypatch.setitem(sys.modules, 'msvcrt', msvcrt)
+    with config.file_lock(path):
+        pass
+    assert msvcrt.calls == 5
+
+    monkeypatch.setitem(sys.modules, 'msvcrt', FakeMsvcrt(errno.EACCES, failures=10 ** 6))
+    with pytest.raises(TimeoutError):
+        with config.file_lock(path, timeout=0.2):
+            pass
+
+    msvcrt = FakeMsvcrt(errno.EBADF, failures=10 ** 6)
+    monkeypatch.setitem(sys.modules, 'msvcrt', msvcrt)
+    with pytest.raises(OSError):
+        with config.file_lock(path):
+            pass
+    assert msvcrt.calls == 1
@@ -0,0 +1,68 @@
+import json
+import os
+from unittest.mock import patch
+
+from syncmark import config
+from syncmark.config import SyncMarkConfig
+
+
+def write_config(settings):
+    with open(config.CONFIG_FILE, 'w', encoding='utf-8') as f:
+        json.dump(settings, f)
+
+
+def test_missing_config_is_created_enabled(mock_sync_dir):
+    """Sans fichier, la synchronisation est activée et le fichier est créé."""
+    assert SyncMarkConfig.is_sync_enabled() is True
+    with open(config.CONFIG_FILE, 'r', encoding='utf-8') as f:
+        assert json.load(f) == {'enabled': True}
+
+
+def test_config_is_read_once_until_it_changes(mock_sync_dir):
+    """Le fichier n'est relu que si sa signature change."""
+    write_config({'enabled': True, 'write_delay': 1})
+    assert SyncMarkConfig.is_sync_enabled() is True
+
+    with patch('builtins.open', side_effect=AssertionError('relecture inutile')):
+        for _ in range(10):
+            assert SyncMarkConfig.is_sync_enabled() is True
+            assert SyncMarkConfig.get_setting('write_delay') == 1
+
+    write_config({'enabled': False, 'write_delay': 2.5})
+    assert SyncMarkConfig.is_sync_enabled() is False
+    assert SyncMarkConfig.get_setting('write_delay') == 2.5
+
+
+def test_settings_with_wrong_type_are_ignored(mock_sync_dir):
+    """Une valeur qui ne respecte pas le schéma est remplacée par la valeur par défaut."""
+    write_config({'enabled': 'yes', 'max_message_size': True, 'write_delay': '1', 'custom': [1]})
+
+    assert SyncMarkConfig.is_sync_enabled() is False
+    assert SyncMarkConfig.get_setting('max_message_size', 1024) == 1024
+    assert SyncMarkConfig.get_setting('write_delay', 0.5) == 0.5
+    assert SyncMarkConfig.get_setting('custom') == [1]
+    assert SyncMarkConfig.update_settings(write_delay='vite') is False
+
+
+def test_invalid_config_disables_sync(mock_sync_dir):
+    """Un fichier illisible désactive la synchronisation sans lever d'exception."""
+    with open(config.CONFIG_FILE, 'w', encoding='utf-8') as f:
+        f.write('{"enabled": tr')
+
+    assert SyncMarkConfig.is_sync_enabled() is False
+    assert SyncMarkConfig.get_setting('export_json', False) is False
+    assert SyncMarkConfig.set_sync_enabled(True) is False
+
+
+def test_set_sync_enabled_replaces_file_atomically(mock_sync_dir):
+    """L'écriture passe par un fichier temporaire et conserve les autres paramètres."""
+    write_config({'enabled': True, 'export_json': True})
+
+    with patch('os.replace', wraps=os.replace) as replace:
+        assert SyncMarkConfig.set_sync_enabled(False) is True
+    assert replace.call_args[0][1] == config.CONFIG_FILE
+
+    assert SyncMarkConfig.is_sync_enabled() is False
+    with open(config.CONFIG_FILE, 'r', encoding='utf-8') as f:
+        assert json.load(f) == {'enabled': False, 'export_json': True}
+    assert os.listdir(mock_sync_dir) == ['config.json']
@@ -0,0 +1,154 @@
+import io
+import os
+import stat
+import sys
+import threading
+
+import pytest
+
+from conftest import frame, read_frames
+from syncmark import config
+from syncmark.daemon import SyncDaemon
+from syncmark.ipc import connect_daemon, daemon_available, relay_messages
+
+
+def relay(*messages, max_message_size=1024 * 1024, source=None):
+    """Relaie des messages au démon comme le ferait un Native Host lancé par le navigateur"""
+    stdout = io.BytesIO()
+    with connect_daemon() as connection:
+        assert relay_messages(connection, io.BytesIO(b''.join(messages)), stdout, max_message_size, source)
+    return read_frames(stdout.getvalue())
+
+
+@pytest.fixture
+def daemon(mock_sync_dir):
+    sync_daemon = SyncDaemon()
+    thread = threading.Thread(target=sync_daemon.serve_forever)
+    thread.start()
+    for _ in range(500):
+        if sync_daemon.running:
+            break
+        thread.join(0.01)
+    yield sync_daemon
+    sync_daemon.stop()
+    thread.join(5)
+    assert not thread.is_alive()
+
+
+def test_host_falls_back_without_daemon(mock_sync_dir):
+    """Sans démon, le Native Host traite les messages lui-même."""
+    assert not daemon_available()
+    assert connect_daemon() is None
+
+
+def test_profiles_share_the_daemon_store(daemon):
+    """Deux profils relayés par des processus distincts partagent le même stockage."""
+    first = relay(frame({'bookmarks': [{'url': 'https://a.com', 'title': 'A'}]}))
+    assert first[0]['status'] == 'success'
+
+    second = relay(frame({'bookmarks': [{'url': 'https://b.com', 'title': 'B'}]}),
+                   frame({'type': 'delta', 'revision': first[0]['revision'], 'added': []}))
+    assert sorted(bm['url'] for bm in second[0]['bookmarks']) == ['https://a.com', 'https://b.com']
+    assert second[1]['mode'] == 'delta'
+    assert 'https://b.com' in [bm['url'] for bm in second[1]['changed']]
+
+
+def test_failed_message_keeps_the_relay_connected(daemon, monkeypatch):
+    """Une erreur de traitement reçoit une réponse d'erreur ; le message suivant est traité sur la même connexion."""
+    store = daemon.host.get_store()
+    apply = store.apply
+    calls = []
+
+    def failing_apply(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 1:
+            raise OverflowError('Python int too large to convert to SQLite INTEGER')
+        return apply(*args, **kwargs)
+
+    monkeypatch.setattr(store, 'apply', failing_apply)
+    replies = relay(frame({'bookmarks': [{'url': 'https://a.com'}]}), frame({'bookmarks': [{'url': 'https://b.com'}]}))
+    assert replies[0] == {'status': 'error', 'message': 'Python int too large to convert to SQLite INTEGER'}
+    assert replies[1]['status'] == 'success'
+    assert [bm['url'] for bm in replies[1]['bookmarks']] == ['https://b.com']
+
+
+def test_daemon_records_relay_source(daemon):
+    """Les favoris ajoutés via un relais sont attribués au navigateur qui l'a lancé."""
+    relay(frame({'bookmarks': [{'url': 'https://a.com'}]}), source='chrome chrome-extension://abc/')
+    relay(frame({'bookmarks': [{'url': 'https://b.com'}], 'source': 'brave/Default'}),
+          source='brave chrome-extension://abc/')
+    assert daemon.host.get_store().bookmark_sources() == {
+        'https://a.com': 'chrome chrome-extension://abc/',
+        'https://b.com': 'brave/Default',
+    }
+
+
+def test_daemon_replies_are_relayed_in_frames(daemon):
+    """Les réponses découpées en trames par le démon sont relayées telles quelles."""
+    daemon.host.max_reply_size = 200
+    bookmarks = [{'url': f'https://site{i}.example.com', 'title': 'x' * 20} for i in range(20)]
+
+    frames = relay(frame({'bookmarks': bookmarks}))
+    assert len(frames) > 2
+    assert frames[0]['status'] == 'partial'
+    assert frames[-1]['chunks'] == len(frames) - 1
+    assert sum(len(f['items']) for f in frames[:-1]) == 20
+
+
+def test_relay_refuses_oversized_messages(daemon):
+    """Le relais refuse un message trop grand sans le transmettre et reste aligné."""
+    frames = relay(frame({'bookmarks': [{'url': 'https://a.com', 'title': 'x' * 500}]}),
+                   frame({'bookmarks': [{'url': 'https://b.com'}]}),
+                   max_message_size=200)
+    assert frames[0] == {'status': 'error', 'message': 'Message too large'}
+    assert [bm['url'] for bm in frames[1]['bookmarks']] == ['https://b.com']
+
+
+def test_second_daemon_does_not_start(daemon):
+    """Un seul démon écoute sur le point d'accès."""
+    assert SyncDaemon().serve_forever() is False
+    assert relay(frame({'bookmarks': []}))[0]['status'] == 'success'
+
+
+def test_second_daemon_keeps_the_running_key(daemon, monkeypatch):
+    """Sans vérification préalable (Windows), un second démon échoue sur le point d'accès sans changer la clé."""
+    from types import SimpleNamespace
+    from syncmark import daemon as daemon_module
+    with open(config.DAEMON_KEY_FILE_PATH, 'rb') as f:
+        key = f.read()
+    monkeypatch.setattr(daemon_module, 'sys', SimpleNamespace(platform='win32'))
+    assert SyncDaemon().open() is False
+    with open(config.DAEMON_KEY_FILE_PATH, 'rb') as f:
+        assert f.read() == key
+    assert relay(frame({'bookmarks': []}))[0]['status'] == 'success'
+
+
+def test_stopped_daemon_flushes_and_removes_endpoint(mock_sync_dir, daemon):
+    """À l'arrêt, le démon écrit les changements en attente et supprime son point d'accès."""
+    daemon.host.get_store().delay = 60
+    relay(frame({'bookmarks': [{'url': 'https://a.com'}]}))
+    daemon.stop()
+    for _ in range(500):
+        if not daemon_available():
+            break
+        threading.Event().wait(0.01)
+    assert not daemon_available()
+
+    sync_daemon = SyncDaemon()
+    assert sync_daemon.open()
+    try:
+        assert sync_daemon.host.get_store().count() == 1
+    finally:
+        sync_daemon.close()
+
+
+def test_daemon_requires_its_key(daemon):
+    """Une connexion sans la clé du démon est refusée ; la clé et le socket ne sont lisibles que par l'utilisateur."""
+    from multiprocessing import AuthenticationError
+    from multiprocessing.connection import Client
+    with pytest.raises((AuthenticationError, EOFError, OSError)):
+        Client(config.DAEMON_ADDRESS, authkey=b'mauvaise clef').close()
+    if sys.platform != 'win32':
+        assert stat.S_IMODE(os.stat(config.DAEMON_KEY_FILE_PATH).st_mode) == 0o600
+        assert stat.S_IMODE(os.stat(config.DAEMON_ADDRESS).st_mode) == 0o600
+    assert relay(frame({'bookmarks': []}))[0]['status'] == 'success'
@@ -0,0 +1,55 @@
+from unittest.mock import patch
+
+from syncmark.host import NativeHostManager
+
+
+def sync(message):
+    """Traite un message et retourne la réponse envoyée à l'extension."""
+    host = NativeHostManager()
+    with patch.object(host, 'send_message') as mock_send:
+        host.process_bookmarks(message)
+    mock_send.assert_called_once()
+    return mock_send.call_args[0][0]
+
+
+def test_full_sync_returns_revision(mock_sync_dir):
+    """La synchronisation complète retourne la révision à utiliser pour les deltas."""
+    reply = sync({'bookmarks': [{'url': 'https://a.com', 'title': 'A'}]})
+    assert reply['status'] == 'success'
+    assert isinstance(reply['revision'], int)
+
+
+def test_delta_returns_only_changes_since_revision(mock_sync_dir):
+    """Un client à jour ne reçoit que les changements faits par les autres."""
+    first = sync({'bookmarks': [{'url': 'https://a.com', 'title': 'A'}]})
+
+    # Un autre profil ajoute un favori
+    sync({'type': 'delta', 'revision': first['revision'],
+          'added': [{'url': 'https://b.com', 'title': 'B'}]})
+
+    reply = sync({'type': 'delta', 'revision': first['revision'],
+                  'added': [{'url': 'https://c.com', 'title': 'C'}]})
+    assert reply['mode'] == 'delta'
+    assert reply['changed'] == [{'url': 'https://b.com', 'title': 'B'}]
+    assert reply['removed'] == []
+    assert reply['revision'] > first['revision']
+
+
+def test_delta_propagates_removals(mock_sync_dir):
+    """Les suppressions sont transmises aux autres clients."""
+    first = sync({'bookmarks': [{'url': 'https://a.com'}, {'url': 'https://b.com'}]})
+    sync({'type': 'delta', 'revision': first['revision'], 'removed': ['https://a.com']})
+
+    reply = sync({'type': 'delta', 'revision': first['revision']})
+    assert reply['removed'] == ['https://a.com']
+    assert reply['changed'] == []
+
+
+def test_delta_unknown_revision_falls_back_to_full(mock_sync_dir):
+    """Une révision inconnue déclenche une synchronisation complète."""
+    sync({'bookmarks': [{'url': 'https://a.com'}]})
+
+    reply = sync({'type': 'delta', 'revision': 999,
+                  'added': [{'url': 'https://b.com'}]})
+    assert reply['mode'] == 'full'
+    assert {bm['url'] for bm in reply['bookmarks']} == {'https://a.com', 'https://b.com'}
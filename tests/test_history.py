@@ -0,0 +1,158 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from syncmark import config, store as store_module
+from syncmark.store import CachedBookmarkStore, SqliteBookmarkStore, WriteBehindStore
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Horloge de l'historique contrôlée par le test"""
+    now = [1000.0]
+    monkeypatch.setattr(store_module.time, 'time', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def store(mock_sync_dir, clock):
+    store = SqliteBookmarkStore(config.STORE_FILE_PATH)
+    yield store
+    store.close()
+
+
+def urls(bookmarks):
+    return sorted(bm['url'] for bm in bookmarks)
+
+
+def test_past_states_are_rebuilt(store, clock):
+    """Chaque état passé de la collection est reconstruit depuis l'historique."""
+    clock[0] = 1010
+    store.apply([{'url': 'https://a.com'}, {'url': 'https://b.com'}], [])
+    clock[0] = 1020
+    store.apply([{'url': 'https://c.com'}], ['https://a.com'])
+    clock[0] = 1030
+    store.apply([{'url': 'https://b.com', 'title': 'B'}], [])
+
+    assert store.bookmarks_at(1000) == []
+    assert urls(store.bookmarks_at(1015)) == ['https://a.com', 'https://b.com']
+    assert urls(store.bookmarks_at(1025)) == ['https://b.com', 'https://c.com']
+    assert {'url': 'https://b.com', 'title': 'B'} in store.bookmarks_at(1030)
+    with pytest.raises(LookupError):
+        store.bookmarks_at(999)
+
+
+def test_checkpoints_bound_the_replay(store, clock, monkeypatch):
+    """Un instantané complet est écrit périodiquement ; les anciens sont oubliés."""
+    monkeypatch.setattr(store_module, 'HISTORY_CHECKPOINT_INTERVAL', 3)
+    monkeypatch.setattr(store_module, 'HISTORY_MAX_CHECKPOINTS', 2)
+    for i in range(10):
+        clock[0] = 1100 + i
+        store.apply([{'url': f'https://site{i}.com'}], [])
+
+    entries = store.history()
+    assert [entry['checkpoint'] for entry in entries] == [True, False, False, False, True, False]
+    assert entries[0]['bookmarks'] == 6
+    assert entries[1] == {'timestamp': 1106, 'revision': entries[1]['revision'], 'checkpoint': False,
+                          'source': None, 'changed': 1, 'removed': 0}
+    assert len(store.bookmarks_at(1107)) == 8
+    with pytest.raises(LookupError):
+        store.bookmarks_at(1104)
+
+
+def test_restore_creates_a_new_revision(store, clock):
+    """La restauration rétablit l'état passé dans une révision transmise aux extensions."""
+    clock[0] = 1010
+    store.apply([{'url': 'https://a.com'}, {'url': 'https://b.com'}], [])
+    revision = store.revision
+    clock[0] = 1020
+    # Fusion erronée d'un profil : favoris effacés
+    store.apply([{'url': 'https://z.com'}], ['https://a.com', 'https://b.com'])
+
+    clock[0] = 1030
+    changed, removed = store.restore(1015)
+    assert urls(store.all_bookmarks()) == ['https://a.com', 'https://b.com']
+    assert sorted(changed) == ['https://a.com', 'https://b.com']
+    assert removed == ['https://z.com']
+    assert store.history()[-1]['source'] == 'restore'
+    since_changed, since_removed = store.changes_since(revision)
+    assert urls(since_changed) == ['https://a.com', 'https://b.com']
+
+
+def test_existing_store_starts_history_with_a_checkpoint(mock_sync_dir, clock):
+    """Une base sans historique commence par un instantané de la collection."""
+    store = SqliteBookmarkStore(config.STORE_FILE_PATH)
+    try:
+        store.apply([{'url': 'https://a.com'}], [])
+        store.conn.execute("DELETE FROM history")
+        clock[0] = 1050
+        store.apply([{'url': 'https://b.com'}], [])
+        assert [entry['checkpoint'] for entry in store.history()] == [False, True]
+        assert urls(store.bookmarks_at(1050)) == ['https://a.com', 'https://b.com']
+    finally:
+        store.close()
+
+
+def test_host_writes_checkpoints_after_the_sync(mock_sync_dir, clock, monkeypatch):
+    """En mode host, la transaction d'une synchronisation n'écrit pas d'instantané : un thread l'écrit ensuite."""
+    monkeypatch.setattr(store_module, 'HISTORY_CHECKPOINT_INTERVAL', 2)
+    sqlite_store = SqliteBookmarkStore(config.STORE_FILE_PATH, auto_checkpoint=False)
+    sqlite_store.apply([{'url': 'https://a.com'}], [])
+    assert [entry['checkpoint'] for entry in sqlite_store.history()] == [False, False]
+
+    store = WriteBehindStore(CachedBookmarkStore(sqlite_store))
+    try:
+        store.apply([{'url': 'https://b.com'}], [])
+        store.checkpoint_thread.join()
+        entries = sqlite_store.history()
+        assert [entry['checkpoint'] for entry in entries] == [False, False, False, True]
+        assert entries[-1]['bookmarks'] == 2 and entries[-1]['revision'] == sqlite_store.revision
+        assert not sqlite_store.checkpoint_due()
+    finally:
+        store.close()
+
+
+def test_checkpoint_is_abandoned_when_a_revision_is_written(store, monkeypatch):
+    """Un instantané lu pendant l'écriture d'une révision est abandonné, puis retenté."""
+    store.conn.execute("DELETE FROM history WHERE checkpoint = 1")
+    read_blocks = SqliteBookmarkStore._read_blocks
+
+    def concurrent_write(conn):
+        yield from read_blocks(conn)
+        other = SqliteBookmarkStore(config.STORE_FILE_PATH, auto_checkpoint=False)
+        other.apply([{'url': 'https://concurrent.com'}], [])
+        other.close()
+
+    monkeypatch.setattr(SqliteBookmarkStore, '_read_blocks', staticmethod(concurrent_write))
+    assert store.write_checkpoint() is False
+    monkeypatch.setattr(SqliteBookmarkStore, '_read_blocks', staticmethod(read_blocks))
+    assert store.write_checkpoint() is True
+    assert store.history()[-1]['bookmarks'] == 1
+
+
+def test_history_and_restore_modes(tmp_path):
+    """`--mode history` liste l'historique et `--mode restore --output` exporte un état passé."""
+    sync_dir = tmp_path / 'Documents' / 'SyncMark'
+    sync_dir.mkdir(parents=True)
+    store = SqliteBookmarkStore(str(sync_dir / 'syncmark_bookmarks.db'))
+    store.apply([{'url': 'https://a.com'}], [], 'chrome/Default')
+    store.close()
+    env = dict(os.environ, HOME=str(tmp_path), USERPROFILE=str(tmp_path))
+
+    def run(*args, check=True):
+        return subprocess.run([sys.executable, 'syncmark_unified.py', *args], capture_output=True,
+                              env=env, cwd=ROOT_DIR, check=check, text=True)
+
+    history = run('--mode', 'history').stdout.splitlines()
+    assert len(history) == 3
+    assert history[2].endswith('1 modifié(s), 0 supprimé(s) (chrome/Default)')
+
+    output = tmp_path / 'restored.json'
+    run('--mode', 'restore', '--at', '2999-01-01T00:00', '--output', str(output))
+    assert [bm['url'] for bm in json.loads(output.read_text(encoding='utf-8'))] == ['https://a.com']
+    assert run('--mode', 'restore', '--at', '0', check=False).returncode == 1
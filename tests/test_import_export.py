@@ -0,0 +1,217 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from syncmark import config, formats
+from syncmark.config import atomic_write
+from syncmark.store import SqliteBookmarkStore
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+NETSCAPE_HTML = """<!DOCTYPE NETSCAPE-Bookmark-file-1>
+<META HTTP-EQUIV="Content-Type" CONTENT="text/html; charset=UTF-8">
+<TITLE>Bookmarks</TITLE>
+<H1>Bookmarks</H1>
+<DL><p>
+    <DT><H3 ADD_DATE="1700000000" PERSONAL_TOOLBAR_FOLDER="true">Barre de favoris</H3>
+    <DL><p>
+        <DT><A HREF="https://docs.python.org/3/" ADD_DATE="1700000001" ICON="data:image/png;base64,AAA=">Python &amp; docs</A>
+        <DT><H3>Cuisine</H3>
+        <dl><p>
+            <dt><a href='https://www.marmiton.org/recettes?q=tarte&amp;page=2' add_date=1700000002>Tartes</a>
+        </dl><p>
+    </DL><p>
+    <DT><A HREF="https://meteo.example.com">  Météo  </A>
+    <DT><A HREF="">Sans adresse</A>
+</DL><p>
+"""
+
+NETSCAPE_BOOKMARKS = [
+    {'url': 'https://docs.python.org/3/', 'title': 'Python & docs', 'dateAdded': 1700000001000,
+     'folder': 'Barre de favoris'},
+    {'url': 'https://www.marmiton.org/recettes?q=tarte&page=2', 'title': 'Tartes', 'dateAdded': 1700000002000,
+     'folder': 'Barre de favoris/Cuisine'},
+    {'url': 'https://meteo.example.com', 'title': 'Météo'},
+]
+
+
+def chrome_node(name, children=None, url=None, date_added='13344473601000000'):
+    """Nœud du fichier Bookmarks, clés dans l'ordre alphabétique comme Chrome"""
+    node = {'date_added': date_added, 'guid': '00000000-0000-4000-a000-000000000000', 'id': '1', 'name': name}
+    if children is None:
+        node.update(type='url', url=url)
+    else:
+        node.update(children=children, type='folder')
+    return dict(sorted(node.items()))
+
+
+CHROME_FILE = {
+    'checksum': '0123456789abcdef',
+    'roots': {
+        'bookmark_bar': chrome_node('Barre de favoris', [
+            chrome_node('Python', url='https://docs.python.org/3/'),
+            chrome_node('Dev', [chrome_node(f'Page {i}', url=f'https://dev.example.com/{i}') for i in range(30)]
+                        + [chrome_node('Vide', [])]),
+            chrome_node('Météo', url='https://meteo.example.com', date_added='0'),
+        ]),
+        'other': chrome_node('Autres favoris', []),
+        'synced': chrome_node('Favoris sur mobile', [chrome_node('Mobile', url='https://m.example.com')]),
+    },
+    'sync_metadata': 'A' * 3000,
+    'version': 1,
+}
+
+CHROME_BOOKMARKS = (
+    [{'url': 'https://docs.python.org/3/', 'title': 'Python', 'dateAdded': 1700000001000,
+      'folder': 'Barre de favoris'}]
+    + [{'url': f'https://dev.example.com/{i}', 'title': f'Page {i}', 'dateAdded': 1700000001000,
+        'folder': 'Barre de favoris/Dev'} for i in range(30)]
+    + [{'url': 'https://meteo.example.com', 'title': 'Météo', 'folder': 'Barre de favoris'},
+       {'url': 'https://m.example.com', 'title': 'Mobile', 'dateAdded': 1700000001000,
+        'folder': 'Favoris sur mobile'}]
+)
+
+
+@pytest.fixture
+def store(mock_sync_dir):
+    store = SqliteBookmarkStore(config.STORE_FILE_PATH)
+    yield store
+    store.close()
+
+
+@pytest.mark.parametrize('chunk_size', [7, 64, 1024 * 1024])
+def test_read_netscape_html(tmp_path, chunk_size):
+    """Dossiers imbriqués, entités, balises en minuscules ; les blocs peuvent couper balises et titres."""
+    path = tmp_path / 'favoris.html'
+    path.write_text(NETSCAPE_HTML, encoding='utf-8')
+    assert list(formats.read_netscape_html(str(path), chunk_size)) == NETSCAPE_BOOKMARKS
+
+
+@pytest.mark.parametrize('chunk_size', [16, 256, 1024 * 1024])
+def test_read_chrome_bookmarks(tmp_path, chunk_size):
+    """Le nom d'un dossier suit ses enfants ; un dossier plus grand qu'un bloc est parcouru en flux."""
+    path = tmp_path / 'Bookmarks'
+    path.write_text(json.dumps(CHROME_FILE, indent=3, ensure_ascii=False), encoding='utf-8')
+    assert list(formats.read_chrome_bookmarks(str(path), chunk_size)) == CHROME_BOOKMARKS
+
+
+def test_format_detection(tmp_path):
+    """Le format d'import est détecté d'après le contenu, celui d'export d'après l'extension."""
+    html_path, chrome_path, text_path = tmp_path / 'export', tmp_path / 'Bookmarks', tmp_path / 'notes.txt'
+    html_path.write_text('\n' + NETSCAPE_HTML, encoding='utf-8')
+    chrome_path.write_text(json.dumps(CHROME_FILE), encoding='utf-8')
+    text_path.write_text('des notes', encoding='utf-8')
+    assert list(formats.read_bookmark_file(str(html_path))) == NETSCAPE_BOOKMARKS
+    assert list(formats.read_bookmark_file(str(chrome_path))) == CHROME_BOOKMARKS
+    with pytest.raises(ValueError):
+        formats.detect_format(str(text_path))
+    assert formats.export_format('favoris.HTML') == 'html'
+    assert formats.export_format('Bookmarks') == 'chrome'
+
+
+def test_import_is_one_revision_written_in_batches(store):
+    """L'import fusionne par URL normalisée, en lots, dans une seule révision indexée pour la recherche."""
+    store.apply([{'url': 'http://meteo.example.com/', 'title': 'Ancienne météo'},
+                 {'url': 'https://docs.python.org/3/', 'title': 'Python'}], [])
+    store.apply([], ['https://docs.python.org/3/'])
+    revision = store.revision
+    
+    assert store.import_bookmarks(iter(NETSCAPE_BOOKMARKS + ['invalide', {'title': 'sans URL'}]),
+                                  batch_size=2) == (3, 3)
+    assert store.revision == revision + 1
+    assert store.count() == 3
+    assert store.changes_since(revision) == (
+        [NETSCAPE_BOOKMARKS[2], NETSCAPE_BOOKMARKS[0], NETSCAPE_BOOKMARKS[1]], [])
+    assert store.bookmark_sources()['https://www.marmiton.org/recettes?q=tarte&page=2'] == 'import'
+    assert [bm['url'] for bm in store.search('tarte', 10)] == [NETSCAPE_BOOKMARKS[1]['url']]
+    assert [bm['url'] for bm in store.search('ancienne', 10)] == []
+    assert store.history()[-1]['changed'] == 3 and store.history()[-1]['source'] == 'import'
+    
+    # Un favori ajouté après l'import reste indexé par le trigger
+    store.apply([{'url': 'https://cinema.example.com', 'title': 'Cinéma'}], [])
+    assert len(store.search('cinema', 10)) == 1
+    assert store.import_bookmarks(iter(NETSCAPE_BOOKMARKS)) == (3, 0)
+    assert store.revision == revision + 2
+
+
+def test_failed_import_changes_nothing(store):
+    """Une erreur de lecture annule tout l'import."""
+    def bookmarks():
+        yield from NETSCAPE_BOOKMARKS
+        raise ValueError("fichier tronqué")
+    
+    with pytest.raises(ValueError):
+        store.import_bookmarks(bookmarks(), batch_size=1)
+    assert store.count() == 0
+    store.apply([{'url': 'https://cinema.example.com', 'title': 'Cinéma'}], [])
+    assert len(store.search('cinema', 10)) == 1
+
+
+@pytest.mark.parametrize('file_format', formats.FORMATS)
+def test_export_round_trip(store, tmp_path, file_format):
+    """Un fichier exporté, trié par dossier, se réimporte à l'identique."""
+    bookmarks = CHROME_BOOKMARKS + NETSCAPE_BOOKMARKS[1:2] + [
+        {'url': 'https://a.example.com', 'title': '<b>&</b>', 'dateAdded': 1700000003000,
+         'folder': 'Barre de favoris/Dev b'},
+        {'url': 'https://b.example.com', 'title': 'B', 'dateAdded': 1700000004000,
+         'folder': 'Barre de favoris/Dev/Sous'},
+    ]
+    store.import_bookmarks(iter(bookmarks))
+    path = str(tmp_path / ('favoris.html' if file_format == 'html' else 'Bookmarks'))
+    atomic_write(path, formats.export_chunks(store.bookmarks_by_folder, file_format))
+    
+    key = lambda bm: bm['url']
+    assert sorted(formats.read_bookmark_file(path), key=key) == sorted(bookmarks, key=key)
+    if file_format == 'chrome':
+        with open(path, encoding='utf-8') as f:
+            roots = json.load(f)['roots']
+        dev = roots['bookmark_bar']['children'][3]
+        assert (dev['name'], [child.get('name') for child in dev['children']][-2:]) == ('Dev', ['Page 29', 'Sous'])
+
+
+def test_import_and_export_modes(tmp_path):
+    """`--mode import` puis `--mode export` depuis la ligne de commande."""
+    sync_dir = tmp_path / 'Documents' / 'SyncMark'
+    sync_dir.mkdir(parents=True)
+    source = tmp_path / 'favoris.html'
+    source.write_text(NETSCAPE_HTML, encoding='utf-8')
+    env = dict(os.environ, HOME=str(tmp_path), USERPROFILE=str(tmp_path))
+    
+    def run(*args):
+        return subprocess.run([sys.executable, 'syncmark_unified.py', *args], capture_output=True,
+                              env=env, cwd=ROOT_DIR, text=True)
+    
+    result = run('--mode', 'import', str(source))
+    assert result.returncode == 0
+    assert result.stdout.splitlines() == ['3 favori(s) lu(s), 3 ajouté(s) ou modifié(s)']
+    result = run('--mode', 'export', '--format', 'chrome', str(tmp_path / 'export.html'))
+    assert result.stdout.splitlines() == [f"3 favori(s) exporté(s) dans {tmp_path / 'export.html'}"]
+    assert formats.detect_format(str(tmp_path / 'export.html')) == 'chrome'
+    
+    chrome = tmp_path / 'Bookmarks'
+    chrome.write_text(json.dumps(CHROME_FILE), encoding='utf-8')
+    result = run('--mode', 'import', '--workers', '2', str(source), str(chrome))
+    assert result.returncode == 0
+    assert result.stdout.splitlines() == [f'{3 + len(CHROME_BOOKMARKS)} favori(s) lu(s), '
+                                          f'{len(CHROME_BOOKMARKS)} ajouté(s) ou modifié(s)']
+    
+    result = run('--mode', 'import', '--workers', '-1', str(source), str(chrome))
+    assert result.returncode == 2 and 'Traceback' not in result.stderr
+    
+    result = run('--mode', 'import', str(tmp_path / 'absent.html'))
+    assert result.returncode == 1 and result.stdout.startswith('Import impossible')
+
+
+def test_frozen_executable_supports_worker_processes(tmp_path):
+    """Dans l'exécutable PyInstaller, main() appelle freeze_support avant de choisir un mode."""
+    env = dict(os.environ, HOME=str(tmp_path), USERPROFILE=str(tmp_path))
+    code = ("import multiprocessing, sys; sys.frozen = True; "
+            "multiprocessing.freeze_support = lambda: sys.exit('freeze_support'); "
+            "sys.argv = ['syncmark_unified.py', '--mode', 'host']; "
+            "import syncmark_unified; syncmark_unified.main()")
+    result = subprocess.run([sys.executable, '-c', code], input=b'', capture_output=True,
+                            env=env, cwd=ROOT_DIR)
+    assert result.returncode == 1 and result.stderr.strip() == b'freeze_support'
@@ -0,0 +1,38 @@
+import json
+import os
+import subprocess
+import sys
+
+from syncmark import config
+from syncmark.installer import HOST_NAME, NativeHostInstaller
+
+
+def test_core_does_not_import_platform_frontends():
+    """Le cœur du Native Host s'importe sans tkinter ni winreg."""
+    code = ("import sys, syncmark.host; "
+            "assert 'tkinter' not in sys.modules and 'winreg' not in sys.modules")
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    subprocess.run([sys.executable, '-c', code], cwd=root, check=True)
+
+
+def test_install_and_uninstall_on_linux(mock_sync_dir, tmp_path, monkeypatch):
+    """Sous Linux, le manifest est écrit dans le dossier NativeMessagingHosts de Chrome."""
+    monkeypatch.setattr(sys, 'platform', 'linux')
+    monkeypatch.setattr(config, 'HOME_DIR', str(tmp_path))
+    (tmp_path / '.config' / 'chromium').mkdir(parents=True)
+
+    assert NativeHostInstaller.install_manifest('abcdef') is True
+
+    manifest_paths = [
+        tmp_path / '.config' / 'google-chrome' / 'NativeMessagingHosts' / f'{HOST_NAME}.json',
+        tmp_path / '.config' / 'chromium' / 'NativeMessagingHosts' / f'{HOST_NAME}.json',
+    ]
+    for manifest_path in manifest_paths:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        assert manifest['allowed_origins'] == ['chrome-extension://abcdef/']
+        assert os.access(manifest['path'], os.X_OK)
+    assert not (tmp_path / '.config' / 'microsoft-edge').exists()
+
+    assert NativeHostInstaller.uninstall_manifest() is True
+    assert not any(path.exists() for path in manifest_paths)
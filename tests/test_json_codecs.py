@@ -0,0 +1,40 @@
+import pytest
+
+from syncmark.codec import JSON_CODECS, get_codec
+
+
+@pytest.fixture(params=list(JSON_CODECS))
+def codec(request):
+    try:
+        return get_codec(request.param)
+    except ImportError:
+        pytest.skip(f"{request.param} n'est pas installé")
+
+
+def test_roundtrip(codec):
+    """Les codecs relisent ce qu'ils écrivent, en octets comme en chaîne."""
+    value = {'url': 'https://exemple.com/é', 'title': 'Été', 'tags': [1, 2.5, None, True]}
+    encoded = codec.dumps(value)
+    assert isinstance(encoded, bytes)
+    assert codec.loads(encoded) == value
+    assert codec.loads(encoded.decode('utf-8')) == value
+    assert codec.loads(bytearray(encoded)) == value
+
+
+def test_sorted_output_is_canonical(codec):
+    """Le tri des clés rend l'encodage indépendant de l'ordre d'insertion."""
+    assert codec.dumps({'b': 1, 'a': 2}, sort_keys=True) == codec.dumps({'a': 2, 'b': 1}, sort_keys=True)
+
+
+def test_pretty_output_is_indented(codec):
+    """L'export lisible est indenté, l'encodage par défaut est compact."""
+    value = [{'url': 'https://a.com'}]
+    assert b'\n' in codec.dumps_pretty(value)
+    assert b'\n' not in codec.dumps(value)
+    assert codec.loads(codec.dumps_pretty(value)) == value
+
+
+def test_invalid_json_raises_value_error(codec):
+    """Tous les codecs signalent un JSON invalide par ValueError."""
+    with pytest.raises(ValueError):
+        codec.loads(b'{"url": ')
@@ -0,0 +1,130 @@
+import json
+import logging
+import logging.handlers
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from syncmark import config, logs
+from syncmark.config import SyncMarkConfig
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+@pytest.fixture
+def root_logger(mock_sync_dir):
+    """Rétablit le logger racine de pytest après configure_logging"""
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield root
+    logs.stop_logging()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+def read_log():
+    with open(config.LOG_FILE, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_records_are_written_as_json(root_logger):
+    """Chaque enregistrement est une ligne JSON, exception comprise."""
+    logs.configure_logging()
+    logging.info("Fusion : %d favoris", 3)
+    try:
+        raise ValueError("arborescence invalide")
+    except ValueError:
+        logging.error("Erreur de fusion", exc_info=True)
+    logs.stop_logging()
+
+    info, error = read_log()
+    assert info['level'] == 'INFO' and info['message'] == 'Fusion : 3 favoris'
+    assert info['process'] == os.getpid()
+    assert error['message'] == 'Erreur de fusion'
+    assert 'ValueError: arborescence invalide' in error['exception']
+
+
+def test_file_is_written_by_the_listener_thread(root_logger, monkeypatch):
+    """L'appel de logging n'attend pas le disque : l'écriture est faite par le thread du journal."""
+    release = threading.Event()
+    writers = []
+    emit = logging.handlers.RotatingFileHandler.emit
+
+    def slow_emit(handler, record):
+        writers.append(threading.current_thread())
+        release.wait(5)
+        emit(handler, record)
+
+    monkeypatch.setattr(logging.handlers.RotatingFileHandler, 'emit', slow_emit)
+    logs.configure_logging()
+    logging.warning("premier")
+    logging.warning("second")
+    assert not os.path.exists(config.LOG_FILE) or not read_log()
+    release.set()
+    logs.stop_logging()
+
+    assert [entry['message'] for entry in read_log()] == ['premier', 'second']
+    assert threading.current_thread() not in writers
+
+
+def test_host_mode_defaults_to_warning(root_logger):
+    """En mode host, les lignes INFO de chaque message ne sont pas écrites par défaut."""
+    logs.configure_logging(host_mode=True)
+    logging.info("Message reçu de l'extension")
+    logging.warning("Message trop volumineux")
+    logs.stop_logging()
+    assert [entry['message'] for entry in read_log()] == ['Message trop volumineux']
+
+
+def test_level_and_rotation_from_settings(root_logger):
+    """`log_level`, `log_max_bytes` et `log_backup_count` sont lus dans config.json."""
+    SyncMarkConfig.update_settings(log_level='debug', log_max_bytes=500, log_backup_count=2)
+    logs.configure_logging(host_mode=True)
+    for i in range(50):
+        logging.debug(f"Ligne {i}")
+    logs.stop_logging()
+
+    assert os.path.exists(config.LOG_FILE + '.1') and os.path.exists(config.LOG_FILE + '.2')
+    assert not os.path.exists(config.LOG_FILE + '.3')
+    assert read_log()[-1]['message'] == 'Ligne 49'
+
+
+def test_unknown_level_is_reported(root_logger):
+    """Un niveau inconnu est signalé et remplacé par le niveau par défaut."""
+    SyncMarkConfig.update_settings(log_level='BAVARD')
+    logs.configure_logging()
+    logs.stop_logging()
+    assert logging.getLogger().level == logging.INFO
+    assert read_log()[0]['message'] == "Niveau de log inconnu : 'BAVARD'"
+
+
+def test_pending_records_are_written_at_exit(tmp_path):
+    """Les enregistrements en attente sont écrits à la sortie du processus."""
+    sync_dir = tmp_path / 'Documents' / 'SyncMark'
+    sync_dir.mkdir(parents=True)
+    env = dict(os.environ, HOME=str(tmp_path), USERPROFILE=str(tmp_path))
+    subprocess.run([sys.executable, 'syncmark_unified.py', '--mode', 'history'], capture_output=True,
+                   env=env, cwd=ROOT_DIR, check=True)
+    with open(sync_dir / 'syncmark_unified.log', encoding='utf-8') as f:
+        entries = [json.loads(line) for line in f]
+    assert entries and {entry['level'] for entry in entries} == {'INFO'}
+
+
+def test_quiet_host_does_not_start_the_writer(tmp_path):
+    """Un Native Host sans avertissement ne charge pas logging.handlers et n'écrit pas de journal."""
+    sync_dir = tmp_path / 'Documents' / 'SyncMark'
+    sync_dir.mkdir(parents=True)
+    env = dict(os.environ, HOME=str(tmp_path), USERPROFILE=str(tmp_path))
+    code = ("import sys; sys.argv = ['syncmark_unified.py', '--mode', 'host']; "
+            "import syncmark_unified; syncmark_unified.main(); "
+            "print('logging.handlers' in sys.modules, file=sys.stderr)")
+    result = subprocess.run([sys.executable, '-c', code], input=b'', capture_output=True,
+                            env=env, cwd=ROOT_DIR, check=True)
+    assert result.stderr.split() == [b'False']
+    assert not (sync_dir / 'syncmark_unified.log').exists()
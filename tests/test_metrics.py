@@ -0,0 +1,104 @@
+import json
+import os
+import subprocess
+import sys
+
+from conftest import frame, run_host
+from syncmark import config
+from syncmark.config import SyncMarkConfig
+from syncmark.host import NativeHostManager
+from syncmark.metrics import STAGES, MessageMetrics, MetricsRecorder, read_metrics, summarize
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def test_host_records_every_stage(mock_sync_dir):
+    """Le host enregistre une ligne par message : durée de chaque étape, tailles et nombres de favoris."""
+    bookmarks = [{'url': f'https://site{i}.com', 'title': f'Site {i}'} for i in range(50)]
+    data = frame({'id': 1, 'bookmarks': bookmarks}) + frame({'id': 2, 'type': 'delta', 'revision': 0})
+    # Écriture immédiate : la mise en base fait partie du traitement du message
+    SyncMarkConfig.update_settings(enabled=True, write_delay=0)
+    output = run_host(data, NativeHostManager())
+
+    first, second = read_metrics(config.METRICS_FILE_PATH)
+    assert set(first['stages']) == set(STAGES)
+    assert abs(first['total'] - sum(first['stages'].values())) < 0.01
+    assert first['type'] == 'full' and first['status'] == 'success'
+    assert first['bytes_in'] == len(frame({'id': 1, 'bookmarks': bookmarks})) - 4
+    assert first['bookmarks_in'] == 50 and first['bookmarks_out'] == 50
+    assert first['frames'] == 1
+    assert first['bytes_out'] + second['bytes_out'] + 8 == len(output)
+    assert second['type'] == 'delta' and second['bookmarks_in'] == 0
+    # Aucun changement : la base n'est pas écrite
+    assert 'persist' not in second['stages']
+
+
+def test_nested_stage_is_not_counted_twice():
+    """Une étape imbriquée est retirée de l'étape qui la contient."""
+    metrics = MessageMetrics()
+    with metrics.stage('merge'):
+        with metrics.stage('persist'):
+            sum(range(100000))
+    with metrics.stage('encode'):
+        pass
+    with metrics.stage('encode'):
+        pass
+    assert metrics.timings['merge'] < metrics.timings['persist']
+    assert set(metrics.timings) == {'merge', 'persist', 'encode'}
+
+
+def test_metrics_disabled_in_settings(mock_sync_dir):
+    """`"metrics": false` dans config.json désactive l'enregistrement."""
+    SyncMarkConfig.update_settings(enabled=True, metrics=False)
+    run_host(frame({'bookmarks': []}), NativeHostManager())
+    assert not os.path.exists(config.METRICS_FILE_PATH)
+
+
+def test_metrics_file_rotation(tmp_path):
+    """Le fichier plein est archivé en .1 ; les deux sont relus dans l'ordre."""
+    path = str(tmp_path / 'metrics.jsonl')
+    recorder = MetricsRecorder(path, max_size=300)
+    for i in range(10):
+        metrics = MessageMetrics()
+        metrics.set(type=f'message{i}')
+        recorder.write(metrics)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"interrompu"')
+
+    assert os.path.exists(path + '.1')
+    types = [record['type'] for record in read_metrics(path)]
+    assert types == sorted(types, key=lambda name: int(name[7:]))
+    assert types[-1] == 'message9'
+
+
+def test_summary_percentiles():
+    """Les percentiles d'une étape ignorent les messages où elle est absente."""
+    records = [{'type': 'delta', 'stages': {'merge': float(i)}, 'total': float(i), 'bytes_in': i}
+               for i in range(1, 101)]
+    records.append({'type': 'full', 'stages': {}, 'total': 0.0})
+    summary = summarize(records)
+    assert summary['count'] == 101
+    assert summary['types'] == {'delta': 100, 'full': 1}
+    assert summary['stages']['merge'] == {'p50': 50.0, 'p95': 95.0, 'p99': 99.0, 'max': 100.0}
+    assert summary['stages']['read'] is None
+    assert summary['counters']['bytes_in']['p99'] == 99
+
+
+def test_stats_mode(tmp_path):
+    """`--mode stats` affiche les percentiles par étape."""
+    sync_dir = tmp_path / 'Documents' / 'SyncMark'
+    sync_dir.mkdir(parents=True)
+    with open(sync_dir / 'syncmark_metrics.jsonl', 'w', encoding='utf-8') as f:
+        for i in range(1, 11):
+            f.write(json.dumps({'type': 'delta', 'stages': {'read': i, 'merge': 2 * i},
+                                'total': 3 * i, 'bytes_in': 100 * i}) + '\n')
+    env = dict(os.environ, HOME=str(tmp_path), USERPROFILE=str(tmp_path))
+
+    lines = subprocess.run([sys.executable, 'syncmark_unified.py', '--mode', 'stats'], capture_output=True,
+                           env=env, cwd=ROOT_DIR, check=True, text=True).stdout.splitlines()
+    assert lines[0] == '10 message(s) : delta 10'
+    assert lines[1].split() == ['p50', 'p95', 'p99', 'max']
+    assert lines[2].split() == ['read', '(ms)', '5.000', '10.000', '10.000', '10.000']
+    assert lines[3].split()[:3] == ['merge', '(ms)', '10.000']
+    assert lines[4].split()[:3] == ['total', '(ms)', '15.000']
+    assert lines[5].split() == ['bytes_in', '500', '1000', '1000', '1000']
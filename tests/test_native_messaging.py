@@ -0,0 +1,141 @@
+import io
+import json
+import struct
+import pytest
+from unittest.mock import MagicMock, patch
+
+from conftest import frame, raw_frame, read_frames, run_host
+from syncmark.framing import MessageTooLargeError, StreamingMessageDecoder
+from syncmark.host import NativeHostManager
+
+
+class TrickleStream(io.RawIOBase):
+    """Flux qui ne retourne que quelques octets par lecture, comme un pipe."""
+
+    def __init__(self, data, step=3):
+        self.data = io.BytesIO(data)
+        self.step = step
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        chunk = self.data.read(min(len(buffer), self.step))
+        buffer[:len(chunk)] = chunk
+        return len(chunk)
+
+
+def read_messages(data, host=None):
+    host = host or NativeHostManager()
+    fake_stdin = MagicMock()
+    fake_stdin.buffer = TrickleStream(data)
+    with patch('sys.stdin', fake_stdin):
+        return host.get_message()
+
+
+def test_get_message_handles_short_reads():
+    """Les lectures partielles sont complétées jusqu'à la taille annoncée."""
+    message = {'bookmarks': [{'url': 'https://exemple.com', 'title': 'Été'}]}
+    assert read_messages(frame(message)) == message
+
+
+def test_get_message_handles_eof():
+    """Un flux fermé retourne None."""
+    assert read_messages(b'') is None
+
+
+def test_get_message_rejects_oversized_message():
+    """Un message trop volumineux est refusé sans désaligner le flux."""
+    host = NativeHostManager(max_message_size=64)
+    fake_stdin = MagicMock()
+    fake_stdin.buffer = io.BytesIO(frame({'bookmarks': ['x' * 100]}) + frame({'ok': True}))
+
+    with patch('sys.stdin', fake_stdin):
+        with pytest.raises(MessageTooLargeError):
+            host.get_message()
+        assert host.get_message() == {'ok': True}
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 64, 4096])
+def test_streaming_decoder_matches_json(chunk_size):
+    """L'analyse en flux donne le même résultat que json.loads."""
+    message = {
+        'type': 'delta',
+        'revision': 12,
+        'added': [{'url': f'https://e.com/{i}', 'title': 'a, "b"}, é', 'tags': [i, 'x']}
+                  for i in range(50)],
+        'removed': ['https://old.com/a,b', 'https://old.com/"c"'],
+    }
+    payload = json.dumps(message, ensure_ascii=False).encode('utf-8')
+    decoder = StreamingMessageDecoder(TrickleStream(payload, step=5), len(payload), chunk_size)
+    assert decoder.decode() == message
+
+
+def test_streaming_decoder_rejects_truncated_json():
+    """Un message JSON invalide est signalé comme tel."""
+    payload = b'{"bookmarks": [{"url": "https://e.com"}'
+    with pytest.raises(ValueError):
+        StreamingMessageDecoder(io.BytesIO(payload), len(payload), 8).decode()
+
+
+def sent_frames(message, max_reply_size):
+    host = NativeHostManager(max_reply_size=max_reply_size)
+    fake_stdout = MagicMock()
+    fake_stdout.buffer = io.BytesIO()
+    with patch('sys.stdout', fake_stdout):
+        host.send_message(message)
+
+    data = fake_stdout.buffer.getvalue()
+    frames, pos = [], 0
+    while pos < len(data):
+        length = struct.unpack('@I', data[pos:pos + 4])[0]
+        assert length <= max_reply_size
+        frames.append(json.loads(data[pos + 4:pos + 4 + length]))
+        pos += 4 + length
+    return frames
+
+
+def test_small_reply_is_sent_in_one_frame():
+    """Un message sous la limite est envoyé tel quel."""
+    message = {'status': 'success', 'revision': 3, 'bookmarks': [{'url': 'https://a.com'}]}
+    assert sent_frames(message, 1024) == [message]
+
+
+def test_large_reply_is_chunked():
+    """Un message au-delà de la limite est découpé puis terminé par une trame finale."""
+    bookmarks = [{'url': f'https://exemple.com/{i}', 'title': 'Été'} for i in range(200)]
+    message = {'status': 'success', 'mode': 'delta', 'revision': 7,
+               'changed': bookmarks, 'removed': ['https://old.com']}
+
+    frames = sent_frames(message, 512)
+    *partials, end = frames
+    assert len(partials) > 1
+    assert [frame['chunk'] for frame in partials] == list(range(len(partials)))
+    assert end == {'status': 'success', 'mode': 'delta', 'revision': 7, 'chunks': len(partials)}
+
+    rebuilt = {}
+    for frame in partials:
+        assert frame['status'] == 'partial'
+        rebuilt.setdefault(frame['field'], []).extend(frame['items'])
+    assert rebuilt == {'changed': bookmarks, 'removed': ['https://old.com']}
+
+
+def test_item_larger_than_frame_is_rejected():
+    """Un élément qui ne tient dans aucune trame est signalé."""
+    with pytest.raises(MessageTooLargeError):
+        sent_frames({'status': 'success', 'bookmarks': [{'title': 'x' * 1000}]}, 256)
+
+
+@pytest.mark.parametrize('payload', [b'{"bookmarks": [', b'\xff\xfe', b'{"bookmarks": [' + b'"x",' * 400_000 + b'}'],
+                         ids=['truncated', 'utf8', 'streamed'])
+def test_invalid_json_is_quarantined_and_host_continues(mock_sync_dir, payload):
+    """Un message illisible reçoit une erreur et est mis en quarantaine ; le message suivant est traité."""
+    from syncmark import config
+    first, second = read_frames(run_host(raw_frame(payload) + frame({'id': 2, 'type': 'search', 'query': 5}),
+                                         NativeHostManager()))
+    assert first == {'status': 'error', 'message': 'Invalid JSON'}
+    assert second['id'] == 2
+    with open(config.QUARANTINE_FILE_PATH, encoding='utf-8') as f:
+        entry = json.loads(f.readline())
+    assert entry['field'] == 'message' and entry['reason'].startswith('invalid JSON')
+    assert len(entry.get('entry') or entry['truncated']) <= 4096
@@ -0,0 +1,138 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from syncmark import config, search
+from syncmark.config import SyncMarkConfig
+from syncmark.host import NativeHostManager
+from syncmark.store import CachedBookmarkStore, SqliteBookmarkStore, WriteBehindStore
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+BOOKMARKS = [
+    {'url': 'https://docs.python.org/3/library/sqlite3.html', 'title': 'sqlite3 — DB-API 2.0'},
+    {'url': 'https://www.marmiton.org/recettes/tarte', 'title': 'Tarte aux pommes', 'folder': 'Cuisine/Desserts'},
+    {'url': 'https://meteo.example.com', 'title': 'Météo de la semaine'},
+    {'url': 'https://python.example.com/blog', 'title': 'Blog Python', 'folder': 'Dev'},
+]
+
+
+@pytest.fixture
+def store(mock_sync_dir):
+    store = SqliteBookmarkStore(config.STORE_FILE_PATH)
+    store.apply(BOOKMARKS, [])
+    yield store
+    store.close()
+
+
+def urls(results):
+    return [bm['url'] for bm in results]
+
+
+def test_prefix_search_over_title_url_and_folder(store):
+    """Chaque mot est un début de mot du titre, de l'URL ou du dossier ; tous doivent être présents."""
+    assert urls(store.search('tart', 10)) == ['https://www.marmiton.org/recettes/tarte']
+    assert urls(store.search('cuis dess', 10)) == ['https://www.marmiton.org/recettes/tarte']
+    assert urls(store.search('marmiton', 10)) == ['https://www.marmiton.org/recettes/tarte']
+    assert urls(store.search('meteo', 10)) == ['https://meteo.example.com']
+    assert store.search('tarte python', 10) == []
+
+
+def test_title_ranks_above_url(store):
+    """Un mot du titre compte plus qu'un mot de l'URL."""
+    assert urls(store.search('python', 10)) == [
+        'https://python.example.com/blog', 'https://docs.python.org/3/library/sqlite3.html']
+    assert len(store.search('python', 1)) == 1
+
+
+@pytest.mark.parametrize('query', ['', '   ', '"', 'AND', 'title:tarte OR (', 'NEAR(a b)', '*'])
+def test_query_syntax_is_not_interpreted(store, query):
+    """Les opérateurs FTS5 et la ponctuation saisis ne provoquent pas d'erreur."""
+    store.search(query, 10)
+
+
+def test_index_follows_every_write(store):
+    """L'index suit les modifications, suppressions, dédoublonnages et restaurations."""
+    store.apply([{'url': 'https://meteo.example.com', 'title': 'Prévisions'}], ['https://python.example.com/blog'])
+    assert store.search('semaine', 10) == []
+    assert urls(store.search('prévisions', 10)) == ['https://meteo.example.com']
+    assert urls(store.search('blog', 10)) == []
+
+    store.conn.execute("DELETE FROM meta WHERE key = 'key_version'")
+    store.apply([{'url': 'http://docs.python.org/3/library/sqlite3.html/', 'title': 'Doublon'}], [])
+    store.deduplicate()
+    assert store.count() == 3
+    assert len(store.search('sqlite3', 10)) == 1
+
+
+def test_existing_database_is_indexed_on_open(mock_sync_dir):
+    """Une base créée sans index de recherche est indexée à l'ouverture."""
+    store = SqliteBookmarkStore(config.STORE_FILE_PATH)
+    store.apply(BOOKMARKS, [])
+    for statement in search.DROP_STATEMENTS:
+        store.conn.execute(statement)
+    store.conn.execute("DELETE FROM meta WHERE key = 'search_version'")
+    store.close()
+
+    store = SqliteBookmarkStore(config.STORE_FILE_PATH)
+    try:
+        assert urls(store.search('pommes', 10)) == ['https://www.marmiton.org/recettes/tarte']
+        store.apply([], ['https://www.marmiton.org/recettes/tarte'])
+        assert store.search('pommes', 10) == []
+    finally:
+        store.close()
+
+
+def test_search_message(mock_sync_dir):
+    """Le message `search` retourne les favoris, y compris ceux en attente d'écriture."""
+    SyncMarkConfig.update_settings(enabled=True)
+    store = WriteBehindStore(CachedBookmarkStore(SqliteBookmarkStore(config.STORE_FILE_PATH)), delay=60)
+    host = NativeHostManager(store=store)
+    try:
+        host.build_reply({'bookmarks': BOOKMARKS})
+        assert host.build_reply({'id': 7, 'type': 'search', 'query': 'Tarte', 'limit': 5}) == {
+            'status': 'success', 'mode': 'search', 'id': 7, 'results': [BOOKMARKS[1]]}
+        for message in ({'type': 'search'}, {'type': 'search', 'query': 'x', 'limit': 0},
+                        {'type': 'search', 'query': 'x', 'limit': True}):
+            assert host.build_reply(message) == {'status': 'error', 'message': 'Invalid search query'}
+    finally:
+        host.close()
+
+
+def test_search_mode(tmp_path):
+    """`--mode search` affiche les favoris trouvés."""
+    sync_dir = tmp_path / 'Documents' / 'SyncMark'
+    sync_dir.mkdir(parents=True)
+    store = SqliteBookmarkStore(str(sync_dir / 'syncmark_bookmarks.db'))
+    store.apply(BOOKMARKS, [])
+    store.close()
+    env = dict(os.environ, HOME=str(tmp_path), USERPROFILE=str(tmp_path))
+
+    output = subprocess.run([sys.executable, 'syncmark_unified.py', '--mode', 'search', 'tarte pom'],
+                            capture_output=True, env=env, cwd=ROOT_DIR, check=True, text=True).stdout
+    assert output.splitlines() == [
+        'Tarte aux pommes', '  https://www.marmiton.org/recettes/tarte  [Cuisine/Desserts]', '1 résultat(s)']
+
+
+def test_search_mode_errors(tmp_path):
+    """`--mode search` refuse une limite nulle et échoue lisiblement sans index de recherche."""
+    sync_dir = tmp_path / 'Documents' / 'SyncMark'
+    sync_dir.mkdir(parents=True)
+    store = SqliteBookmarkStore(str(sync_dir / 'syncmark_bookmarks.db'))
+    store.apply(BOOKMARKS, [])
+    # Base ouverte par un SQLite sans FTS5 : l'index de recherche n'existe pas
+    for statement in search.DROP_STATEMENTS:
+        store.conn.execute(statement)
+    store.close()
+    env = dict(os.environ, HOME=str(tmp_path), USERPROFILE=str(tmp_path))
+
+    def run(*args):
+        return subprocess.run([sys.executable, 'syncmark_unified.py', '--mode', 'search', *args],
+                              capture_output=True, env=env, cwd=ROOT_DIR, text=True)
+
+    assert run('--limit', '0', 'tarte').returncode == 2
+    result = run('tarte')
+    assert result.returncode == 1
+    assert result.stdout.startswith('Recherche impossible : ') and 'Traceback' not in result.stderr
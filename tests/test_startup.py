@@ -0,0 +1,54 @@
+import os
+import struct
+import subprocess
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Budget large pour rester stable sur une machine chargée ; la mesure fine
+# est faite par benchmarks/bench_startup.py
+HOST_IMPORT_BUDGET_MS = 250
+
+# Modules inutiles pour une synchronisation, à ne jamais importer en mode host
+UNUSED_IN_HOST_MODE = ['argparse', 'tkinter', 'tkinter.messagebox', 'winreg', 'tempfile', 'syncmark.ui',
+                       'syncmark.installer']
+
+
+def run_host_with_importtime(home, *args):
+    """Lance une synchronisation de deux favoris et retourne {module: cumulé µs} des imports de premier niveau"""
+    payload = b'{"bookmarks":[{"url":"https://a.example.com/"},{"url":"https://b.example.com/"}]}'
+    env = dict(os.environ, HOME=str(home), USERPROFILE=str(home))
+    result = subprocess.run([sys.executable, '-X', 'importtime', 'syncmark_unified.py', *args],
+                            input=struct.pack('@I', len(payload)) + payload,
+                            capture_output=True, env=env, cwd=ROOT_DIR, check=True)
+    assert result.stdout.startswith(struct.pack('@I', len(result.stdout) - 4))
+    imports = {}
+    for line in result.stderr.decode('utf-8').splitlines():
+        if line.startswith('import time:') and 'imported package' not in line:
+            _, cumulative_us, name = line[len('import time:'):].split('|')
+            imports[name.strip()] = (len(name) - len(name.lstrip(' ')) == 1, int(cumulative_us))
+    return imports
+
+
+@pytest.fixture
+def host_home(tmp_path):
+    """HOME temporaire où un premier lancement a créé la configuration et la base"""
+    run_host_with_importtime(tmp_path, '--mode', 'host')
+    return tmp_path
+
+
+def test_host_mode_skips_unused_imports(host_home):
+    """Le mode host n'importe ni argparse, ni Tk, ni l'installateur."""
+    for args in (['--mode', 'host'], ['chrome-extension://abcdef/']):
+        imports = run_host_with_importtime(host_home, *args)
+        assert 'syncmark.host' in imports
+        assert not [module for module in UNUSED_IN_HOST_MODE if module in imports]
+
+
+def test_host_mode_import_budget(host_home):
+    """Les imports d'une synchronisation tiennent dans le budget de démarrage."""
+    imports = run_host_with_importtime(host_home, '--mode', 'host')
+    import_ms = sum(cumulative for top_level, cumulative in imports.values() if top_level) / 1000
+    assert import_ms < HOST_IMPORT_BUDGET_MS
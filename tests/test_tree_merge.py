@@ -0,0 +1,298 @@
+import pytest
+
+from syncmark import config
+from syncmark.host import NativeHostManager
+from syncmark.tree import ROOT_ID, SqliteTreeStore, node_hash, parse_tree, tree_reply, tree_summary_reply
+
+
+def bookmark(local_id, title, url, **fields):
+    return dict(id=local_id, title=title, url=url, **fields)
+
+
+def folder(local_id, title, *children, **fields):
+    return dict(id=local_id, title=title, children=list(children), **fields)
+
+
+def chrome_tree(bar=(), other=()):
+    """Arbre au format chrome.bookmarks.getTree()[0]"""
+    return folder('0', '', folder('1', 'Barre de favoris', *bar), folder('2', 'Autres favoris', *other))
+
+
+def outline(store):
+    """Arbre stocké sous forme de tuples (titre, URL ou enfants)"""
+    nodes = store.all_nodes()
+    children = {}
+    for node in nodes:
+        children.setdefault(node['parent_id'], []).append(node)
+
+    def build(parent_id):
+        return [(node['title'], node['url']) if 'url' in node else (node['title'], build(node['node_id']))
+                for node in sorted(children.get(parent_id, []), key=lambda n: n['index'])]
+    return build(ROOT_ID)
+
+
+@pytest.fixture
+def tree_store(mock_sync_dir):
+    store = SqliteTreeStore(config.STORE_FILE_PATH)
+    yield store
+    store.close()
+
+
+def sync(store, tree, revision=None, source='chrome/Default'):
+    merge = store.merge(tree, revision, source)
+    return tree_reply(store, merge)
+
+
+def test_folders_order_and_duplicate_urls_are_kept(tree_store):
+    """Les dossiers, l'ordre et les doublons d'URL dans des dossiers différents sont conservés."""
+    reply = sync(tree_store, chrome_tree(
+        bar=[bookmark('10', 'B', 'https://b.com'), folder('11', 'Dev', bookmark('12', 'A', 'https://a.com')),
+             bookmark('13', 'A', 'https://a.com')]))
+
+    assert reply['mode'] == 'tree_full'
+    assert outline(tree_store) == [
+        ('Barre de favoris', [('B', 'https://b.com'), ('Dev', [('A', 'https://a.com')]), ('A', 'https://a.com')]),
+        ('Autres favoris', []),
+    ]
+    ids = {entry['id']: entry['node_id'] for entry in reply['ids']}
+    assert len(set(ids.values())) == 6
+    assert ids['12'] != ids['13']
+
+
+def test_identical_tree_is_not_rewritten(tree_store):
+    """Un arbre identique au stocké ne crée pas de révision et n'est pas parcouru."""
+    tree = chrome_tree(bar=[folder('11', 'Dev', bookmark('12', 'A', 'https://a.com'))])
+    revision = sync(tree_store, tree)['revision']
+
+    merge = tree_store.merge(tree, revision, 'chrome/Default')
+    assert merge.revision == revision
+    assert not merge.touched
+    assert merge.folders == {}
+    assert tree_reply(tree_store, merge) == {'status': 'success', 'revision': revision,
+                                             'root_hash': tree_store.root_hash.hex(), 'ids': [],
+                                             'mode': 'tree', 'changed': [], 'removed': []}
+
+
+def test_only_changed_subtrees_are_visited(tree_store):
+    """Seuls les dossiers dont l'empreinte diffère sont lus et fusionnés."""
+    folders = [folder(f'f{i}', f'Dossier {i}', *[bookmark(f'b{i}-{j}', 'x', f'https://{i}-{j}.com')
+                                                   for j in range(5)]) for i in range(20)]
+    revision = sync(tree_store, chrome_tree(bar=folders))['revision']
+
+    folders[7]['children'].append(bookmark('new', 'Nouveau', 'https://new.com'))
+    merge = tree_store.merge(chrome_tree(bar=folders), revision, 'chrome/Default')
+    # Racine, barre de favoris et dossier modifié
+    assert len(merge.folders) == 3
+    assert sorted(state[3] for state in merge.client_state.values() if state[3] is not None) == [
+        'https://7-0.com', 'https://7-1.com', 'https://7-2.com', 'https://7-3.com', 'https://7-4.com',
+        'https://new.com']
+    assert merge.touched == {merge.id_map['new']}
+    assert tree_reply(tree_store, merge)['changed'] == []
+
+
+def test_three_way_merge_keeps_both_sides(tree_store):
+    """Les changements de deux profils depuis la même base sont tous les deux conservés."""
+    base_tree = chrome_tree(bar=[bookmark('10', 'A', 'https://a.com'), bookmark('11', 'B', 'https://b.com'),
+                                 folder('12', 'Dev', bookmark('13', 'C', 'https://c.com'))])
+    revision = sync(tree_store, base_tree, source='chrome/Default')['revision']
+    sync(tree_store, base_tree, source='brave/Default')
+
+    # Chrome renomme A et supprime B
+    sync(tree_store, chrome_tree(bar=[bookmark('10', 'A renommé', 'https://a.com'),
+                                      folder('12', 'Dev', bookmark('13', 'C', 'https://c.com'))]),
+         revision, source='chrome/Default')
+    # Brave, toujours à la révision de base, ajoute D dans Dev
+    reply = sync(tree_store, chrome_tree(bar=[bookmark('10', 'A', 'https://a.com'), bookmark('11', 'B', 'https://b.com'),
+                                              folder('12', 'Dev', bookmark('13', 'C', 'https://c.com'),
+                                                     bookmark('14', 'D', 'https://d.com'))]),
+                 revision, source='brave/Default')
+
+    assert outline(tree_store) == [
+        ('Barre de favoris', [('A renommé', 'https://a.com'),
+                              ('Dev', [('C', 'https://c.com'), ('D', 'https://d.com')])]),
+        ('Autres favoris', []),
+    ]
+    # Brave reçoit le renommage, la suppression et la nouvelle position de Dev, pas son propre ajout
+    assert [node['title'] for node in reply['changed']] == ['A renommé', 'Dev']
+    assert len(reply['removed']) == 1
+
+
+def test_conflicting_edits_use_latest_modification(tree_store):
+    """Un nœud modifié des deux côtés garde la version modifiée le plus récemment."""
+    revision = sync(tree_store, chrome_tree(bar=[bookmark('10', 'A', 'https://a.com', dateAdded=1)]),
+                    source='chrome/Default')['revision']
+    sync(tree_store, chrome_tree(bar=[bookmark('10', 'A', 'https://a.com', dateAdded=1)]), source='brave/Default')
+
+    sync(tree_store, chrome_tree(bar=[bookmark('10', 'Chrome', 'https://a.com', modified=300)]),
+         revision, source='chrome/Default')
+    sync(tree_store, chrome_tree(bar=[bookmark('10', 'Brave', 'https://a.com', modified=200)]),
+         revision, source='brave/Default')
+    assert outline(tree_store)[0] == ('Barre de favoris', [('Chrome', 'https://a.com')])
+
+
+def test_edit_wins_over_concurrent_delete(tree_store):
+    """Un favori supprimé par un profil mais modifié par un autre est conservé."""
+    tree = chrome_tree(bar=[bookmark('10', 'A', 'https://a.com')])
+    revision = sync(tree_store, tree, source='chrome/Default')['revision']
+    sync(tree_store, tree, source='brave/Default')
+
+    sync(tree_store, chrome_tree(), revision, source='chrome/Default')
+    assert outline(tree_store)[0] == ('Barre de favoris', [])
+    sync(tree_store, chrome_tree(bar=[bookmark('10', 'A modifié', 'https://a.com')]),
+         revision, source='brave/Default')
+    assert outline(tree_store)[0] == ('Barre de favoris', [('A modifié', 'https://a.com')])
+
+
+def test_reorder_and_move(tree_store):
+    """Un réordonnancement et un déplacement entre dossiers sont reportés."""
+    revision = sync(tree_store, chrome_tree(
+        bar=[bookmark('10', 'A', 'https://a.com'), bookmark('11', 'B', 'https://b.com')],
+        other=[bookmark('12', 'C', 'https://c.com')]))['revision']
+
+    reply = sync(tree_store, chrome_tree(
+        bar=[bookmark('11', 'B', 'https://b.com'), bookmark('12', 'C', 'https://c.com'),
+             bookmark('10', 'A', 'https://a.com')]), revision)
+    assert outline(tree_store) == [
+        ('Barre de favoris', [('B', 'https://b.com'), ('C', 'https://c.com'), ('A', 'https://a.com')]),
+        ('Autres favoris', []),
+    ]
+    assert reply['changed'] == [] and reply['removed'] == []
+
+
+def test_new_profile_is_merged_without_duplicates(tree_store):
+    """La première synchronisation d'un profil rapproche ses nœuds des nœuds stockés."""
+    sync(tree_store, chrome_tree(bar=[folder('11', 'Dev', bookmark('12', 'A', 'https://a.com'))]),
+         source='chrome/Default')
+    reply = sync(tree_store, folder('0', '', folder('1', 'Bookmarks bar',
+                                                    folder('5', 'Dev', bookmark('6', 'A', 'https://a.com'),
+                                                           bookmark('7', 'B', 'https://b.com'))),
+                                    folder('2', 'Other bookmarks')), source='brave/Default')
+
+    assert reply['mode'] == 'tree_full'
+    assert outline(tree_store) == [
+        ('Barre de favoris', [('Dev', [('A', 'https://a.com'), ('B', 'https://b.com')])]),
+        ('Autres favoris', []),
+    ]
+    assert len(reply['nodes']) == 5
+
+
+def test_unknown_revision_never_deletes(tree_store):
+    """Sans base reconnue, l'arbre de l'extension est fusionné par union."""
+    sync(tree_store, chrome_tree(bar=[bookmark('10', 'A', 'https://a.com')]))
+    sync(tree_store, chrome_tree(bar=[bookmark('11', 'B', 'https://b.com')]), revision=12345)
+    assert sorted(title for title, _ in outline(tree_store)[0][1]) == ['A', 'B']
+
+
+def test_history_is_trimmed(tree_store, monkeypatch):
+    """L'historique ancien est oublié ; les révisions antérieures ne sont plus reconnues."""
+    monkeypatch.setattr('syncmark.tree.MAX_TREE_HISTORY', 10)
+    revision = sync(tree_store, chrome_tree(bar=[bookmark('10', 'A', 'https://a.com')]))['revision']
+    for i in range(20):
+        sync(tree_store, chrome_tree(bar=[bookmark('10', f'A{i}', 'https://a.com')]), revision + i)
+
+    assert not tree_store.is_known(revision)
+    assert tree_store.conn.execute("SELECT COUNT(*) FROM tree_history WHERE node_id = ?",
+                                   (tree_store.all_nodes()[-1]['node_id'],)).fetchone()[0] <= 11
+    reply = sync(tree_store, chrome_tree(bar=[bookmark('10', 'A19', 'https://a.com')]), tree_store.revision)
+    assert reply['mode'] == 'tree'
+
+
+def test_root_hash_matches_client_hash(tree_store):
+    """L'empreinte racine stockée est celle que l'extension calcule sur le même arbre."""
+    tree = chrome_tree(bar=[folder('11', 'Dev', bookmark('12', 'A', 'https://a.com'))])
+    reply = sync(tree_store, tree)
+    assert reply['root_hash'] == parse_tree(tree)[0].hash.hex()
+    bar = node_hash('Barre de favoris', None, [node_hash('Dev', None, [node_hash('A', 'https://a.com')])])
+    assert reply['root_hash'] == node_hash('', None, [bar, node_hash('Autres favoris', None)]).hex()
+
+
+def test_summary_in_sync(tree_store):
+    """Une empreinte racine identique suffit à conclure que rien n'a changé."""
+    tree = chrome_tree(bar=[bookmark('10', 'A', 'https://a.com')])
+    reply = sync(tree_store, tree)
+    assert tree_summary_reply(tree_store, reply['root_hash']) == {
+        'status': 'success', 'mode': 'in_sync', 'revision': reply['revision']}
+
+
+def test_summary_returns_only_differing_folders(tree_store):
+    """Quand les empreintes diffèrent, seuls les dossiers modifiés sont transmis."""
+    folders = [folder(f'f{i}', f'Dossier {i}', bookmark(f'b{i}', 'x', f'https://{i}.com')) for i in range(10)]
+    revision = sync(tree_store, chrome_tree(bar=folders), source='chrome/Default')['revision']
+    ids = {node['title']: node['node_id'] for node in tree_store.all_nodes() if 'url' not in node}
+    hashes = {node_id: node_hash(title, None, [node_hash('x', f'https://{title.split()[1]}.com')]).hex()
+              for title, node_id in ids.items() if title.startswith('Dossier')}
+    hashes[ids['Autres favoris']] = node_hash('Autres favoris', None).hex()
+    old_root = tree_store.root_hash.hex()
+
+    folders[4]['children'].append(bookmark('new', 'Nouveau', 'https://new.com'))
+    sync(tree_store, chrome_tree(bar=folders), revision, source='brave/Default')
+
+    reply = tree_summary_reply(tree_store, old_root, hashes)
+    assert reply['mode'] == 'tree_diff'
+    assert sorted(reply['folders']) == sorted([ROOT_ID, ids['Barre de favoris'], ids['Dossier 4']])
+    assert [node['title'] for node in reply['nodes'] if node['parent_id'] == ids['Dossier 4']] == ['x', 'Nouveau']
+    assert len(reply['nodes']) == 2 + 10 + 2
+
+
+def test_unchanged_subtrees_can_be_summarized(tree_store):
+    """L'extension peut remplacer un dossier inchangé par son empreinte."""
+    folders = [folder(f'f{i}', f'Dossier {i}', bookmark(f'b{i}', 'x', f'https://{i}.com')) for i in range(3)]
+    reply = sync(tree_store, chrome_tree(bar=folders))
+    ids = {entry['id']: entry['node_id'] for entry in reply['ids']}
+    count = tree_store.count()
+
+    summaries = [{'node_id': ids[f'f{i}'], 'hash': node_hash(f'Dossier {i}', None, [node_hash('x', f'https://{i}.com')]).hex()}
+                 for i in range(2)]
+    summaries.append(dict(folders[2], children=folders[2]['children'] + [bookmark('new', 'Nouveau', 'https://n.com')]))
+    merge = tree_store.merge(chrome_tree(bar=summaries), reply['revision'], 'chrome/Default')
+
+    assert merge.touched == {merge.id_map['new']}
+    assert tree_store.count() == count + 1
+    assert tree_store.root_hash == parse_tree(chrome_tree(bar=folders[:2] + [summaries[2]]))[0].hash
+
+
+def test_deep_trees_are_parsed_iteratively():
+    """Un arbre très profond ne dépasse pas la limite de récursion."""
+    tree = folder('0', '')
+    node = tree
+    for i in range(5000):
+        child = folder(str(i), f'Niveau {i}')
+        node['children'].append(child)
+        node = child
+    root, nodes = parse_tree(tree)
+    assert len(nodes) == 5001
+    assert root.hash is not None
+
+
+def test_host_handles_tree_messages(mock_sync_dir):
+    """Le Native Host répond aux messages `tree` et reprend leur identifiant."""
+    host = NativeHostManager()
+    try:
+        reply = host.build_reply({'id': 3, 'type': 'tree', 'tree': chrome_tree(
+            bar=[bookmark('10', 'A', 'https://a.com')])})
+        assert reply['status'] == 'success'
+        assert reply['id'] == 3
+        assert [node['title'] for node in reply['nodes']] == ['Barre de favoris', 'A', 'Autres favoris']
+        assert host.build_reply({'id': 4, 'type': 'tree', 'root_hash': reply['root_hash']}) == {
+            'status': 'success', 'mode': 'in_sync', 'revision': reply['revision'], 'id': 4}
+
+        assert host.build_reply({'type': 'tree', 'tree': 'invalide'}) == {
+            'status': 'error', 'message': 'Invalid bookmark tree'}
+    finally:
+        host.close()
+
+
+@pytest.mark.parametrize('date', [1e300, float('inf'), float('nan'), 2 ** 63])
+def test_out_of_range_dates_are_rejected(mock_sync_dir, date):
+    """Une date non finie ou hors des entiers SQLite rend l'arbre invalide, sans écrire ni interrompre le host."""
+    host = NativeHostManager()
+    try:
+        tree = chrome_tree(bar=[bookmark('10', 'A', 'https://a.com', dateAdded=date)])
+        assert host.build_reply({'type': 'tree', 'tree': tree}) == {
+            'status': 'error', 'message': 'Invalid bookmark tree'}
+        assert host.get_tree_store().count() == 0
+        reply = host.build_reply({'type': 'tree', 'tree': chrome_tree(
+            bar=[bookmark('10', 'A', 'https://a.com', dateAdded=2 ** 63 - 1)])})
+        assert reply['status'] == 'success'
+    finally:
+        host.close()
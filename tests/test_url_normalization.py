@@ -0,0 +1,133 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from syncmark import config
+from syncmark.store import CachedBookmarkStore, SqliteBookmarkStore
+from syncmark.urls import KEY_VERSION, normalize_split_url, normalize_url
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+@pytest.mark.parametrize('url, key', [
+    ('http://x.com/', 'https://x.com'),
+    ('https://x.com', 'https://x.com'),
+    ('https://x.com/?utm_source=news&utm_medium=mail', 'https://x.com'),
+    ('HTTPS://WWW.X.com:443/a/b/?id=3&fbclid=abc#top', 'https://www.x.com/a/b?id=3#top'),
+    ('https://x.com:8443/a', 'https://x.com:8443/a'),
+    ('https://x.com./a?b=1&gclid=2&c', 'https://x.com/a?b=1&c'),
+    ('https://bücher.de/', 'https://xn--bcher-kva.de'),
+    ('https://user@X.com/', 'https://user@x.com'),
+    ('https://[::1]:8080/', 'https://[::1]:8080'),
+    ('ftp://X.com/file/', 'ftp://x.com/file'),
+    ('  javascript:alert(1) ', 'javascript:alert(1)'),
+    ('https://x.com:port/', 'https://x.com:port/'),
+])
+def test_normalize_url(url, key):
+    """La clé d'un favori ignore schéma, casse de l'hôte, barre finale et paramètres de suivi."""
+    assert normalize_url(url) == key
+
+
+@pytest.mark.parametrize('url', [
+    'https://x.com/', 'http://x.com./a/', 'https://x..//', 'https://x.com//a//', 'http://x.com',
+    'https://x.com/é/ü', 'https://x-y.com/a%20b', 'https://3.3.3.3/a/b/', 'https://x.com/a b',
+])
+def test_simple_urls_match_the_split_key(url):
+    """Le calcul direct des URLs courantes donne la même clé que urlsplit."""
+    assert normalize_url(url) == normalize_split_url(url)
+
+
+def legacy_store(path, urls):
+    """Base d'une version précédente : clés non normalisées, sans key_version"""
+    store = SqliteBookmarkStore(path)
+    with store.conn:
+        store.conn.execute("BEGIN")
+        store.conn.execute("DELETE FROM meta WHERE key = 'key_version'")
+        store.conn.executemany(
+            "INSERT INTO bookmarks (url_key, url, data, revision) VALUES (?, ?, ?, ?)",
+            [(url, url, '{"url": "%s"}' % url, revision) for revision, url in enumerate(urls, start=2)])
+        store.conn.execute("UPDATE meta SET value = ? WHERE key = 'revision'", (len(urls) + 1,))
+    store.close()
+
+
+def test_outdated_keys_are_migrated_and_duplicates_collapsed(mock_sync_dir):
+    """À l'ouverture, les clés d'une ancienne normalisation sont recalculées et les doublons fusionnés."""
+    legacy_store(config.STORE_FILE_PATH, ['http://x.com/', 'https://a.com', 'https://x.com?utm_source=z'])
+
+    store = SqliteBookmarkStore(config.STORE_FILE_PATH)
+    try:
+        assert store._get_meta('key_version') == KEY_VERSION
+        assert [bm['url'] for bm in store.all_bookmarks()] == ['https://a.com', 'https://x.com?utm_source=z']
+        # Les clients synchronisés retirent le doublon
+        changed, removed = store.changes_since(4)
+        assert removed == ['http://x.com/']
+        assert [bm['url'] for bm in changed] == ['https://x.com?utm_source=z']
+        store.apply([{'url': 'HTTP://X.com'}], [])
+        assert store.count() == 2
+    finally:
+        store.close()
+
+
+def test_cache_drops_collapsed_duplicates(mock_sync_dir):
+    """Un cache chargé avant le dédoublonnage garde le favori conservé."""
+    legacy_store(config.STORE_FILE_PATH, ['http://x.com/', 'https://x.com'])
+    cache = CachedBookmarkStore(SqliteBookmarkStore(config.STORE_FILE_PATH, migrate_keys=False))
+    other = SqliteBookmarkStore(config.STORE_FILE_PATH, migrate_keys=False)
+    try:
+        cache.all_bookmarks()
+        other.deduplicate()
+        assert [bm['url'] for bm in cache.all_bookmarks()] == ['https://x.com']
+    finally:
+        other.close()
+        cache.close()
+
+
+def test_deduplicate_dry_run_reports_without_changes(mock_sync_dir):
+    """La simulation rapporte les doublons sans modifier la base."""
+    legacy_store(config.STORE_FILE_PATH, ['http://x.com/', 'https://x.com', 'https://y.com'])
+    store = SqliteBookmarkStore(config.STORE_FILE_PATH, migrate_keys=False)
+    try:
+        revision = store.revision
+        assert store.deduplicate(dry_run=True) == {'https://x.com': ('https://x.com', ['http://x.com/'])}
+        assert store.count() == 3
+        assert store.revision == revision
+        assert store._get_meta('key_version') is None
+    finally:
+        store.close()
+
+
+def test_deduplicate_large_collection(mock_sync_dir):
+    """Le dédoublonnage traite une grande collection en une passe."""
+    urls = []
+    for i in range(20000):
+        urls.append(f'https://site{i}.example.com/page')
+        if i % 10 == 0:
+            urls.append(f'http://SITE{i}.example.com/page/?utm_campaign=x')
+    legacy_store(config.STORE_FILE_PATH, urls)
+
+    store = SqliteBookmarkStore(config.STORE_FILE_PATH, migrate_keys=False)
+    try:
+        duplicates = store.deduplicate()
+        assert len(duplicates) == 2000
+        assert store.count() == 20000
+    finally:
+        store.close()
+
+
+def test_dedupe_mode(tmp_path):
+    """`--mode dedupe` affiche et supprime les doublons."""
+    sync_dir = tmp_path / 'Documents' / 'SyncMark'
+    sync_dir.mkdir(parents=True)
+    legacy_store(str(sync_dir / 'syncmark_bookmarks.db'), ['http://x.com/', 'https://x.com'])
+    env = dict(os.environ, HOME=str(tmp_path), USERPROFILE=str(tmp_path))
+
+    def dedupe(*args):
+        return subprocess.run([sys.executable, 'syncmark_unified.py', '--mode', 'dedupe', *args],
+                              capture_output=True, env=env, cwd=ROOT_DIR, check=True, text=True).stdout
+
+    assert dedupe('--dry-run').splitlines() == [
+        'https://x.com', '  - http://x.com/', '1 doublon(s) trouvé(s) dans 1 groupe(s), 2 favoris']
+    assert dedupe().splitlines()[-1] == '1 doublon(s) supprimé(s) dans 1 groupe(s), 1 favoris'
+    assert dedupe().splitlines() == ['0 doublon(s) supprimé(s) dans 0 groupe(s), 1 favoris']
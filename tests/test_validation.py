@@ -0,0 +1,63 @@
+import json
+
+from conftest import frame, read_frames, run_host
+from syncmark import config
+from syncmark.config import SyncMarkConfig
+from syncmark.host import NativeHostManager
+from syncmark.metrics import read_metrics
+from syncmark.validation import MAX_QUARANTINED_ENTRY, QuarantineRecorder, validate_bookmarks
+
+
+def read_quarantine():
+    with open(config.QUARANTINE_FILE_PATH, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_malformed_entries_are_rejected_with_a_reason():
+    """Chaque entrée mal formée est rejetée avec son index et sa raison, les autres sont gardées dans l'ordre."""
+    items = [{'url': 'https://a.com', 'title': None, 'dateAdded': 1.5e12}, {'title': 'sans url'}, 'texte',
+             {'url': ''}, {'url': 5}, {'url': 'https://b.com', 'dateAdded': True},
+             {'url': 'https://c.com', 'folder': ['x']}, {'url': 'https://d.com', 'tags': [1]}]
+    valid, rejected = validate_bookmarks(items)
+    assert valid == [items[0], items[7]]
+    assert [(field, index, reason) for field, index, _, reason in rejected] == [
+        ('bookmarks', 1, 'missing url'), ('bookmarks', 2, 'bookmark is not an object'),
+        ('bookmarks', 3, 'empty url'), ('bookmarks', 4, 'url is not a string'),
+        ('bookmarks', 5, 'dateAdded is not int or float'), ('bookmarks', 6, 'folder is not str')]
+    assert validate_bookmarks({'url': 'https://a.com'}) == (
+        [], [('bookmarks', None, {'url': 'https://a.com'}, 'bookmarks is not a list')])
+
+
+def test_host_quarantines_and_keeps_processing(mock_sync_dir):
+    """Le host écarte les entrées mal formées, traite le reste et continue après un message invalide."""
+    SyncMarkConfig.update_settings(enabled=True, write_delay=0)
+    host = NativeHostManager(source='chrome:Default')
+    replies = read_frames(run_host(frame({'id': 1, 'bookmarks': [{'url': 'https://a.com'}, {'title': 'x'}, 3]})
+                                   + frame({'id': 2, 'bookmarks': 'pas une liste'})
+                                   + frame(['pas', 'un', 'objet'])
+                                   + frame({'id': 4, 'type': 'delta', 'revision': 0,
+                                            'added': [{'url': 'https://b.com'}],
+                                            'changed': 7, 'removed': [{'id': 1}, 'https://a.com']}), host))
+
+    assert [reply['status'] for reply in replies] == ['success', 'success', 'error', 'success']
+    assert replies[0]['bookmarks'] == [{'url': 'https://a.com'}] and replies[0]['rejected'] == 2
+    assert replies[1]['rejected'] == 1
+    assert replies[2] == {'status': 'error', 'message': 'Invalid message'}
+    assert replies[3]['rejected'] == 2
+    assert host.get_store().all_bookmarks() == [{'url': 'https://b.com'}]
+
+    quarantined = read_quarantine()
+    assert [(entry['type'], entry['field'], entry['index'], entry['reason']) for entry in quarantined] == [
+        ('full', 'bookmarks', 1, 'missing url'), ('full', 'bookmarks', 2, 'bookmark is not an object'),
+        ('full', 'bookmarks', None, 'bookmarks is not a list'), (None, 'message', None, 'message is not an object'),
+        ('delta', 'changed', None, 'changed is not a list'), ('delta', 'removed', 0, 'removal has no url')]
+    assert quarantined[0]['entry'] == {'title': 'x'} and quarantined[0]['source'] == 'chrome:Default'
+    assert [record['rejected'] for record in read_metrics(config.METRICS_FILE_PATH)] == [2, 1, 1, 2]
+
+
+def test_large_entries_are_truncated(tmp_path):
+    """Une entrée volumineuse est recopiée tronquée dans la quarantaine."""
+    recorder = QuarantineRecorder(str(tmp_path / 'quarantine.jsonl'))
+    recorder.write([('bookmarks', None, 'x' * 10 * MAX_QUARANTINED_ENTRY, 'bookmarks is not a list')])
+    entry = json.loads((tmp_path / 'quarantine.jsonl').read_text(encoding='utf-8'))
+    assert 'entry' not in entry and len(entry['truncated']) == MAX_QUARANTINED_ENTRY
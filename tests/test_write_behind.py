@@ -0,0 +1,54 @@
+import json
+import os
+from unittest.mock import patch
+
+from conftest import frame, run_host
+from syncmark import config
+from syncmark.host import NativeHostManager
+from syncmark.store import SqliteBookmarkStore, atomic_write_json
+
+
+def test_burst_is_written_in_one_transaction(mock_sync_dir):
+    """Les changements d'une rafale sont regroupés en une seule écriture."""
+    host = NativeHostManager(write_delay=60)
+    replies = []
+    host.send_message = replies.append
+    store = host.get_store()
+
+    with patch.object(store.store, 'apply', wraps=store.store.apply) as mock_apply:
+        for i in range(5):
+            host.process_bookmarks({'bookmarks': [{'url': f'https://site{i}.com'}]})
+        mock_apply.assert_not_called()
+
+        # L'extension est acquittée avec l'état en mémoire
+        assert len(replies[-1]['bookmarks']) == 5
+
+        store.close()
+    mock_apply.assert_called_once()
+
+    reopened = SqliteBookmarkStore(config.STORE_FILE_PATH)
+    assert reopened.count() == 5
+    reopened.close()
+
+
+def test_pending_writes_flushed_when_stdin_closes(mock_sync_dir):
+    """La fermeture du canal par le navigateur écrit les changements en attente."""
+    with open(config.CONFIG_FILE, 'w', encoding='utf-8') as f:
+        json.dump({'enabled': True, 'write_delay': 60}, f)
+
+    run_host(frame({'bookmarks': [{'url': 'https://a.com'}]}), NativeHostManager())
+
+    store = SqliteBookmarkStore(config.STORE_FILE_PATH)
+    assert store.all_bookmarks() == [{'url': 'https://a.com'}]
+    store.close()
+
+
+def test_atomic_write_json_leaves_no_temp_file(mock_sync_dir):
+    """L'écriture atomique remplace le fichier sans laisser de fichier temporaire."""
+    path = os.path.join(mock_sync_dir, 'export.json')
+    atomic_write_json(path, [{'url': 'https://a.com'}])
+    atomic_write_json(path, [{'url': 'https://b.com'}])
+
+    with open(path, 'r', encoding='utf-8') as f:
+        assert json.load(f) == [{'url': 'https://b.com'}]
+    assert os.listdir(mock_sync_dir) == ['export.json']